@@ -1,24 +1,70 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import io
+import hashlib
 import logging
-from typing import Dict, Any, Tuple, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Tuple, Optional, Union, BinaryIO, Callable, Iterable
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
+class TokenBucket:
+    """令牌桶限速器，用于限制上传带宽"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        """初始化限速器
+
+        Args:
+            rate: 每秒允许的字节数
+            capacity: 允许的突发字节数，默认等于一秒的额度
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: int) -> float:
+        """预扣额度，返回需要等待的秒数（额度不足时允许透支，由等待时间补偿）"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
 class AuthClient:
     """用户认证和API通信客户端"""
     
-    def __init__(self, server_url="http://localhost:5000"):
+    # 超过该大小的文件使用分块上传，断线后可续传
+    RESUMABLE_THRESHOLD = 4 * 1024 * 1024
+    # 分块上传时每块的大小
+    CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, server_url="http://localhost:5000", max_workers=4):
         """初始化认证客户端
         
         Args:
             server_url: 服务器URL地址
+            max_workers: 并发上传的最大线程数
         """
         self.server_url = server_url
         self.token = None
         self.user_info = None
+        self.max_workers = max_workers
+        self.sync_manager = None
+        
+        # 复用连接的会话，避免每次请求都重新建立TCP/TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, max_workers))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
         # 创建配置文件目录
         self.config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
@@ -26,10 +72,61 @@ class AuthClient:
             os.makedirs(self.config_dir)
             
         self.token_file = os.path.join(self.config_dir, "auth_token.json")
+        self.settings_file = os.path.join(self.config_dir, "settings.json")
+        
+        # 上传限速器，所有上传线程共用一个令牌桶，并发上传时总带宽也不超过上限
+        self.upload_limiter = None
+        self.load_settings()
         
         # 尝试加载保存的令牌
         self.load_token()
         
+    def set_sync_manager(self, sync_manager):
+        """设置上传日志管理器，用于保存未完成的分块上传会话"""
+        self.sync_manager = sync_manager
+        
+    def load_settings(self):
+        """加载本地设置（上传带宽上限等）"""
+        settings = {}
+        if os.path.exists(self.settings_file):
+            try:
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+            except Exception as e:
+                logging.error(f"加载设置时出错: {e}")
+        self.set_bandwidth_limit(settings.get('upload_bandwidth_limit'), save=False)
+        
+    def get_bandwidth_limit(self) -> int:
+        """返回上传带宽上限（字节/秒），0 表示不限速"""
+        return int(self.upload_limiter.rate) if self.upload_limiter else 0
+        
+    def set_bandwidth_limit(self, limit: Optional[int], save: bool = True):
+        """设置上传带宽上限
+        
+        Args:
+            limit: 字节/秒，None 或 0 表示不限速
+            save: 是否保存到设置文件，下次启动时继续生效
+        """
+        try:
+            limit = int(limit or 0)
+        except (TypeError, ValueError):
+            limit = 0
+        self.upload_limiter = TokenBucket(limit) if limit > 0 else None
+        if save:
+            try:
+                with open(self.settings_file, 'w', encoding='utf-8') as f:
+                    json.dump({'upload_bandwidth_limit': max(limit, 0)}, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                logging.error(f"保存设置时出错: {e}")
+                
+    def _throttle(self, size: int):
+        """按上传带宽上限等待，在发送 size 字节的请求之前调用"""
+        limiter = self.upload_limiter
+        if limiter and size:
+            delay = limiter.reserve(size)
+            if delay:
+                time.sleep(delay)
+        
     def load_token(self) -> bool:
         """加载保存的令牌
         
@@ -81,7 +178,7 @@ class AuthClient:
         """
         url = f"{self.server_url}/api/register"
         try:
-            response = requests.post(url, json={
+            response = self.session.post(url, json={
                 'username': username,
                 'password': password
             })
@@ -109,7 +206,7 @@ class AuthClient:
         """
         url = f"{self.server_url}/api/login"
         try:
-            response = requests.post(url, json={
+            response = self.session.post(url, json={
                 'username': username,
                 'password': password
             })
@@ -207,7 +304,7 @@ class AuthClient:
         url = f"{self.server_url}/api/upload/record"
         try:
             headers = self.get_headers()
-            response = requests.post(url, json=record_data, headers=headers)
+            response = self.session.post(url, json=record_data, headers=headers)
             
             if response.status_code == 200:
                 return True, "上传成功"
@@ -239,6 +336,7 @@ class AuthClient:
             file_name = os.path.basename(file_path)
             with open(file_path, 'rb') as f:
                 files = {'file': (file_name, f)}
+                self._throttle(os.path.getsize(file_path))
                 
                 # 发送请求
                 response = self._api_request('POST', 'upload/file', files=files)
@@ -268,7 +366,7 @@ class AuthClient:
         url = f"{self.server_url}/api/records"
         try:
             headers = self.get_headers()
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
                 records = response.json()
@@ -295,7 +393,7 @@ class AuthClient:
         url = f"{self.server_url}/api/admin/records"
         try:
             headers = self.get_headers()
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
                 records = response.json()
@@ -322,7 +420,7 @@ class AuthClient:
         url = f"{self.server_url}/api/admin/users"
         try:
             headers = self.get_headers()
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
                 users = response.json()
@@ -334,14 +432,15 @@ class AuthClient:
             logging.error(f"获取所有用户时出错: {e}")
             return False, f"请求错误: {e}", []
         
-    def _api_request(self, method, endpoint, data=None, files=None):
+    def _api_request(self, method, endpoint, data=None, files=None, params=None):
         """发送 API 请求
         
         Args:
-            method: HTTP 方法 ('GET', 'POST', etc.)
+            method: HTTP 方法 ('GET', 'POST', 'PUT')
             endpoint: API 端点 (不包含基础 URL)
-            data: 请求数据 (字典)
+            data: 请求数据 (字典)，PUT 请求时为原始字节
             files: 上传的文件
+            params: URL 查询参数
             
         Returns:
             Response 对象
@@ -355,13 +454,16 @@ class AuthClient:
         
         # 发送请求
         if method.upper() == 'GET':
-            return requests.get(url, headers=headers, params=data)
+            return self.session.get(url, headers=headers, params=data)
         elif method.upper() == 'POST':
             if files:
-                return requests.post(url, headers=headers, data=data, files=files)
+                return self.session.post(url, headers=headers, data=data, files=files)
             else:
                 headers['Content-Type'] = 'application/json'
-                return requests.post(url, headers=headers, json=data)
+                return self.session.post(url, headers=headers, json=data, params=params)
+        elif method.upper() == 'PUT':
+            headers['Content-Type'] = 'application/octet-stream'
+            return self.session.put(url, headers=headers, data=data, params=params)
         else:
             raise ValueError(f"不支持的HTTP方法: {method}")
 
@@ -381,7 +483,28 @@ class AuthClient:
             # 读取周统计文件
             with open(stats_file, 'r', encoding='utf-8') as f:
                 stats_data = json.load(f)
-                
+        except FileNotFoundError:
+            return False, f"找不到统计文件: {stats_file}", None
+        except json.JSONDecodeError:
+            return False, f"统计文件格式错误: {stats_file}", None
+        except Exception as e:
+            return False, f"上传统计数据时出错: {str(e)}", None
+            
+        return self.upload_weekly_stats_data(stats_data)
+
+    def upload_weekly_stats_data(self, stats_data: Dict[str, Any]):
+        """直接上传内存中的周统计数据（无需写临时文件）
+        
+        Args:
+            stats_data: 周统计数据字典，需包含 year、week 字段
+            
+        Returns:
+            tuple: (是否成功, 消息, 返回数据)
+        """
+        if not self.is_authenticated():
+            return False, "未认证", None
+            
+        try:
             # 提取需要的数据
             if 'year' not in stats_data or 'week' not in stats_data:
                 return False, "统计文件缺少年份或周数信息", None
@@ -412,19 +535,84 @@ class AuthClient:
                     pass
                 return False, error_msg, None
                 
-        except FileNotFoundError:
-            return False, f"找不到统计文件: {stats_file}", None
-        except json.JSONDecodeError:
-            return False, f"统计文件格式错误: {stats_file}", None
         except Exception as e:
             return False, f"上传统计数据时出错: {str(e)}", None
 
-    def check_file_exists(self, file_hash: str, file_type: str = None) -> Tuple[bool, bool, Optional[str]]:
+    def sync_weekly_stats(self, weeks: List[Dict[str, Any]], batch_size: int = 100):
+        """同步所有本地周统计中自上次确认后有变化的周
+
+        通过批量接口一次上传多周，服务器确认后记入同步日志（set_sync_manager 设置），
+        下次只上传新增或时长变化的周。未设置同步日志时上传全部周。
+
+        Args:
+            weeks: MonitorSystem.get_available_weeks() 的返回值
+            batch_size: 每次请求最多包含的周数
+
+        Returns:
+            tuple: (是否成功, 消息, 已上传的周数)
+        """
+        if not self.is_authenticated():
+            return False, "未认证", None
+
+        entries = [{
+            'year': week_info['year'],
+            'week': week_info['week_number'],
+            'weekday_seconds': int(week_info.get('weekday_seconds', 0)),
+            'weekend_seconds': int(week_info.get('weekend_seconds', 0))
+        } for week_info in weeks
+            if 'year' in week_info and week_info.get('week_seconds', 0) > 0]
+        if self.sync_manager:
+            entries = self.sync_manager.pending_weeks(entries)
+        if not entries:
+            return True, "周统计已是最新", 0
+
+        uploaded = 0
+        try:
+            for i in range(0, len(entries), batch_size):
+                batch = entries[i:i + batch_size]
+                response = self._api_request('POST', 'upload/weekly_stats/bulk', data={'weeks': batch})
+                if response.status_code != 200:
+                    return False, self._error_message(response, "上传失败"), uploaded
+                uploaded += len(batch)
+                if self.sync_manager:
+                    self.sync_manager.mark_weeks_uploaded(batch)
+                    self.sync_manager.save()
+        except Exception as e:
+            return False, f"同步周统计时出错: {str(e)}", uploaded
+
+        return True, f"已同步 {uploaded} 周的统计", uploaded
+
+    def upload_activity_sessions(self, sessions: List[Dict[str, str]]):
+        """上传计时会话区间（每段连续计时的开始和结束时间）
+
+        服务器按 (用户, 开始时间) 去重，同一会话结束时间延长后可重复上传。
+
+        Args:
+            sessions: [{'start': ISO时间, 'end': ISO时间}, ...]
+
+        Returns:
+            tuple: (是否成功, 消息, 返回数据)
+        """
+        if not self.is_authenticated():
+            return False, "未认证", None
+        if not sessions:
+            return True, "没有需要上传的会话", None
+
+        try:
+            response = self._api_request('POST', 'upload/activity_sessions', data={'sessions': sessions})
+            if response.status_code == 200:
+                return True, "上传成功", response.json()
+            return False, self._error_message(response, "上传失败"), None
+        except Exception as e:
+            return False, f"上传会话数据时出错: {str(e)}", None
+
+    def check_file_exists(self, file_hash: str, file_type: str = None, filename: str = None) -> Tuple[bool, bool, Optional[str]]:
         """检查文件是否已存在于服务器
         
         Args:
             file_hash: 文件哈希值
             file_type: 文件类型，可选
+            filename: 文件名，可选。提供时若文件已存在，服务器会直接为本次上传创建记录
             
         Returns:
             Tuple[bool, bool, Optional[str]]: (请求是否成功, 文件是否存在, 服务器上的文件路径)
@@ -438,8 +626,10 @@ class AuthClient:
             data = {'file_hash': file_hash}
             if file_type:
                 data['file_type'] = file_type
+            if filename:
+                data['filename'] = filename
                 
-            response = requests.post(url, json=data, headers=headers)
+            response = self.session.post(url, json=data, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -478,12 +668,43 @@ class AuthClient:
                 # 如果计算失败，尝试直接上传
                 return self.upload_file(file_path, file_type)
         
+        try:
+            with open(file_path, 'rb') as f:
+                return self.upload_data(f, os.path.basename(file_path), file_type, file_hash)
+        except Exception as e:
+            logging.error(f"上传文件时出错: {e}")
+            return False, f"请求错误: {e}", None
+
+    def upload_data(self, data: Union[bytes, BinaryIO], filename: str, file_type: str = None,
+                    file_hash: str = None) -> Tuple[bool, str, Optional[str]]:
+        """直接从内存上传文件内容（不经过临时文件），并按内容哈希去重
+        
+        Args:
+            data: 文件内容，bytes 或可读的二进制流
+            filename: 上传到服务器使用的文件名
+            file_type: 文件类型，可选
+            file_hash: 内容的SHA-256哈希值，如果为None则自动计算
+            
+        Returns:
+            Tuple[bool, str, Optional[str]]: (是否成功, 消息, 服务器端文件路径)
+        """
+        if not self.is_authenticated():
+            return False, "未登录", None
+        
+        # 如果未提供哈希值，则计算哈希值（流会被回退到起始位置）
+        if file_hash is None:
+            data, file_hash = self._hash_data(data)
+        
         # 先检查文件是否已存在
-        success, exists, remote_path = self.check_file_exists(file_hash, file_type)
+        success, exists, remote_path = self.check_file_exists(file_hash, file_type, filename)
         if success and exists and remote_path:
             # 文件已存在，无需重新上传
-            logging.info(f"文件已存在于服务器: {os.path.basename(file_path)}")
+            logging.info(f"文件已存在于服务器: {filename}")
             return True, "文件已存在于服务器", remote_path
+        
+        # 大文件使用分块上传
+        if self._data_size(data) > self.RESUMABLE_THRESHOLD:
+            return self.upload_data_resumable(data, filename, file_type, file_hash)
             
         # 文件不存在或检查失败，上传文件
         url = f"{self.server_url}/api/upload/file_with_hash"
@@ -493,22 +714,289 @@ class AuthClient:
                 # 注意：不要在这里设置Content-Type，因为requests会自动设置
             }
             
-            with open(file_path, 'rb') as f:
-                filename = os.path.basename(file_path)
-                files = {'file': (filename, f, 'application/octet-stream')}
-                data = {
-                    'file_type': file_type,
-                    'file_hash': file_hash
-                }
-                response = requests.post(url, files=files, data=data, headers=headers)
+            self._throttle(self._data_size(data))
+            body = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+            files = {'file': (filename, body, 'application/octet-stream')}
+            form = {
+                'file_type': file_type,
+                'file_hash': file_hash
+            }
+            response = self.session.post(url, files=files, data=form, headers=headers)
             
+            if response.status_code == 200:
+                result = response.json()
+                return True, "文件上传成功", result.get('file_path')
+            else:
+                result = response.json() if response.content else {"message": "未知错误"}
+                return False, result.get('message', '文件上传失败'), None
+                
+        except Exception as e:
+            logging.error(f"上传文件时出错: {e}")
+            return False, f"请求错误: {e}", None
+
+    @staticmethod
+    def _hash_data(data):
+        """计算 bytes 或二进制流的SHA-256哈希值
+        
+        Returns:
+            tuple: (数据, 哈希值)。不可回退的流会被读入内存并以 bytes 返回
+        """
+        if isinstance(data, (bytes, bytearray)):
+            return data, hashlib.sha256(data).hexdigest()
+        if data.seekable():
+            start = data.tell()
+            hasher = hashlib.sha256()
+            for chunk in iter(lambda: data.read(64 * 1024), b''):
+                hasher.update(chunk)
+            data.seek(start)
+            return data, hasher.hexdigest()
+        data = data.read()
+        return data, hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _data_size(data) -> int:
+        """返回 bytes 或可回退二进制流的剩余长度"""
+        if isinstance(data, (bytes, bytearray)):
+            return len(data)
+        start = data.tell()
+        size = data.seek(0, os.SEEK_END) - start
+        data.seek(start)
+        return size
+
+    def upload_data_resumable(self, data: Union[bytes, BinaryIO], filename: str, file_type: str = None,
+                              file_hash: str = None, record: str = None,
+                              max_retries: int = 5) -> Tuple[bool, str, Optional[str]]:
+        """分块上传文件，网络中断后从服务器已接收的位置继续
+        
+        如果设置了上传日志管理器，上传会话ID会被持久化，程序重启后同一内容会续传而不是从头开始。
+        
+        Args:
+            data: 文件内容，bytes 或可回退的二进制流
+            filename: 上传到服务器使用的文件名
+            file_type: 文件类型，可选
+            file_hash: 内容的SHA-256哈希值，如果为None则自动计算
+            record: 记录时间戳目录名 (YYYYMMDD_HHMMSS)，可选
+            max_retries: 连续失败的最大重试次数
+            
+        Returns:
+            Tuple[bool, str, Optional[str]]: (是否成功, 消息, 服务器端文件路径)
+        """
+        if not self.is_authenticated():
+            return False, "未登录", None
+            
+        if file_hash is None:
+            data, file_hash = self._hash_data(data)
+        if isinstance(data, (bytes, bytearray)):
+            data = io.BytesIO(data)
+        base = data.tell()
+        file_size = self._data_size(data)
+        
+        try:
+            # 优先续传之前未完成的会话
+            upload_id = self.sync_manager.get_upload_session(file_hash) if self.sync_manager else None
+            offset = 0
+            if upload_id:
+                response = self._api_request('GET', f'upload/chunked/{upload_id}')
                 if response.status_code == 200:
-                    data = response.json()
-                    return True, "文件上传成功", data.get('file_path')
+                    offset = response.json().get('offset', 0)
                 else:
-                    data = response.json() if response.content else {"message": "未知错误"}
-                    return False, data.get('message', '文件上传失败'), None
+                    upload_id = None
                     
+            if not upload_id:
+                response = self._api_request('POST', 'upload/chunked/init', data={
+                    'filename': filename,
+                    'file_type': file_type,
+                    'file_size': file_size,
+                    'file_hash': file_hash,
+                    'record': record
+                })
+                if response.status_code != 200:
+                    return False, self._error_message(response, '创建上传会话失败'), None
+                upload_id = response.json()['upload_id']
+                if self.sync_manager:
+                    self.sync_manager.set_upload_session(file_hash, upload_id)
         except Exception as e:
-            logging.error(f"上传文件时出错: {e}")
-            return False, f"请求错误: {e}", None
\ No newline at end of file
+            logging.error(f"创建分块上传会话时出错: {e}")
+            return False, f"请求错误: {e}", None
+        
+        retries = 0
+        while offset < file_size:
+            data.seek(base + offset)
+            chunk = data.read(self.CHUNK_SIZE)
+            try:
+                self._throttle(len(chunk))
+                response = self._api_request('PUT', f'upload/chunked/{upload_id}', data=chunk,
+                                             params={'offset': offset})
+                if response.status_code in (200, 409):
+                    # 409 表示偏移不一致，以服务器返回的偏移为准
+                    offset = response.json().get('offset', offset)
+                    if response.status_code == 200:
+                        retries = 0
+                    continue
+                if response.status_code == 404:
+                    if self.sync_manager:
+                        self.sync_manager.clear_upload_session(file_hash)
+                    return False, "上传会话已失效", None
+                logging.error(f"上传数据块失败: HTTP {response.status_code}")
+            except Exception as e:
+                logging.error(f"上传数据块时出错: {e}")
+                
+            # 失败后退避重试，并向服务器查询实际已接收的偏移
+            retries += 1
+            if retries > max_retries:
+                return False, "上传中断，稍后将继续上传", None
+            time.sleep(min(2 ** retries, 30))
+            try:
+                response = self._api_request('GET', f'upload/chunked/{upload_id}')
+                if response.status_code == 200:
+                    offset = response.json().get('offset', offset)
+            except Exception as e:
+                logging.error(f"查询上传进度时出错: {e}")
+        
+        try:
+            response = self._api_request('POST', f'upload/chunked/{upload_id}/finalize')
+            if response.status_code in (200, 400, 404) and self.sync_manager:
+                self.sync_manager.clear_upload_session(file_hash)
+            if response.status_code == 200:
+                return True, "文件上传成功", response.json().get('file_path')
+            return False, self._error_message(response, '文件上传失败'), None
+        except Exception as e:
+            logging.error(f"完成分块上传时出错: {e}")
+            return False, f"请求错误: {e}", None
+
+    def upload_batch(self, items: list) -> Tuple[bool, str, list]:
+        """批量上传多个文件（通常是多条记录的截图、摄像头和信息文件）
+        
+        先只发送文件清单（含哈希），服务器直接登记已有内容的文件；
+        再在一个请求中上传服务器缺少的文件内容。
+        
+        Args:
+            items: 文件列表，每项为字典 {'data': bytes, 'filename': str, 'file_type': str, 'record': str}
+            
+        Returns:
+            Tuple[bool, str, list]: (请求是否成功, 消息, 与items一一对应的结果列表)，
+            每个结果为 {'success': bool, 'file_path': str 或 None, 'message': str}
+        """
+        if not self.is_authenticated():
+            return False, "未登录", []
+        if not items:
+            return True, "没有需要上传的文件", []
+            
+        manifest = []
+        for index, item in enumerate(items):
+            manifest.append({
+                'field': f"file{index}",
+                'filename': item['filename'],
+                'file_type': item.get('file_type'),
+                'file_hash': item.get('file_hash') or hashlib.sha256(item['data']).hexdigest(),
+                'record': item.get('record')
+            })
+        results = [{'success': False, 'file_path': None, 'message': '未上传'} for _ in items]
+        
+        try:
+            # 第一步：只发送清单，已存在的文件无需再传输内容
+            response = self._api_request('POST', 'upload/batch', data={'items': manifest})
+            if response.status_code != 200:
+                return False, self._error_message(response, '批量上传失败'), results
+            missing = self._apply_batch_results(response.json(), results)
+            
+            # 大文件单独使用分块上传
+            large = [i for i in missing if len(items[i]['data']) > self.RESUMABLE_THRESHOLD]
+            for i in large:
+                success, message, file_path = self.upload_data_resumable(
+                    items[i]['data'], manifest[i]['filename'], manifest[i]['file_type'],
+                    manifest[i]['file_hash'], manifest[i]['record'])
+                results[i] = {'success': success, 'file_path': file_path, 'message': message}
+            missing = [i for i in missing if i not in large]
+            
+            # 第二步：在同一个请求中上传服务器缺少的文件
+            if missing:
+                files = {
+                    manifest[i]['field']: (manifest[i]['filename'], io.BytesIO(items[i]['data']), 'application/octet-stream')
+                    for i in missing
+                }
+                self._throttle(sum(len(items[i]['data']) for i in missing))
+                response = self._api_request('POST', 'upload/batch',
+                                             data={'manifest': json.dumps({'items': [manifest[i] for i in missing]})},
+                                             files=files)
+                if response.status_code != 200:
+                    return False, self._error_message(response, '批量上传失败'), results
+                # 第二次请求的结果序号对应 missing 列表中的位置
+                remapped = response.json()
+                for result in remapped.get('results', []):
+                    result['index'] = missing[result['index']]
+                self._apply_batch_results(remapped, results)
+                
+            return True, "上传完成", results
+        except Exception as e:
+            logging.error(f"批量上传文件时出错: {e}")
+            return False, f"请求错误: {e}", results
+
+    @staticmethod
+    def _apply_batch_results(response_data: Dict[str, Any], results: list) -> list:
+        """将服务器返回的批量上传结果写入结果列表，返回服务器缺少内容的条目序号"""
+        missing = []
+        for result in response_data.get('results', []):
+            index = result.get('index')
+            status = result.get('status')
+            if status in ('stored', 'deduplicated'):
+                results[index] = {'success': True, 'file_path': result.get('file_path'), 'message': '上传成功'}
+            elif status == 'missing':
+                missing.append(index)
+            else:
+                results[index] = {'success': False, 'file_path': None, 'message': result.get('message', '上传失败')}
+        return missing
+
+    @staticmethod
+    def _error_message(response, default: str) -> str:
+        """从错误响应中提取消息"""
+        try:
+            return response.json().get('message', default)
+        except Exception:
+            return default
+
+    def run_upload_queue(self, tasks: Iterable, worker: Callable, on_result: Callable = None,
+                         max_workers: int = None) -> int:
+        """并发执行上传任务
+        
+        任务按需从 tasks 中取出，同时在途的任务数不超过 max_workers 的两倍，
+        因此 tasks 可以是惰性生成器（例如按需解密文件），内存占用有上限。
+        
+        Args:
+            tasks: 任务的可迭代对象
+            worker: 在工作线程中执行的函数 worker(task) -> result
+            on_result: 在调用线程中处理结果的回调 on_result(task, result, error)，
+                       worker 抛出异常时 result 为 None、error 为异常对象
+            max_workers: 最大并发数，默认使用初始化时的设置
+            
+        Returns:
+            int: 执行的任务数
+        """
+        max_workers = max_workers or self.max_workers
+        max_in_flight = max_workers * 2
+        task_iter = iter(tasks)
+        in_flight = {}
+        count = 0
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # 补充任务直到达到在途上限
+                while len(in_flight) < max_in_flight:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    in_flight[executor.submit(worker, task)] = task
+                    
+                if not in_flight:
+                    break
+                    
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = in_flight.pop(future)
+                    count += 1
+                    error = future.exception()
+                    if error:
+                        logging.error(f"上传任务出错: {error}")
+                    if on_result:
+                        on_result(task, None if error else future.result(), error)
+        return count
@@ -0,0 +1,109 @@
+import cv2
+import time
+import logging
+import threading
+
+
+class CameraManager:
+    """摄像头采集管理
+
+    负责打开摄像头、预热（跳过自动曝光尚未稳定的前几帧）和释放设备。
+    keep_open=True 时设备在两次采集之间保持打开，省去重复初始化的耗时；
+    否则每次采集后立即释放。暂停或停止检测时应调用 release()。
+    """
+
+    def __init__(self, device_index=0, keep_open=False, warmup_frames=10,
+                 brightness_tolerance=2.0, warmup_timeout=3.0):
+        """初始化摄像头管理器
+
+        Args:
+            device_index: 摄像头设备序号
+            keep_open: 两次采集之间是否保持设备打开
+            warmup_frames: 打开设备后最多跳过的帧数
+            brightness_tolerance: 相邻两帧平均亮度差小于该值时认为曝光已稳定，提前结束预热
+            warmup_timeout: 预热的最长时间（秒）
+        """
+        self.device_index = device_index
+        self.keep_open = keep_open
+        self.warmup_frames = warmup_frames
+        self.brightness_tolerance = brightness_tolerance
+        self.warmup_timeout = warmup_timeout
+        self.cap = None
+        self.lock = threading.Lock()
+        self.last_open_seconds = 0
+
+    def _open(self):
+        """打开设备并预热，返回是否成功"""
+        start = time.time()
+        cap = cv2.VideoCapture(self.device_index)
+        if not cap.isOpened():
+            cap.release()
+            return False
+
+        # 尽量只缓冲一帧，保持打开时读取到的是最新画面
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # 跳过自动曝光尚未稳定的帧，避免第一帧偏暗
+        last_brightness = None
+        for _ in range(self.warmup_frames):
+            if time.time() - start > self.warmup_timeout:
+                break
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            brightness = float(frame.mean())
+            if last_brightness is not None and abs(brightness - last_brightness) < self.brightness_tolerance:
+                break
+            last_brightness = brightness
+
+        self.cap = cap
+        self.last_open_seconds = time.time() - start
+        logging.info(f"摄像头已打开，预热耗时 {self.last_open_seconds:.2f} 秒")
+        return True
+
+    def capture(self):
+        """捕获一帧画面
+
+        Returns:
+            numpy数组格式的BGR图像，失败时返回None
+        """
+        with self.lock:
+            try:
+                if self.cap is None and not self._open():
+                    logging.error("无法打开摄像头")
+                    return None
+
+                # 设备保持打开时，丢弃驱动缓冲中的旧帧
+                if self.keep_open:
+                    self.cap.grab()
+                ret, frame = self.cap.read()
+
+                if not ret:
+                    # 设备可能已被拔出或占用，释放后下次重新打开
+                    self._release()
+                    logging.error("无法捕获摄像头画面")
+                    return None
+                return frame
+            except Exception as e:
+                self._release()
+                logging.error(f"捕获摄像头时出错: {e}")
+                return None
+            finally:
+                if not self.keep_open:
+                    self._release()
+
+    def _release(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception as e:
+                logging.error(f"释放摄像头时出错: {e}")
+            self.cap = None
+
+    def release(self):
+        """释放摄像头设备"""
+        with self.lock:
+            self._release()
+
+    def is_open(self):
+        return self.cap is not None
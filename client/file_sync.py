@@ -0,0 +1,280 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+class FileSyncManager:
+    """文件同步辅助工具，维护本地上传日志
+
+    上传日志记录每条记录（周目录/时间戳目录）中已被服务器确认的文件，
+    之后的上传只处理新增或上次失败的文件。无法解密的文件记为永久跳过，
+    不再重试。已全部上传（或跳过）的历史周会被标记为已关闭，后续扫描时直接跳过，
+    不再遍历其中的时间戳目录。
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    # 每条记录中需要上传的加密文件 -> (上传文件名后缀, 文件类型)
+    UPLOAD_ARTIFACTS = {
+        'screenshot.enc': ('screenshot.webp', 'screenshot'),
+        'camera.enc': ('camera.webp', 'camera'),
+        'info.enc': ('info.json', 'info'),
+    }
+    RECORD_ARTIFACTS = tuple(UPLOAD_ARTIFACTS)
+
+    def __init__(self, journal_file: str = None):
+        """初始化同步管理器
+
+        Args:
+            journal_file: 上传日志文件路径，为None时不记录上传日志
+        """
+        self.journal_file = journal_file
+        self.lock = threading.RLock()
+        self.journal = {'records': {}, 'skipped': {}, 'closed_weeks': [], 'uploads': {}, 'sessions': {}, 'weeks': {}}
+        # 正在上传中的记录，避免手动上传和自动同步重复上传同一条记录
+        self.claimed = set()
+        if journal_file:
+            self.load()
+
+    def compute_file_hash(self, file_path: str) -> str:
+        """计算文件内容的SHA-256哈希值（与服务器去重使用的算法一致）
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 十六进制哈希字符串
+        """
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def compute_data_hash(data: bytes) -> str:
+        """计算内存数据的SHA-256哈希值"""
+        return hashlib.sha256(data).hexdigest()
+
+    def load(self):
+        """从磁盘加载上传日志"""
+        with self.lock:
+            if not os.path.exists(self.journal_file):
+                return
+            try:
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.journal['records'] = data.get('records', {})
+                self.journal['skipped'] = data.get('skipped', {})
+                self.journal['closed_weeks'] = data.get('closed_weeks', [])
+                self.journal['uploads'] = data.get('uploads', {})
+                self.journal['sessions'] = data.get('sessions', {})
+                self.journal['weeks'] = data.get('weeks', {})
+            except Exception as e:
+                logging.error(f"加载上传日志时出错: {e}")
+
+    def save(self):
+        """保存上传日志（先写临时文件再替换，避免写入中断损坏日志）"""
+        if not self.journal_file:
+            return
+        with self.lock:
+            tmp_file = self.journal_file + '.tmp'
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.journal, f, ensure_ascii=False)
+                os.replace(tmp_file, self.journal_file)
+            except Exception as e:
+                logging.error(f"保存上传日志时出错: {e}")
+
+    @staticmethod
+    def record_id(week_id: str, timestamp_name: str) -> str:
+        return f"{week_id}/{timestamp_name}"
+
+    def is_uploaded(self, record_id: str, artifact: str) -> bool:
+        with self.lock:
+            return artifact in self.journal['records'].get(record_id, {})
+
+    def mark_uploaded(self, record_id: str, artifact: str, remote_path: str = None):
+        """记录服务器已确认接收的文件
+
+        Args:
+            record_id: 记录ID（周目录/时间戳目录）
+            artifact: 记录中的文件名，如 screenshot.enc
+            remote_path: 服务器返回的文件路径
+        """
+        with self.lock:
+            self.journal['records'].setdefault(record_id, {})[artifact] = remote_path
+
+    def is_skipped(self, record_id: str, artifact: str) -> bool:
+        with self.lock:
+            return artifact in self.journal['skipped'].get(record_id, [])
+
+    def mark_skipped(self, record_id: str, artifact: str):
+        """记录无法读取（解密失败）的文件，之后不再尝试上传，所在周可以正常关闭"""
+        with self.lock:
+            skipped = self.journal['skipped'].setdefault(record_id, [])
+            if artifact not in skipped:
+                skipped.append(artifact)
+
+    def is_week_closed(self, week_id: str) -> bool:
+        with self.lock:
+            return week_id in self.journal['closed_weeks']
+
+    def close_week(self, week_id: str):
+        """标记某周已全部上传，并清理该周的记录条目以控制日志大小"""
+        with self.lock:
+            if week_id not in self.journal['closed_weeks']:
+                self.journal['closed_weeks'].append(week_id)
+            prefix = f"{week_id}/"
+            for section in ('records', 'skipped'):
+                for record_id in [r for r in self.journal[section] if r.startswith(prefix)]:
+                    del self.journal[section][record_id]
+
+    def get_upload_session(self, file_hash: str) -> str:
+        """返回该内容未完成的分块上传会话ID，没有则返回None"""
+        with self.lock:
+            return self.journal['uploads'].get(file_hash)
+
+    def set_upload_session(self, file_hash: str, upload_id: str):
+        """记录分块上传会话ID，程序重启后可继续上传"""
+        with self.lock:
+            self.journal['uploads'][file_hash] = upload_id
+        self.save()
+
+    def clear_upload_session(self, file_hash: str):
+        with self.lock:
+            self.journal['uploads'].pop(file_hash, None)
+        self.save()
+
+    def pending_sessions(self, intervals: list) -> list:
+        """返回尚未上传或结束时间已变化的计时会话
+
+        Args:
+            intervals: 本地保存的会话区间 [{'start': ..., 'end': ...}, ...]
+        """
+        with self.lock:
+            synced = self.journal['sessions']
+            # 本地已清理的旧会话不再需要记录
+            starts = {interval['start'] for interval in intervals}
+            for start in [s for s in synced if s not in starts]:
+                del synced[start]
+            return [interval for interval in intervals if synced.get(interval['start']) != interval['end']]
+
+    def mark_sessions_uploaded(self, intervals: list):
+        """记录服务器已确认接收的计时会话"""
+        with self.lock:
+            for interval in intervals:
+                self.journal['sessions'][interval['start']] = interval['end']
+
+    def pending_weeks(self, entries: list) -> list:
+        """返回服务器尚未确认或时长已变化的周统计
+
+        Args:
+            entries: 周统计 [{'year', 'week', 'weekday_seconds', 'weekend_seconds'}, ...]
+        """
+        with self.lock:
+            acked = self.journal['weeks']
+            return [entry for entry in entries
+                    if acked.get(f"{entry['year']}_{entry['week']:02d}") != [entry['weekday_seconds'], entry['weekend_seconds']]]
+
+    def mark_weeks_uploaded(self, entries: list):
+        """记录服务器已确认的周统计时长"""
+        with self.lock:
+            for entry in entries:
+                self.journal['weeks'][f"{entry['year']}_{entry['week']:02d}"] = [entry['weekday_seconds'], entry['weekend_seconds']]
+
+    def try_claim(self, record_id: str) -> bool:
+        """占用一条记录用于上传，已被占用时返回False"""
+        with self.lock:
+            if record_id in self.claimed:
+                return False
+            self.claimed.add(record_id)
+            return True
+
+    def release(self, record_id: str):
+        with self.lock:
+            self.claimed.discard(record_id)
+
+    def pending_artifacts(self, record_id: str, timestamp_dir_path: str) -> list:
+        """返回记录目录中存在但尚未上传（也未被跳过）的文件名"""
+        return [
+            artifact for artifact in self.RECORD_ARTIFACTS
+            if not self.is_uploaded(record_id, artifact)
+            and not self.is_skipped(record_id, artifact)
+            and os.path.exists(os.path.join(timestamp_dir_path, artifact))
+        ]
+
+    def read_upload_items(self, decrypt, record_id: str, timestamp_dir_path: str, artifacts: list):
+        """解密记录中的文件并生成上传条目
+
+        加密文件中保存的已经是WebP图像或JSON数据，解密后直接上传，无需重新编码。
+        解密失败的文件（损坏或使用了其他密钥）记为永久跳过并立即保存日志。
+
+        Args:
+            decrypt: 解密函数，接收加密文件路径并返回原始字节（MonitorSystem.decrypt_bytes）
+            record_id: 记录ID
+            timestamp_dir_path: 记录目录路径
+            artifacts: 需要上传的文件名列表
+
+        Returns:
+            tuple: (上传条目列表, 对应的 (record_id, 文件名) 列表, 本次解密失败并被跳过的文件数)
+        """
+        timestamp_dir_name = os.path.basename(timestamp_dir_path)
+        items, keys, failed = [], [], 0
+        for artifact in artifacts:
+            upload_name, file_type = self.UPLOAD_ARTIFACTS[artifact]
+            data = decrypt(os.path.join(timestamp_dir_path, artifact))
+            if not data:
+                logging.warning(f"无法解密 {record_id}/{artifact}，之后将跳过该文件")
+                self.mark_skipped(record_id, artifact)
+                failed += 1
+                continue
+            items.append({
+                'data': data,
+                'filename': f"{timestamp_dir_name}_{upload_name}",
+                'file_type': file_type,
+                'record': timestamp_dir_name
+            })
+            keys.append((record_id, artifact))
+        if failed:
+            self.save()
+        return items, keys, failed
+
+    def scan_pending(self, records_dir: str, current_week_id: str) -> list:
+        """扫描尚未上传完成的记录
+
+        已关闭的周直接跳过；历史周（非当前周）如果所有文件都已上传，
+        会在本次扫描中被关闭。
+
+        Args:
+            records_dir: 本地记录根目录
+            current_week_id: 当前周ID（YYYY_WW），当前周仍会产生新记录，不会被关闭
+
+        Returns:
+            list: [(record_id, 时间戳目录路径, 待上传文件名列表), ...]，按时间顺序排列
+        """
+        pending = []
+        for week_id in sorted(os.listdir(records_dir)):
+            week_dir_path = os.path.join(records_dir, week_id)
+            if not os.path.isdir(week_dir_path) or self.is_week_closed(week_id):
+                continue
+
+            week_pending = []
+            for timestamp_name in sorted(os.listdir(week_dir_path)):
+                timestamp_dir_path = os.path.join(week_dir_path, timestamp_name)
+                if not os.path.isdir(timestamp_dir_path):
+                    continue
+                record_id = self.record_id(week_id, timestamp_name)
+                artifacts = self.pending_artifacts(record_id, timestamp_dir_path)
+                if artifacts:
+                    week_pending.append((record_id, timestamp_dir_path, artifacts))
+
+            if week_pending:
+                pending.extend(week_pending)
+            elif week_id != current_week_id:
+                self.close_week(week_id)
+
+        self.save()
+        return pending
@@ -8,11 +8,28 @@ import webbrowser
 import datetime
 import json
 import logging
-import shutil
 from auth_client import AuthClient
 from auth_gui import AuthGUI
+from file_sync import FileSyncManager
+from sync_service import SyncService
 
 class MonitoringGUI:
+    # 批量上传时每个请求包含的记录数
+    UPLOAD_BATCH_RECORDS = 20
+
+    # 每次请求上传的计时会话数
+    UPLOAD_SESSION_BATCH = 200
+
+    # 上传限速选项（显示文本, 字节/秒），0 表示不限速
+    BANDWIDTH_OPTIONS = [
+        ("不限速", 0),
+        ("128 KB/s", 128 * 1024),
+        ("256 KB/s", 256 * 1024),
+        ("512 KB/s", 512 * 1024),
+        ("1 MB/s", 1024 * 1024),
+        ("2 MB/s", 2 * 1024 * 1024),
+    ]
+    
     def __init__(self, root, auth_client=None):
         """初始化监控界面
         
@@ -29,7 +46,7 @@ class MonitoringGUI:
             return
             
         self.root.title(f"线上工作打卡控制面板 - {self.auth_client.get_username()}")
-        self.root.geometry("600x800")  # 增加高度以容纳周末时间显示
+        self.root.geometry("600x840")  # 增加高度以容纳周末时间显示
         self.root.resizable(False, False)
         
         # 初始化检测系统（固定30分钟间隔）
@@ -40,6 +57,15 @@ class MonitoringGUI:
         # 项目根目录
         self.project_dir = os.path.dirname(os.path.abspath(__file__))
         
+        # 上传日志（按用户区分），记录已被服务器确认的文件
+        journal_file = os.path.join(self.monitor.SAVE_DIR, f"upload_journal_{self.auth_client.get_uid()}.json")
+        self.sync_manager = FileSyncManager(journal_file)
+        self.auth_client.set_sync_manager(self.sync_manager)
+        
+        # 后台自动同步服务（默认关闭，由界面开关控制）
+        self.sync_service = SyncService(self.auth_client, self.monitor, self.sync_manager)
+        self.sync_service.set_status_callback(self.update_sync_status)
+        
         self._create_widgets()
         self._center_window()
         
@@ -192,6 +218,34 @@ class MonitoringGUI:
         self.upload_status_label = ttk.Label(upload_frame, text="未上传服务器", style='Info.TLabel')
         self.upload_status_label.pack(pady=5, fill=tk.X, expand=True)
         
+        # 自动同步开关：每条记录保存后在后台陆续上传
+        self.auto_sync_var = tk.BooleanVar(value=False)
+        auto_sync_check = ttk.Checkbutton(
+            upload_frame,
+            text="自动同步（记录保存后自动上传）",
+            variable=self.auto_sync_var,
+            command=self.toggle_auto_sync
+        )
+        auto_sync_check.pack(padx=10, anchor=tk.W)
+        
+        # 上传限速：手动上传和自动同步的所有上传线程共用该上限，设置保存在本地配置文件中
+        limit_frame = ttk.Frame(upload_frame)
+        limit_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        limit_label = ttk.Label(limit_frame, text="上传限速:", width=15)
+        limit_label.pack(side=tk.LEFT)
+        
+        current_limit = self.auth_client.get_bandwidth_limit()
+        limit_text = next((text for text, value in self.BANDWIDTH_OPTIONS if value == current_limit),
+                          f"{current_limit // 1024} KB/s")
+        self.bandwidth_var = tk.StringVar(value=limit_text)
+        bandwidth_combo = ttk.Combobox(limit_frame, textvariable=self.bandwidth_var,
+                                       values=[text for text, _ in self.BANDWIDTH_OPTIONS],
+                                       state="readonly",
+                                       width=12)
+        bandwidth_combo.pack(side=tk.LEFT, padx=5)
+        bandwidth_combo.bind("<<ComboboxSelected>>", self.on_bandwidth_changed)
+        
         # 添加历史数据查看框架 - 只保留周统计数据
         history_frame = ttk.LabelFrame(main_frame, text="历史数据", padding="10")
         history_frame.pack(fill=tk.X, pady=10)
@@ -224,6 +278,9 @@ class MonitoringGUI:
         
         # 存储周数据备用
         self.available_weeks = available_weeks
+
+        # 周列表发生变化时才刷新下拉框
+        self.monitor.set_weeks_callback(self.on_weeks_changed)
         
         # 初始更新周统计显示
         if available_weeks:
@@ -253,156 +310,65 @@ class MonitoringGUI:
                 foreground="blue"
             ))
             
-            # 获取当前周的加密统计文件 (.enc)
-            current_week_enc_file = self.monitor.current_week_file
+            # 同步所有自上次确认后有变化的周（包括离线期间未上传的往周）
+            success, message, uploaded = self.auth_client.sync_weekly_stats(self.monitor.get_available_weeks())
+            if not success:
+                self.root.after(0, lambda: self.upload_status_label.config(
+                    text=f"周统计数据上传失败: {message}",
+                    foreground="red"
+                ))
+                return
+            self.root.after(0, lambda: self.upload_status_label.config(
+                text=f"{message}，正在上传图像...",
+                foreground="blue"
+            ))
+            
+            # 上传计时会话区间，服务器据此统计每天的实际工作时段
+            sessions = self.sync_manager.pending_sessions(self.monitor.get_session_intervals())
+            for i in range(0, len(sessions), self.UPLOAD_SESSION_BATCH):
+                session_batch = sessions[i:i + self.UPLOAD_SESSION_BATCH]
+                success, message, _ = self.auth_client.upload_activity_sessions(session_batch)
+                if not success:
+                    logging.error(f"计时会话上传失败: {message}")
+                    break
+                self.sync_manager.mark_sessions_uploaded(session_batch)
+            self.sync_manager.save()
             
-            # 创建临时文件用于上传
-            temp_stats_file = None
+            # 上传records目录中的记录，根据上传日志只处理新增或上次失败的文件
+            pending_records = self.sync_manager.scan_pending(self.monitor.RECORDS_DIR, self.monitor.current_week_id)
             
-            # 如果加密文件存在，解密并创建临时JSON文件用于上传
-            if os.path.exists(current_week_enc_file):
-                try:
-                    stats_data = self.monitor.decrypt_file(current_week_enc_file)
-                    if stats_data:
-                        temp_dir = os.path.join(self.monitor.SAVE_DIR, "temp_upload")
-                        if not os.path.exists(temp_dir):
-                            os.makedirs(temp_dir)
-                            
-                        temp_stats_file = os.path.join(temp_dir, f"temp_weekly_stats.json")
-                        with open(temp_stats_file, 'w', encoding='utf-8') as f:
-                            json.dump(stats_data, f, ensure_ascii=False, indent=2)
-                except Exception as e:
-                    logging.error(f"解密统计文件出错: {e}")
-            
-            # 上传临时统计文件
-            if temp_stats_file and os.path.exists(temp_stats_file):
-                success, message, _ = self.auth_client.upload_weekly_stats(temp_stats_file)
-                
-                # 删除临时文件
-                try:
-                    os.remove(temp_stats_file)
-                except:
-                    pass
-                
+            # 按批次并发上传，每批包含多条记录的全部文件，减少请求次数
+            counters = {'uploaded': 0, 'failed': 0}
+            
+            def on_batch_result(batch, result, error):
+                """在上传线程中汇总每批结果，服务器确认的文件写入上传日志"""
+                batch_items, batch_keys = batch
+                success, message, results = result if result else (False, str(error), [])
                 if not success:
-                    self.root.after(0, lambda: self.upload_status_label.config(
-                        text=f"周统计数据上传失败: {message}",
-                        foreground="red"
-                    ))
-                    # 删除临时目录并返回
-                    try:
-                        shutil.rmtree(os.path.dirname(temp_stats_file))
-                    except:
-                        pass
-                    return
-                else:
-                    self.root.after(0, lambda: self.upload_status_label.config(
-                        text="周统计数据上传成功，正在上传图像...",
-                        foreground="blue"
-                    ))
-            else:
-                self.root.after(0, lambda: self.upload_status_label.config(
-                    text="未找到周统计数据，继续上传图像...",
+                    logging.error(f"批量上传失败: {message}")
+                for index, (record_id, artifact) in enumerate(batch_keys):
+                    if index < len(results) and results[index]['success']:
+                        counters['uploaded'] += 1
+                        self.sync_manager.mark_uploaded(record_id, artifact, results[index]['file_path'])
+                    else:
+                        counters['failed'] += 1
+                for record_id in {key[0] for key in batch_keys}:
+                    self.sync_manager.release(record_id)
+                
+                # 每批处理完后保存上传日志，中途退出也不会重复上传
+                self.sync_manager.save()
+                self.root.after(0, lambda n=counters['uploaded']: self.upload_status_label.config(
+                    text=f"已上传 {n} 个文件...",
                     foreground="blue"
                 ))
             
-            # 创建临时目录用于解密文件
-            temp_dir = os.path.join(self.monitor.SAVE_DIR, "temp_upload")
-            if not os.path.exists(temp_dir):
-                os.makedirs(temp_dir)
-            
-            # 上传records目录中的记录
-            uploaded_files = 0
-            failed_uploads = 0
-            
-            # 遍历记录目录
-            for week_dir_name in os.listdir(self.monitor.RECORDS_DIR):
-                week_dir_path = os.path.join(self.monitor.RECORDS_DIR, week_dir_name)
-                if os.path.isdir(week_dir_path):
-                    # 遍历该周目录下的所有时间戳目录
-                    for timestamp_dir_name in os.listdir(week_dir_path):
-                        timestamp_dir_path = os.path.join(week_dir_path, timestamp_dir_name)
-                        if os.path.isdir(timestamp_dir_path):
-                            # 清理临时文件
-                            for temp_file in os.listdir(temp_dir):
-                                try:
-                                    os.remove(os.path.join(temp_dir, temp_file))
-                                except:
-                                    pass
-
-                            # 上传截图（一定是加密文件）
-                            screenshot_enc_path = os.path.join(timestamp_dir_path, "screenshot.enc")
-                            temp_screenshot_path = None
-                            
-                            # 解密截图并保存为临时文件 (使用WebP格式，保持50%的尺寸)
-                            if os.path.exists(screenshot_enc_path):
-                                try:
-                                    screenshot_img = self.monitor.decrypt_image(screenshot_enc_path)
-                                    if screenshot_img:
-                                        # 图像已经在monitor.py中被缩小到50%，保持这个尺寸
-                                        temp_screenshot_path = os.path.join(temp_dir, f"{timestamp_dir_name}_screenshot.webp")
-                                        screenshot_img.save(temp_screenshot_path, format="WebP", quality=90)
-                                except Exception as e:
-                                    logging.error(f"解密截图出错: {e}")
-                            
-                            # 上传解密后的截图
-                            if temp_screenshot_path and os.path.exists(temp_screenshot_path):
-                                success, message, file_path = self.auth_client.upload_file(temp_screenshot_path, "screenshot")
-                                if success:
-                                    uploaded_files += 1
-                                else:
-                                    failed_uploads += 1
-                            
-                            # 上传摄像头图像（一定是加密文件）
-                            camera_enc_path = os.path.join(timestamp_dir_path, "camera.enc")
-                            temp_camera_path = None
-                            
-                            # 解密摄像头图像并保存为临时文件
-                            if os.path.exists(camera_enc_path):
-                                try:
-                                    camera_img = self.monitor.decrypt_image(camera_enc_path, "WebP")
-                                    if camera_img:
-                                        temp_camera_path = os.path.join(temp_dir, f"{timestamp_dir_name}_camera.webp")
-                                        camera_img.save(temp_camera_path, format="WebP")
-                                except Exception as e:
-                                    logging.error(f"解密摄像头图片出错: {e}")
-                            
-                            # 上传解密后的摄像头图像
-                            if temp_camera_path and os.path.exists(temp_camera_path):
-                                success, message, file_path = self.auth_client.upload_file(temp_camera_path, "camera")
-                                if success:
-                                    uploaded_files += 1
-                                else:
-                                    failed_uploads += 1
-                                    
-                            # 上传信息文件（一定是加密文件）
-                            info_enc_path = os.path.join(timestamp_dir_path, "info.enc")
-                            temp_info_path = None
-                            
-                            # 解密信息文件并保存为临时文件
-                            if os.path.exists(info_enc_path):
-                                try:
-                                    info_data = self.monitor.decrypt_file(info_enc_path)
-                                    if info_data:
-                                        temp_info_path = os.path.join(temp_dir, f"{timestamp_dir_name}_info.json")
-                                        with open(temp_info_path, 'w', encoding='utf-8') as f:
-                                            json.dump(info_data, f, ensure_ascii=False, indent=2)
-                                except Exception as e:
-                                    logging.error(f"解密信息文件出错: {e}")
-                            
-                            # 上传解密后的信息文件
-                            if temp_info_path and os.path.exists(temp_info_path):
-                                success, message, file_path = self.auth_client.upload_file(temp_info_path, "info")
-                                if success:
-                                    uploaded_files += 1
-                                else:
-                                    failed_uploads += 1
-            
-            # 清理临时目录
-            try:
-                shutil.rmtree(temp_dir)
-            except:
-                pass
+            self.auth_client.run_upload_queue(
+                self._iter_upload_batches(pending_records, counters),
+                lambda batch: self.auth_client.upload_batch(batch[0]),
+                on_batch_result
+            )
+            uploaded_files = counters['uploaded']
+            failed_uploads = counters['failed']
             
             # 更新UI
             if failed_uploads > 0:
@@ -410,6 +376,11 @@ class MonitoringGUI:
                     text=f"成功上传 {uploaded_files} 个文件，{failed_uploads} 个文件上传失败",
                     foreground="orange"
                 ))
+            elif uploaded_files == 0:
+                self.root.after(0, lambda: self.upload_status_label.config(
+                    text="没有需要上传的新文件",
+                    foreground="green"
+                ))
             else:
                 self.root.after(0, lambda: self.upload_status_label.config(
                     text=f"成功上传 {uploaded_files} 个文件",
@@ -424,9 +395,64 @@ class MonitoringGUI:
             # 重新启用上传按钮
             self.root.after(0, lambda: self.upload_btn.config(state=tk.NORMAL))
             
+    def _iter_upload_batches(self, pending_records, counters):
+        """按需解密待上传的记录文件并分批生成上传任务
+        
+        Args:
+            pending_records: FileSyncManager.scan_pending 返回的待上传记录
+            counters: 上传计数，解密失败的文件计入失败数
+            
+        Yields:
+            tuple: (上传条目列表, 对应的 (record_id, 文件名) 列表)
+        """
+        for start in range(0, len(pending_records), self.UPLOAD_BATCH_RECORDS):
+            batch_items = []
+            batch_keys = []
+            
+            for record_id, timestamp_dir_path, artifacts in pending_records[start:start + self.UPLOAD_BATCH_RECORDS]:
+                # 跳过正在被自动同步上传的记录
+                if not self.sync_manager.try_claim(record_id):
+                    continue
+                items, keys, failed = self.sync_manager.read_upload_items(
+                    self.monitor.decrypt_bytes, record_id, timestamp_dir_path, artifacts)
+                counters['failed'] += failed
+                batch_items.extend(items)
+                batch_keys.extend(keys)
+                if not items:
+                    self.sync_manager.release(record_id)
+            
+            if batch_items:
+                yield batch_items, batch_keys
+            
+    def toggle_auto_sync(self):
+        """开启或关闭自动同步"""
+        if self.auto_sync_var.get():
+            self.sync_service.start()
+            self.monitor.set_record_callback(self.sync_service.enqueue)
+            self.upload_status_label.config(text="自动同步已开启", foreground="blue")
+        else:
+            self.monitor.set_record_callback(None)
+            self.sync_service.stop()
+            self.upload_status_label.config(text="自动同步已关闭", foreground="gray")
+            
+    def on_bandwidth_changed(self, event=None):
+        """修改上传带宽上限，立即对正在进行的上传生效"""
+        limit = dict(self.BANDWIDTH_OPTIONS).get(self.bandwidth_var.get(), 0)
+        self.auth_client.set_bandwidth_limit(limit)
+        logging.info(f"上传限速已设置为: {self.bandwidth_var.get()}")
+            
+    def update_sync_status(self, uploaded_files, success):
+        """更新自动同步状态显示"""
+        text = f"自动同步: 已上传 {uploaded_files} 个文件" if success else f"自动同步: 上传失败，稍后重试（已上传 {uploaded_files} 个文件）"
+        self.root.after(0, lambda: self.upload_status_label.config(
+            text=text,
+            foreground="green" if success else "orange"
+        ))
+            
     def logout(self):
         """用户登出"""
         if messagebox.askokcancel("登出", "确定要登出吗？"):
+            self.sync_service.stop()
             if self.monitor.running:
                 self.monitor.stop()
             self.auth_client.logout()
@@ -449,8 +475,10 @@ class MonitoringGUI:
             
     def view_week_stats(self):
         """查看所选周的统计数据"""
+        # 周数据来自索引缓存，只会重新读取有变化的统计文件
+        self.available_weeks = self.monitor.get_available_weeks()
         selected_index = self.week_combo.current()
-        if selected_index < 0 or not self.available_weeks:
+        if selected_index < 0 or selected_index >= len(self.available_weeks):
             messagebox.showinfo("提示", "没有可用的周统计数据")
             return
             
@@ -543,30 +571,34 @@ class MonitoringGUI:
         stats = self.monitor.get_stats()
         self._update_stats_labels(stats['today'], stats['week'], stats['weekend'])
         
-        # 更新可用周列表
-        if hasattr(self, 'week_combo') and self.week_combo:
-            self.available_weeks = self.monitor.get_available_weeks()
-            week_display_values = [f"{w['week_start_str']} 开始" for w in self.available_weeks] if self.available_weeks else ["无数据"]
-            self.week_combo.config(values=week_display_values)
-            current_week_start = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
-            
-            # 如果当前选择不在列表中，则选择匹配当前周的项或第一项
-            if self.week_var.get() not in week_display_values:
-                # 尝试找到当前周
-                current_week_found = False
-                for i, week in enumerate(self.available_weeks):
-                    if week['date'] == current_week_start:
-                        self.week_var.set(week_display_values[i])
-                        current_week_found = True
-                        break
-                
-                # 如果没找到当前周，选择第一项
-                if not current_week_found and week_display_values and week_display_values[0] != "无数据":
-                    self.week_var.set(week_display_values[0])
-                    
         # 每秒更新一次
         self.root.after(1000, self.update_stats_display)
         
+    def on_weeks_changed(self, weeks):
+        """可用周列表变化时由 MonitorSystem 调用（可能在后台线程中）"""
+        self.root.after(0, lambda: self._refresh_week_combo(weeks))
+
+    def _refresh_week_combo(self, weeks):
+        """刷新周选择下拉框"""
+        self.available_weeks = weeks
+        week_display_values = [f"{w['week_start_str']} 开始" for w in weeks] if weeks else ["无数据"]
+        self.week_combo.config(values=week_display_values)
+        current_week_start = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+        
+        # 如果当前选择不在列表中，则选择匹配当前周的项或第一项
+        if self.week_var.get() not in week_display_values:
+            # 尝试找到当前周
+            current_week_found = False
+            for i, week in enumerate(weeks):
+                if week['date'] == current_week_start:
+                    self.week_var.set(week_display_values[i])
+                    current_week_found = True
+                    break
+            
+            # 如果没找到当前周，选择第一项
+            if not current_week_found and week_display_values and week_display_values[0] != "无数据":
+                self.week_var.set(week_display_values[0])
+
     def start_monitoring(self):
         """开始检测 - 使用固定30分钟间隔"""
         try:
@@ -606,10 +638,12 @@ class MonitoringGUI:
         """窗口关闭时的处理"""
         if self.monitor.running:
             if messagebox.askokcancel("退出", "检测正在进行中，确定退出吗？"):
+                self.sync_service.stop()
                 self.monitor.stop()
                 self.monitor.cleanup()
                 self.root.destroy()
         else:
+            self.sync_service.stop()
             self.monitor.cleanup()
             self.root.destroy()
 
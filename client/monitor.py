@@ -8,6 +8,7 @@ from PIL import Image, ImageGrab
 import numpy as np
 import logging
 import threading
+import concurrent.futures
 import shutil
 import glob
 import base64
@@ -19,6 +20,7 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import getpass
 import socket
+from camera_manager import CameraManager
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
@@ -43,11 +45,27 @@ def generate_encryption_key(salt=None):
     return key
 
 class MonitorSystem:
-    def __init__(self, interval=600):
+    # 检测间隔不超过该值（秒）时，两次采集之间保持摄像头打开
+    CAMERA_KEEP_OPEN_INTERVAL = 120
+
+    # 一次记录中等待采集完成的最长时间（秒），超时的部分本次不保存
+    CAPTURE_TIMEOUT = 5
+
+    # 一次记录中等待编码、加密和写入完成的最长时间（秒）
+    STORE_TIMEOUT = 30
+
+    # 本地保留的计时会话区间天数
+    SESSION_RETENTION_DAYS = 90
+
+    # 记录文件在日志中的名称
+    ARTIFACT_LABELS = {'camera': '摄像头图像', 'screenshot': '屏幕截图', 'info': '记录数据'}
+
+    def __init__(self, interval=600, keep_camera_open=None):
         """初始化检测系统
         
         Args:
             interval: 检测间隔时间（秒）
+            keep_camera_open: 两次采集之间是否保持摄像头打开，None 表示根据检测间隔自动决定
         """
         # 初始化加密密钥
         self.encryption_key = generate_encryption_key()
@@ -90,6 +108,32 @@ class MonitorSystem:
         self.paused = False
         self.thread = None
         self.status_callback = None
+        self.record_callback = None
+        self.weeks_callback = None
+
+        # 计时会话区间（每段连续计时的开始和结束时间），上传后用于服务器按天统计
+        self.SESSIONS_FILE = os.path.join(self.SAVE_DIR, "sessions.enc")
+        self.session_lock = threading.Lock()
+        self.session_intervals = self._load_session_intervals()
+
+        # 周统计索引缓存：周ID -> (文件签名, 周信息)，文件未变化时不再重复解密
+        self.week_index = {}
+        self.week_index_lock = threading.Lock()
+        self.week_list_key = None
+
+        # 摄像头管理：间隔较短时保持设备打开，否则每次采集时打开并预热
+        if keep_camera_open is None:
+            keep_camera_open = interval <= self.CAMERA_KEEP_OPEN_INTERVAL
+        self.camera = CameraManager(keep_open=keep_camera_open)
+
+        # 记录保存流水线：采集、编码/缩放、加密、写入在线程池中并发执行，
+        # 整条记录也在单独的线程中保存，检测循环不会被阻塞
+        self.capture_executor = None
+        self.store_executor = None
+        self.record_executor = None
+        self.record_future = None
+        self._create_executors()
+        self.last_capture_timings = {}
         
         # 计时相关变量
         self.start_time = None
@@ -118,6 +162,10 @@ class MonitorSystem:
     def set_stats_callback(self, callback):
         """设置统计数据回调函数"""
         self.stats_callback = callback
+        
+    def set_record_callback(self, callback):
+        """设置记录保存回调函数，每保存一条记录后以记录目录路径调用（用于自动同步）"""
+        self.record_callback = callback
 
     def is_weekend(self, date=None):
         """判断给定日期是否为周末（周六或周日）
@@ -134,23 +182,7 @@ class MonitorSystem:
 
     def capture_camera(self):
         """捕获摄像头画面"""
-        try:
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                logging.error("无法打开摄像头")
-                return None
-            
-            ret, frame = cap.read()
-            cap.release()
-            
-            if ret:
-                return frame
-            else:
-                logging.error("无法捕获摄像头画面")
-                return None
-        except Exception as e:
-            logging.error(f"捕获摄像头时出错: {e}")
-            return None
+        return self.camera.capture()
 
     def get_active_applications(self):
         """获取当前运行的应用程序列表"""
@@ -177,91 +209,190 @@ class MonitorSystem:
             logging.error(f"截取屏幕截图时出错: {e}")
             return None
 
+    @staticmethod
+    def _timed(timings, stage, func, *args):
+        """执行func并把耗时（秒）记录到timings[stage]"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[stage] = round(time.perf_counter() - start, 3)
+
+    @staticmethod
+    def _encode_camera(camera_frame):
+        """将摄像头画面编码为WebP"""
+        camera_image = cv2.cvtColor(camera_frame, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(camera_image)
+        img_bytes = io.BytesIO()
+        pil_image.save(img_bytes, format="WebP", quality=85)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _encode_screenshot(screenshot):
+        """将屏幕截图缩小到50%尺寸并编码为WebP"""
+        pil_screenshot = Image.fromarray(screenshot)
+        original_width, original_height = pil_screenshot.size
+        # 调整图像尺寸，使用LANCZOS重采样以保持较好的质量
+        pil_screenshot = pil_screenshot.resize(
+            (original_width // 2, original_height // 2), Image.LANCZOS)
+        img_bytes = io.BytesIO()
+        pil_screenshot.save(img_bytes, format="WebP", quality=90)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _encode_record(record_data):
+        return json.dumps(record_data, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _write_file(file_path, data):
+        with open(file_path, "wb") as f:
+            f.write(data)
+
+    def _store_artifact(self, timings, name, encode, raw, file_path):
+        """编码、加密并写入一个记录文件"""
+        data = self._timed(timings, f"encode_{name}", encode, raw)
+        encrypted_data = self._timed(timings, f"encrypt_{name}", self.cipher.encrypt, data)
+        self._timed(timings, f"write_{name}", self._write_file, file_path, encrypted_data)
+        logging.info(f"已加密保存{self.ARTIFACT_LABELS[name]}到 {file_path}")
+
+    def _create_executors(self):
+        """创建记录保存流水线使用的线程池
+
+        采集和保存使用不同的线程池，卡住的采集（如摄像头无响应）不会占用编码、加密和写入的线程。
+        """
+        self.capture_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=3, thread_name_prefix='capture')
+        self.store_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=3, thread_name_prefix='store')
+        self.record_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='record')
+        self.capture_futures = {}
+
+    def _shutdown_executors(self, timeout):
+        """等待正在保存的记录完成（最多 timeout 秒），然后关闭流水线线程池"""
+        if self.record_future is not None:
+            try:
+                self.record_future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                logging.warning("等待记录保存超时，未完成的记录将被放弃")
+            except Exception:
+                pass  # 错误已在 _record_once 中记录
+            self.record_future = None
+        for executor in (self.record_executor, self.store_executor, self.capture_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self.record_executor = self.store_executor = self.capture_executor = None
+
     def save_monitoring_data(self):
-        """保存检测数据 - 使用新的记录结构保存到周目录中，加密存储数据"""
+        """保存检测数据 - 使用新的记录结构保存到周目录中，加密存储数据
+
+        摄像头、屏幕截图和进程列表并发采集，最多等待 CAPTURE_TIMEOUT 秒，
+        保证记录时间与画面内容一致；每项采集完成后立即进入编码、加密和写入阶段，
+        写入最多等待 STORE_TIMEOUT 秒。各阶段耗时保存在 last_capture_timings 中。
+        """
+        started = time.perf_counter()
+        now = datetime.datetime.now()
+
         # 创建时间戳目录
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         timestamp_dir = os.path.join(self.current_week_dir, timestamp)
         if not os.path.exists(timestamp_dir):
             os.makedirs(timestamp_dir)
-        
+
+        timings = {}
+        capture_tasks = {
+            'camera': self.capture_camera,
+            'screenshot': self.capture_screenshot,
+            'apps': self.get_active_applications,
+        }
+        captures = {}
+        for name, func in capture_tasks.items():
+            # 上一次采集仍未返回（例如摄像头卡住）时本次跳过，避免任务堆积
+            previous = self.capture_futures.get(name)
+            if previous is not None and not previous.done():
+                logging.warning(f"上一次{name}采集尚未完成，本次跳过")
+                continue
+            future = self.capture_executor.submit(self._timed, timings, f"capture_{name}", func)
+            self.capture_futures[name] = future
+            captures[future] = name
+
+        # 采集完成一项就提交一项后续处理
+        stores = []
+        apps = []
+        encoders = {
+            'camera': (self._encode_camera, "camera.enc"),
+            'screenshot': (self._encode_screenshot, "screenshot.enc"),
+        }
+        try:
+            for future in concurrent.futures.as_completed(captures, timeout=self.CAPTURE_TIMEOUT):
+                name = captures[future]
+                result = future.result()
+                if name == 'apps':
+                    apps = result
+                elif result is not None:
+                    encode, file_name = encoders[name]
+                    stores.append(self.store_executor.submit(
+                        self._store_artifact, timings, name, encode, result,
+                        os.path.join(timestamp_dir, file_name)))
+        except concurrent.futures.TimeoutError:
+            late = [name for future, name in captures.items() if not future.done()]
+            logging.warning(f"采集超时，本次记录不包含: {', '.join(late)}")
+        timings['capture'] = round(time.perf_counter() - started, 3)
+
         # 创建统一的记录数据结构
         record_data = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "formatted_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp": now.isoformat(),
+            "formatted_time": now.strftime("%Y-%m-%d %H:%M:%S"),
             "is_weekend": self.is_weekend(),
             "session_duration": int(self.current_session_time) if self.current_session_time else 0,
-            "apps": self.get_active_applications()
+            "apps": apps
         }
-        
-        # 保存摄像头画面 (使用WebP格式)
-        camera_frame = self.capture_camera()
-        if camera_frame is not None:
-            camera_image = cv2.cvtColor(camera_frame, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(camera_image)
-            
-            # 将图像保存到内存中
-            img_bytes = io.BytesIO()
-            pil_image.save(img_bytes, format="WebP", quality=85)
-            img_bytes.seek(0)
-            
-            # 加密图像数据
-            encrypted_data = self.cipher.encrypt(img_bytes.getvalue())
-            
-            # 保存加密后的图像数据
-            camera_file = os.path.join(timestamp_dir, "camera.enc")
-            with open(camera_file, "wb") as f:
-                f.write(encrypted_data)
-            logging.info(f"已加密保存摄像头图像到 {camera_file}")
-        
-        # 保存屏幕截图 (改为使用WebP格式而不是PNG，并缩小到50%尺寸)
-        screenshot = self.capture_screenshot()
-        if screenshot is not None:
-            pil_screenshot = Image.fromarray(screenshot)
-            
-            # 获取原始尺寸
-            original_width, original_height = pil_screenshot.size
-            # 调整到50%尺寸
-            new_width, new_height = original_width // 2, original_height // 2
-            # 调整图像尺寸，使用LANCZOS重采样以保持较好的质量
-            pil_screenshot = pil_screenshot.resize((new_width, new_height), Image.LANCZOS)
-            
-            # 将缩小后的截图保存到内存中，使用WebP格式
-            img_bytes = io.BytesIO()
-            pil_screenshot.save(img_bytes, format="WebP", quality=90)
-            img_bytes.seek(0)
-            
-            # 加密截图数据
-            encrypted_data = self.cipher.encrypt(img_bytes.getvalue())
-            
-            # 保存加密后的截图数据
-            screenshot_file = os.path.join(timestamp_dir, "screenshot.enc")
-            with open(screenshot_file, "wb") as f:
-                f.write(encrypted_data)
-            logging.info(f"已加密保存屏幕截图到 {screenshot_file} (已缩小到50%尺寸)")
-        
-        # 加密并保存记录数据
-        record_file = os.path.join(timestamp_dir, "info.enc")
-        json_data = json.dumps(record_data, ensure_ascii=False).encode('utf-8')
-        encrypted_json = self.cipher.encrypt(json_data)
-        
-        with open(record_file, "wb") as f:
-            f.write(encrypted_json)
-        logging.info(f"已加密保存记录数据到 {record_file}")
+        stores.append(self.store_executor.submit(
+            self._store_artifact, timings, 'info', self._encode_record, record_data,
+            os.path.join(timestamp_dir, "info.enc")))
+
+        done, not_done = concurrent.futures.wait(stores, timeout=self.STORE_TIMEOUT)
+        for future in done:
+            error = future.exception()
+            if error:
+                logging.error(f"保存记录文件时出错: {error}")
+        if not_done:
+            logging.warning(f"保存记录文件超时，{len(not_done)} 个文件未写入完成: {timestamp_dir}")
+
+        timings['total'] = round(time.perf_counter() - started, 3)
+        self.last_capture_timings = timings
+        logging.info(f"记录保存耗时: {timings}")
         
         # 每次保存监控数据后也保存统计时长数据，防止意外中断导致数据丢失
         self.save_stats()
         logging.info("已更新统计时长数据")
+        
+        # 通知自动同步服务上传新记录
+        if self.record_callback:
+            try:
+                self.record_callback(timestamp_dir)
+            except Exception as e:
+                logging.error(f"记录保存回调出错: {e}")
+
+    def _record_once(self):
+        """在记录线程中保存一次检测数据"""
+        try:
+            if self.status_callback:
+                self.status_callback("正在记录...")
+            self.save_monitoring_data()
+            if self.status_callback and self.running and not self.paused:
+                self.status_callback("等待下一次记录")
+        except Exception as e:
+            logging.error(f"保存检测数据时出错: {e}")
 
     def _monitoring_loop(self):
-        """检测循环"""
+        """检测循环，记录在线程池中保存，循环本身只负责定时和检查状态"""
         while self.running:
             if not self.paused:
-                if self.status_callback:
-                    self.status_callback("正在记录...")
-                self.save_monitoring_data()
-                if self.status_callback:
-                    self.status_callback("等待下一次记录")
+                if self.record_future is not None and not self.record_future.done():
+                    logging.warning("上一次记录尚未保存完成，本次跳过")
+                else:
+                    self.record_future = self.record_executor.submit(self._record_once)
             
             # 每秒检查一次状态，这样可以及时响应暂停/恢复/停止
             for _ in range(self.interval):
@@ -309,100 +440,145 @@ class MonitorSystem:
             # 休眠一秒
             time.sleep(1)
                 
+    def set_weeks_callback(self, callback):
+        """设置周列表变化回调函数，可用周列表（新增或删除了某周）变化时以新列表调用"""
+        self.weeks_callback = callback
+
+    def _stats_file_signature(self, base_name):
+        """返回某周统计文件的签名（修改时间和大小），用于判断缓存是否失效"""
+        signature = []
+        for ext in ('.enc', '.json'):
+            try:
+                st = os.stat(os.path.join(self.STATS_DIR, f"{base_name}{ext}"))
+                signature.append((ext, st.st_mtime_ns, st.st_size))
+            except OSError:
+                pass
+        return tuple(signature)
+
+    def _build_week_info(self, base_name, file_path, stats=None):
+        """读取一周的统计文件并构建周信息
+
+        Args:
+            base_name: 周ID（YYYY_WW）
+            file_path: 统计文件路径
+            stats: 已有的统计数据，提供时不再读取文件
+
+        Returns:
+            dict: 周信息，文件名不是合法的周ID时返回None
+        """
+        # 从文件名中提取年份和周号 (YYYY_WW)
+        year_week_parts = base_name.split('_')
+        if len(year_week_parts) != 2:
+            return None
+        try:
+            year = int(year_week_parts[0])
+            week = int(year_week_parts[1])
+
+            # 计算该周的开始日期
+            first_day = datetime.date(year, 1, 1)
+            days_to_add = (week - 1) * 7
+            if first_day.weekday() != 0:  # 如果1月1日不是周一
+                days_to_add -= first_day.weekday()
+
+            week_start_date = first_day + datetime.timedelta(days=days_to_add)
+
+            if stats is None:
+                # 首先尝试加密文件
+                enc_file = os.path.join(self.STATS_DIR, f"{base_name}.enc")
+                if os.path.exists(enc_file):
+                    stats = self.decrypt_file(enc_file)
+
+                # 如果加密文件不存在或无法解密，尝试明文文件
+                if stats is None:
+                    json_file = os.path.join(self.STATS_DIR, f"{base_name}.json")
+                    if os.path.exists(json_file):
+                        with open(json_file, 'r', encoding='utf-8') as f:
+                            stats = json.load(f)
+
+            # 如果获取到数据，构建周信息
+            if stats:
+                return {
+                    'week_id': base_name,
+                    'year': year,
+                    'week_number': week,
+                    'date': week_start_date,
+                    'week_start': stats.get('week_start', ''),
+                    'week_start_str': stats.get('week_start_str', ''),
+                    'weekday_seconds': float(stats.get('weekday_seconds', 0)),
+                    'weekday': stats.get('weekday', '00:00:00'),
+                    'weekend_seconds': float(stats.get('weekend_seconds', 0)),
+                    'weekend': stats.get('weekend', '00:00:00'),
+                    'week_seconds': float(stats.get('weekday_seconds', 0)) + float(stats.get('weekend_seconds', 0)),
+                    'week': self.format_time(float(stats.get('weekday_seconds', 0)) + float(stats.get('weekend_seconds', 0))),
+                    'file_path': file_path
+                }
+
+            # 如果无法读取任何文件，添加基本信息
+            return {
+                'week_id': base_name,
+                'year': year,
+                'week_number': week,
+                'date': week_start_date,
+                'week_start': week_start_date.isoformat(),
+                'week_start_str': week_start_date.strftime("%Y年%m月%d日"),
+                'weekday': '00:00:00',
+                'weekend': '00:00:00',
+                'weekday_seconds': 0,
+                'weekend_seconds': 0,
+                'week_seconds': 0,
+                'week': '00:00:00',
+                'file_path': file_path
+            }
+        except Exception as e:
+            logging.error(f"处理周统计文件出错: {e}, 文件: {file_path}")
+            return None
+
     def get_available_weeks(self):
-        """获取所有可用的周统计数据"""
-        weeks = []
-        
-        # 同时搜索 .json 和 .enc 格式的统计文件
-        patterns = [
-            os.path.join(self.STATS_DIR, "*.json"),
-            os.path.join(self.STATS_DIR, "*.enc")
-        ]
-        
-        processed_weeks = set()  # 用于跟踪已处理的周
-        
-        for pattern in patterns:
-            for file_path in glob.glob(pattern):
-                file_name = os.path.basename(file_path)
-                
-                # 提取文件名的基本部分 (YYYY_WW) 无论是 .json 还是 .enc
-                base_name = file_name.split('.')[0]
-                
-                # 如果这个周已经处理过，跳过
-                if base_name in processed_weeks:
-                    continue
-                processed_weeks.add(base_name)
-                
-                # 从文件名中提取年份和周号 (YYYY_WW)
+        """获取所有可用的周统计数据
+
+        结果来自周统计索引缓存，只有修改时间或大小发生变化的文件才会重新解密。
+        可用周列表发生变化时会调用 weeks_callback。
+        """
+        # 同时搜索 .json 和 .enc 格式的统计文件，同一周只取第一个找到的文件
+        week_files = {}
+        for pattern in ("*.json", "*.enc"):
+            for file_path in glob.glob(os.path.join(self.STATS_DIR, pattern)):
+                base_name = os.path.basename(file_path).split('.')[0]
                 if "_" in base_name:
-                    try:
-                        year_week_parts = base_name.split('_')
-                        if len(year_week_parts) != 2:
-                            continue
-                        
-                        year = int(year_week_parts[0])
-                        week = int(year_week_parts[1])
-                        
-                        # 计算该周的开始日期
-                        first_day = datetime.date(year, 1, 1)
-                        days_to_add = (week - 1) * 7
-                        if first_day.weekday() != 0:  # 如果1月1日不是周一
-                            days_to_add -= first_day.weekday()
-                        
-                        week_start_date = first_day + datetime.timedelta(days=days_to_add)
-                        
-                        # 尝试读取统计数据
-                        stats = None
-                        
-                        # 首先尝试加密文件
-                        enc_file = os.path.join(self.STATS_DIR, f"{base_name}.enc")
-                        if os.path.exists(enc_file):
-                            stats = self.decrypt_file(enc_file)
-                        
-                        # 如果加密文件不存在或无法解密，尝试明文文件
-                        if stats is None:
-                            json_file = os.path.join(self.STATS_DIR, f"{base_name}.json")
-                            if os.path.exists(json_file):
-                                with open(json_file, 'r', encoding='utf-8') as f:
-                                    stats = json.load(f)
-                        
-                        # 如果获取到数据，构建周信息
-                        if stats:
-                            week_info = {
-                                'date': week_start_date,
-                                'week_start': stats.get('week_start', ''),
-                                'week_start_str': stats.get('week_start_str', ''),
-                                'weekday_seconds': float(stats.get('weekday_seconds', 0)),
-                                'weekday': stats.get('weekday', '00:00:00'),
-                                'weekend_seconds': float(stats.get('weekend_seconds', 0)),
-                                'weekend': stats.get('weekend', '00:00:00'),
-                                'week_seconds': float(stats.get('weekday_seconds', 0)) + float(stats.get('weekend_seconds', 0)),
-                                'week': self.format_time(float(stats.get('weekday_seconds', 0)) + float(stats.get('weekend_seconds', 0))),
-                                'file_path': file_path
-                            }
-                            weeks.append(week_info)
-                        else:
-                            # 如果无法读取任何文件，添加基本信息
-                            weeks.append({
-                                'date': week_start_date,
-                                'week_start': week_start_date.isoformat(),
-                                'week_start_str': week_start_date.strftime("%Y年%m月%d日"),
-                                'weekday': '00:00:00',
-                                'weekend': '00:00:00',
-                                'weekday_seconds': 0,
-                                'weekend_seconds': 0,
-                                'week_seconds': 0,
-                                'week': '00:00:00',
-                                'file_path': file_path
-                            })
-                    except Exception as e:
-                        logging.error(f"处理周统计文件出错: {e}, 文件: {file_path}")
-                        continue
-                    
+                    week_files.setdefault(base_name, file_path)
+
+        with self.week_index_lock:
+            for base_name, file_path in week_files.items():
+                signature = self._stats_file_signature(base_name)
+                cached = self.week_index.get(base_name)
+                if cached and cached[0] == signature:
+                    continue
+                self.week_index[base_name] = (signature, self._build_week_info(base_name, file_path))
+
+            # 移除已被删除的周
+            for base_name in set(self.week_index) - set(week_files):
+                del self.week_index[base_name]
+
+            weeks = [dict(week_info) for _, week_info in self.week_index.values() if week_info]
+
         # 按日期降序排序（最近的周在前）
         weeks.sort(key=lambda x: x['date'], reverse=True)
+        self._notify_weeks_changed(weeks)
         return weeks
 
+    def _notify_weeks_changed(self, weeks):
+        """可用周列表与上次不同时调用 weeks_callback"""
+        week_list_key = tuple(w['week_start_str'] for w in weeks)
+        with self.week_index_lock:
+            if week_list_key == self.week_list_key:
+                return
+            self.week_list_key = week_list_key
+        if self.weeks_callback:
+            try:
+                self.weeks_callback(weeks)
+            except Exception as e:
+                logging.error(f"周列表回调出错: {e}")
+
     def load_stats(self):
         """加载统计数据"""
         try:
@@ -507,6 +683,16 @@ class MonitorSystem:
             
             with open(stats_enc_file, 'wb') as f:
                 f.write(encrypted_json)
+
+            # 直接用刚保存的数据更新周统计索引，无需重新解密
+            base_name = os.path.basename(stats_enc_file).split('.')[0]
+            week_info = self._build_week_info(base_name, stats_enc_file, stats)
+            with self.week_index_lock:
+                self.week_index[base_name] = (self._stats_file_signature(base_name), week_info)
+            self.get_available_weeks()
+
+            # 同时更新当前计时会话的结束时间
+            self._record_session_interval()
                 
             # 不再保存明文JSON文件
             # logging.info(f"已保存加密统计数据到 {stats_enc_file}")
@@ -514,6 +700,43 @@ class MonitorSystem:
         except Exception as e:
             logging.error(f"保存统计数据时出错: {e}")
             
+    def _load_session_intervals(self):
+        """加载本地保存的计时会话区间"""
+        if not os.path.exists(self.SESSIONS_FILE):
+            return []
+        intervals = self.decrypt_file(self.SESSIONS_FILE)
+        return intervals if isinstance(intervals, list) else []
+
+    def _record_session_interval(self, trim_seconds=0):
+        """把当前计时会话（从开始到现在）写入会话区间列表并加密保存
+
+        Args:
+            trim_seconds: 从会话结束时间中扣除的秒数（超时调整，与累计时间的扣除保持一致）
+        """
+        session_start = getattr(self, 'current_session_start', None)
+        if session_start is None:
+            return
+
+        now = datetime.datetime.now()
+        start = datetime.datetime.fromtimestamp(session_start).isoformat(timespec='seconds')
+        end = (now - datetime.timedelta(seconds=trim_seconds)).isoformat(timespec='seconds')
+        cutoff = (now - datetime.timedelta(days=self.SESSION_RETENTION_DAYS)).isoformat(timespec='seconds')
+        with self.session_lock:
+            intervals = [i for i in self.session_intervals if i['start'] != start and i['end'] >= cutoff]
+            intervals.append({'start': start, 'end': end})
+            self.session_intervals = intervals
+            try:
+                json_data = json.dumps(intervals, ensure_ascii=False).encode('utf-8')
+                with open(self.SESSIONS_FILE, 'wb') as f:
+                    f.write(self.cipher.encrypt(json_data))
+            except Exception as e:
+                logging.error(f"保存会话区间时出错: {e}")
+
+    def get_session_intervals(self):
+        """返回本地保存的计时会话区间（按开始时间排序）"""
+        with self.session_lock:
+            return sorted(self.session_intervals, key=lambda i: i['start'])
+
     def decrypt_file(self, encrypted_file_path):
         """解密文件内容
         
@@ -542,6 +765,22 @@ class MonitorSystem:
             logging.error(f"解密文件失败: {e}")
             return None
             
+    def decrypt_bytes(self, encrypted_file_path):
+        """解密文件并直接返回原始字节（不尝试JSON解析或图像解码）
+        
+        Args:
+            encrypted_file_path: 加密文件路径
+            
+        Returns:
+            bytes: 解密后的原始数据，如果失败则返回None
+        """
+        try:
+            with open(encrypted_file_path, 'rb') as f:
+                return self.cipher.decrypt(f.read())
+        except Exception as e:
+            logging.error(f"解密文件失败: {e}")
+            return None
+            
     def decrypt_image(self, encrypted_file_path, image_format="PNG"):
         """解密图像文件并返回PIL图像对象
         
@@ -609,7 +848,11 @@ class MonitorSystem:
         
         self.running = True
         self.paused = False
+        if self.record_executor is None:
+            self._create_executors()
+        # 记录会话开始时间，在检测线程启动前设置，第一次记录即可看到当前会话
         self.start_time = time.time()
+        self.current_session_start = self.start_time
         self.thread = threading.Thread(target=self._monitoring_loop)
         self.thread.daemon = True
         self.thread.start()
@@ -617,9 +860,6 @@ class MonitorSystem:
         if self.status_callback:
             self.status_callback("检测已启动")
 
-        # 记录会话开始时间
-        self.current_session_start = time.time()
-
     def pause(self):
         """暂停检测"""
         if not self.paused and self.start_time:
@@ -637,6 +877,7 @@ class MonitorSystem:
             self.start_time = None
         
         self.paused = True
+        self.camera.release()
         logging.info("检测程序已暂停")
         if self.status_callback:
             self.status_callback("检测已暂停")
@@ -649,15 +890,14 @@ class MonitorSystem:
 
     def resume(self):
         """恢复检测"""
-        self.paused = False
+        # 重新开始新会话计时，在取消暂停前设置
         self.start_time = time.time()
+        self.current_session_start = self.start_time
+        self.paused = False
         logging.info("检测程序已恢复")
         if self.status_callback:
             self.status_callback("等待下一次记录")
 
-        # 重新开始新会话计时
-        self.current_session_start = time.time()
-
     def stop(self):
         """停止检测"""
         if self.running and not self.paused and self.start_time:
@@ -676,7 +916,10 @@ class MonitorSystem:
             
         self.running = False
         if self.thread:
-            self.thread.join(1.0)  # 等待线程结束
+            self.thread.join(1.0)  # 等待线程结束（循环每秒检查一次状态）
+        # 等待正在保存的记录写完，再释放摄像头和保存统计数据
+        self._shutdown_executors(self.CAPTURE_TIMEOUT + self.STORE_TIMEOUT)
+        self.camera.release()
         
         # 保存统计数据
         self.save_stats()
@@ -694,11 +937,14 @@ class MonitorSystem:
             session_duration = time.time() - self.current_session_start
             # 如果单次计时超过12小时，在累计时间中减去2小时
             if session_duration > self.overtime_threshold:
-                self.status_callback(f"检测到单次计时超过12小时，自动减去2小时计时")
+                if self.status_callback:
+                    self.status_callback(f"检测到单次计时超过12小时，自动减去2小时计时")
                 # 更新总计时间，减去2小时调整
                 adjustment_time = min(self.overtime_adjustment, session_duration - 1800)  # 至少保留30分钟
                 # 更新相关统计数据
                 self._adjust_stats_for_overtime(adjustment_time)
+                # 上传到服务器的会话区间同样缩短，避免按会话统计时仍计入被扣除的时间
+                self._record_session_interval(adjustment_time)
             
             # 重置会话开始时间
             self.current_session_start = None
@@ -767,6 +1013,8 @@ class MonitorSystem:
             self.stop()
         if self.stats_thread and self.stats_thread.is_alive():
             self.stats_thread.join(1.0)
+        self._shutdown_executors(self.CAPTURE_TIMEOUT + self.STORE_TIMEOUT)
+        self.camera.release()
 
 # 原有的main函数保留，以便可以直接运行此脚本
 def main():
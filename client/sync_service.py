@@ -0,0 +1,169 @@
+import os
+import queue
+import random
+import threading
+import logging
+
+
+class SyncService:
+    """后台自动同步服务
+
+    MonitorSystem 每保存一条记录就把记录目录放入有界队列，后台线程在随机延迟后
+    上传，失败时按指数退避重试。这样数据会在采集后陆续上传，
+    避免所有客户端集中在某个时间点手动上传。上传带宽由 auth_client 的限速设置统一控制。
+    """
+
+    # 单条记录连续失败的最大次数，超过后留待手动上传
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, auth_client, monitor, sync_manager, max_queue=200,
+                 delay_range=(30, 180), max_backoff=1800, bandwidth_limit=None):
+        """初始化同步服务
+
+        Args:
+            auth_client: 已认证的客户端对象
+            monitor: MonitorSystem 对象（用于解密记录文件）
+            sync_manager: FileSyncManager 对象（上传日志）
+            max_queue: 队列中最多等待的记录数，队列已满时新记录留待下次手动上传
+            delay_range: 每条记录上传前的随机延迟范围（秒），用于错开各客户端的上传时间
+            max_backoff: 失败重试的最大等待时间（秒）
+            bandwidth_limit: 上传带宽上限（字节/秒），设置后作用于 auth_client 的所有上传；None 表示沿用客户端设置
+        """
+        self.auth_client = auth_client
+        self.monitor = monitor
+        self.sync_manager = sync_manager
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.delay_range = delay_range
+        self.max_backoff = max_backoff
+        if bandwidth_limit is not None:
+            auth_client.set_bandwidth_limit(bandwidth_limit, save=False)
+
+        # 每次启动使用新的停止信号：stop() 之后仍在上传的旧线程保留自己已置位的信号，
+        # 不会因为再次 start() 被清除而继续运行
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.status_callback = None
+        self.failures = 0
+        self.attempts = {}
+        self.uploaded_files = 0
+
+    def set_status_callback(self, callback):
+        """设置状态回调函数"""
+        self.status_callback = callback
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive() and not self.stop_event.is_set()
+
+    def start(self):
+        """启动后台同步线程"""
+        if self.is_running():
+            return
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+        logging.info("自动同步已启动")
+
+    def stop(self):
+        """停止后台同步线程，队列中未上传的记录留待下次上传"""
+        self.stop_event.set()
+        if self.thread:
+            # 正在上传的线程会在当前文件完成后退出，不在这里长时间等待；
+            # 线程退出前保留引用，便于通过 thread.is_alive() 判断
+            self.thread.join(1.0)
+            if not self.thread.is_alive():
+                self.thread = None
+        logging.info("自动同步已停止")
+
+    def enqueue(self, timestamp_dir_path: str) -> bool:
+        """将新保存的记录加入上传队列（不会阻塞采集线程）
+
+        Args:
+            timestamp_dir_path: 记录目录路径
+
+        Returns:
+            bool: 是否成功加入队列
+        """
+        try:
+            self.queue.put_nowait(timestamp_dir_path)
+            return True
+        except queue.Full:
+            logging.warning(f"自动同步队列已满，记录将在下次上传时处理: {timestamp_dir_path}")
+            return False
+
+    def _wait(self, stop_event: threading.Event, seconds: float) -> bool:
+        """可被停止信号打断的等待，返回False表示服务已停止"""
+        return not stop_event.wait(seconds)
+
+    def _run(self, stop_event: threading.Event):
+        """同步循环
+
+        Args:
+            stop_event: 本次启动的停止信号
+        """
+        while not stop_event.is_set():
+            try:
+                timestamp_dir_path = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            # 随机延迟，避免大量客户端在同一时刻上传
+            if not self._wait(stop_event, random.uniform(*self.delay_range)):
+                break
+
+            if self._sync_record(timestamp_dir_path):
+                self.failures = 0
+                self.attempts.pop(timestamp_dir_path, None)
+                continue
+
+            # 上传失败：放回队列并指数退避（带随机抖动）
+            self.failures += 1
+            self.attempts[timestamp_dir_path] = self.attempts.get(timestamp_dir_path, 0) + 1
+            if self.attempts[timestamp_dir_path] < self.MAX_ATTEMPTS:
+                self.enqueue(timestamp_dir_path)
+            else:
+                logging.error(f"自动同步多次失败，记录将在下次手动上传时处理: {timestamp_dir_path}")
+                self.attempts.pop(timestamp_dir_path, None)
+            backoff = min(self.max_backoff, self.delay_range[0] * (2 ** self.failures))
+            if not self._wait(stop_event, random.uniform(backoff / 2, backoff)):
+                break
+
+    def _sync_record(self, timestamp_dir_path: str) -> bool:
+        """上传一条记录中尚未上传的文件
+
+        Returns:
+            bool: 记录中的文件是否全部上传成功（或无需上传）
+        """
+        week_id = os.path.basename(os.path.dirname(timestamp_dir_path))
+        record_id = self.sync_manager.record_id(week_id, os.path.basename(timestamp_dir_path))
+        artifacts = self.sync_manager.pending_artifacts(record_id, timestamp_dir_path)
+        if not artifacts:
+            return True
+
+        # 正在被手动上传的记录交给手动上传处理
+        if not self.sync_manager.try_claim(record_id):
+            return True
+        try:
+            items, keys, _ = self.sync_manager.read_upload_items(
+                self.monitor.decrypt_bytes, record_id, timestamp_dir_path, artifacts)
+            # 解密失败的文件已被记为跳过，重试也无法上传，不算作本条记录上传失败
+            if not items:
+                return True
+
+            success, message, results = self.auth_client.upload_batch(items)
+            if not success:
+                logging.error(f"自动同步上传失败: {message}")
+
+            all_uploaded = success
+            for (key_record_id, artifact), result in zip(keys, results):
+                if result['success']:
+                    self.uploaded_files += 1
+                    self.sync_manager.mark_uploaded(key_record_id, artifact, result['file_path'])
+                else:
+                    all_uploaded = False
+            self.sync_manager.save()
+
+            if self.status_callback:
+                self.status_callback(self.uploaded_files, all_uploaded)
+            return all_uploaded
+        finally:
+            self.sync_manager.release(record_id)
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import uuid
+
+
+class BlobStore:
+    """基于内容哈希的文件存储
+
+    相同内容的文件只保存一份，对象键形如 blobs/ab/cd/<sha256>.<ext>（按哈希前4位分两级目录），
+    数据库中的 File 记录通过 file_path 引用同一个对象键。
+    早期版本使用一级目录 blobs/ab/<sha256>.<ext>，这些键仍然可以读取。
+    文件内容保存在存储后端（见 storage.py）中。
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, storage, dir_name='blobs'):
+        """初始化存储
+
+        Args:
+            storage: 存储后端（LocalStorage 或 S3Storage）
+            dir_name: blob 对象键的前缀目录
+        """
+        self.storage = storage
+        self.dir_name = dir_name
+
+    @property
+    def tmp_dir(self):
+        """接收上传内容的本地暂存目录，完成后再交给存储后端"""
+        return self.storage.tmp_dir
+
+    @staticmethod
+    def is_valid_hash(file_hash):
+        """检查是否为合法的SHA-256十六进制字符串"""
+        if not file_hash or len(file_hash) != 64:
+            return False
+        try:
+            int(file_hash, 16)
+            return True
+        except ValueError:
+            return False
+
+    def relative_path(self, file_hash, filename=''):
+        """返回 blob 的对象键（统一使用 / 分隔）"""
+        ext = os.path.splitext(filename)[1].lower()
+        return f"{self.dir_name}/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}{ext}"
+
+    def hash_from_path(self, relative_path):
+        """从 blob 对象键中取出内容哈希，不是 blob 键时返回 None"""
+        parts = relative_path.split('/')
+        if len(parts) not in (3, 4) or parts[0] != self.dir_name:
+            return None
+        file_hash = os.path.splitext(parts[-1])[0]
+        return file_hash if self.is_valid_hash(file_hash) else None
+
+    def exists(self, file_hash, filename=''):
+        return self.storage.exists(self.relative_path(file_hash, filename))
+
+    def new_temp_path(self):
+        """返回暂存目录中一个新的临时文件路径"""
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    def save_stream(self, stream, filename, expected_hash=None):
+        """将数据流写入 blob 存储，边写边计算哈希
+
+        Args:
+            stream: 可读的二进制流
+            filename: 原始文件名（用于确定扩展名）
+            expected_hash: 客户端声明的哈希值，不一致时拒绝保存
+
+        Returns:
+            tuple: (对象键, 哈希值, 文件大小, 是否新建了blob)
+
+        Raises:
+            ValueError: 内容哈希与 expected_hash 不一致
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = self.new_temp_path()
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            return self.adopt(tmp_path, hasher.hexdigest(), size, filename, expected_hash)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def adopt(self, source_path, file_hash, size, filename, expected_hash=None):
+        """将已计算过哈希的本地文件交给存储后端（本地存储时直接重命名）
+
+        Args:
+            source_path: 源文件路径（应位于 tmp_dir），内容已存在时保留原 blob，源文件由调用方删除
+            file_hash: 源文件内容的SHA-256
+            size: 源文件大小
+            filename: 原始文件名（用于确定扩展名）
+            expected_hash: 客户端声明的哈希值，不一致时拒绝保存
+
+        Returns:
+            tuple: (对象键, 哈希值, 文件大小, 是否新建了blob)
+
+        Raises:
+            ValueError: 内容哈希与 expected_hash 不一致
+        """
+        if expected_hash and expected_hash.lower() != file_hash:
+            raise ValueError('文件哈希校验失败')
+
+        key = self.relative_path(file_hash, filename)
+        if self.storage.exists(key):
+            return key, file_hash, size, False
+
+        self.storage.put(source_path, key)
+        return key, file_hash, size, True
+
+    def save_file(self, source_path, filename, expected_hash=None):
+        """将已在磁盘上的文件移入 blob 存储（本地存储时直接重命名，不复制数据）
+
+        Args:
+            source_path: 源文件路径，成功或失败后都会被移走或删除
+            filename: 原始文件名（用于确定扩展名）
+            expected_hash: 客户端声明的哈希值，不一致时拒绝保存
+
+        Returns:
+            tuple: (对象键, 哈希值, 文件大小, 是否新建了blob)
+
+        Raises:
+            ValueError: 内容哈希与 expected_hash 不一致
+        """
+        hasher = hashlib.sha256()
+        try:
+            with open(source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            size = os.path.getsize(source_path)
+            return self.adopt(source_path, hasher.hexdigest(), size, filename, expected_hash)
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
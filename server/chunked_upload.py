@@ -0,0 +1,166 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class ChunkedUploadStore:
+    """分块上传的暂存区
+
+    每个上传会话在暂存目录中对应两个文件：
+    <upload_id>.part 保存已接收的数据，<upload_id>.json 保存会话信息。
+    已接收的字节数即 .part 文件的大小，客户端断线后可据此续传。
+    写入期间存在 <upload_id>.lock，同一会话的并发写入（如客户端超时后重试）会被拒绝。
+    """
+
+    # 锁文件超过该时间（秒）仍未删除时视为写入进程已退出，可以重新加锁
+    LOCK_STALE_SECONDS = 600
+
+    def __init__(self, staging_dir, expire_seconds=24 * 3600):
+        """初始化暂存区
+
+        Args:
+            staging_dir: 暂存目录
+            expire_seconds: 未完成的上传会话保留时间（秒）
+        """
+        self.staging_dir = staging_dir
+        self.expire_seconds = expire_seconds
+        os.makedirs(staging_dir, exist_ok=True)
+
+    @staticmethod
+    def is_valid_id(upload_id):
+        """上传ID必须是uuid4的十六进制形式，防止路径穿越"""
+        if not upload_id or len(upload_id) != 32:
+            return False
+        try:
+            int(upload_id, 16)
+            return True
+        except ValueError:
+            return False
+
+    def part_path(self, upload_id):
+        return os.path.join(self.staging_dir, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.staging_dir, f"{upload_id}.json")
+
+    def _lock_path(self, upload_id):
+        return os.path.join(self.staging_dir, f"{upload_id}.lock")
+
+    @contextmanager
+    def locked(self, upload_id):
+        """独占上传会话，用 O_EXCL 创建锁文件，多个进程之间同样有效
+
+        Raises:
+            BlockingIOError: 会话正在被其他请求写入
+        """
+        path = self._lock_path(upload_id)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(path) > self.LOCK_STALE_SECONDS
+            except OSError:
+                stale = False
+            if not stale:
+                raise BlockingIOError('上传会话正在写入，请稍后重试')
+            os.remove(path)
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                raise BlockingIOError('上传会话正在写入，请稍后重试')
+        os.close(fd)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def create(self, meta):
+        """创建上传会话
+
+        Args:
+            meta: 会话信息（user_id、filename、file_size、file_hash 等）
+
+        Returns:
+            str: 上传ID
+        """
+        self.cleanup_expired()
+        upload_id = uuid.uuid4().hex
+        meta = dict(meta, created_at=time.time())
+        with open(self._meta_path(upload_id), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        open(self.part_path(upload_id), 'wb').close()
+        return upload_id
+
+    def get_meta(self, upload_id):
+        """读取会话信息，会话不存在时返回None"""
+        if not self.is_valid_id(upload_id):
+            return None
+        try:
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def offset(self, upload_id):
+        """返回已接收的字节数"""
+        try:
+            return os.path.getsize(self.part_path(upload_id))
+        except OSError:
+            return 0
+
+    def append(self, upload_id, offset, stream, max_size, chunk_size=64 * 1024):
+        """在指定偏移处追加一个数据块，调用方应持有 locked(upload_id)
+
+        Args:
+            upload_id: 上传ID
+            offset: 客户端认为的当前偏移，必须等于已接收的字节数
+            stream: 数据块的输入流
+            max_size: 文件声明的总大小，超出部分会被拒绝
+
+        Returns:
+            int: 追加后的偏移
+
+        Raises:
+            ValueError: 偏移不一致或超出声明的文件大小
+        """
+        current = self.offset(upload_id)
+        if offset != current:
+            raise ValueError(f'偏移不一致，服务器已接收 {current} 字节')
+
+        with open(self.part_path(upload_id), 'ab') as f:
+            written = 0
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if current + written > max_size:
+                    # 回滚本次写入，保持偏移不变
+                    f.truncate(current)
+                    raise ValueError('数据超出声明的文件大小')
+                f.write(chunk)
+        return current + written
+
+    def discard(self, upload_id):
+        """删除上传会话及其暂存数据"""
+        for path in (self.part_path(upload_id), self._meta_path(upload_id), self._lock_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def cleanup_expired(self):
+        """清理超过保留时间没有收到新数据的上传会话"""
+        deadline = time.time() - self.expire_seconds
+        for name in os.listdir(self.staging_dir):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-len('.json')]
+            try:
+                if os.path.getmtime(self.part_path(upload_id)) < deadline:
+                    self.discard(upload_id)
+            except OSError:
+                self.discard(upload_id)
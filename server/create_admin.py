@@ -1,7 +1,7 @@
 import sys
-import os
 from flask import Flask
 from models import db, User
+from db_config import configure_database
 
 def create_admin_user(username, password):
     """创建管理员用户
@@ -12,8 +12,8 @@ def create_admin_user(username, password):
     """
     # 创建 Flask 应用
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db")
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 与服务器使用同一数据库配置（DATABASE_URL）
+    configure_database(app)
     
     # 初始化数据库
     db.init_app(app)
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# 未设置 DATABASE_URL 时使用的 SQLite 数据库文件
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.db')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'环境变量 {name} 必须是整数: {value}')
+
+
+def database_uri():
+    """根据环境变量 DATABASE_URL 返回数据库连接地址
+
+    未设置时使用 server 目录下的 SQLite 文件；
+    兼容部分平台提供的 postgres:// 写法（SQLAlchemy 只识别 postgresql://）。
+    """
+    uri = os.environ.get('DATABASE_URL', '').strip()
+    if not uri:
+        return 'sqlite:///' + DEFAULT_SQLITE_PATH
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri):
+    """返回对应数据库的 SQLALCHEMY_ENGINE_OPTIONS
+
+    SQLite: 设置锁等待超时，允许连接在线程间使用；
+    PostgreSQL 等: 使用连接池，大小等参数可通过环境变量调整。
+    """
+    if uri.startswith('sqlite'):
+        return {
+            'connect_args': {
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+                'check_same_thread': False
+            }
+        }
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+
+def sqlite_pragmas():
+    """每个 SQLite 连接建立时执行的 PRAGMA
+
+    WAL 模式下读写互不阻塞，synchronous=NORMAL 在 WAL 下仍能保证数据库不损坏，
+    只是断电时可能丢失最近的事务；busy_timeout 让写冲突时等待而不是立即报 database is locked。
+    """
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        ('mmap_size', _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        ('cache_size', -_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)),  # 负数表示以KB为单位
+        ('temp_store', 'MEMORY'),
+        ('foreign_keys', 'ON')  # 与 PostgreSQL 一致，使 ondelete='CASCADE' 生效
+    ]
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def configure_database(app):
+    """将数据库配置写入 Flask 应用配置，需在 db.init_app(app) 之前调用"""
+    uri = database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
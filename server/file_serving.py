@@ -0,0 +1,80 @@
+import mimetypes
+
+from flask import request, send_file, current_app
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+
+# 内容寻址的文件内容永不改变，可以让浏览器长期缓存而不必重新验证
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# 按用户目录保存的旧文件可能被同名文件覆盖，缓存较短时间并通过ETag重新验证
+MUTABLE_MAX_AGE = 24 * 3600
+
+
+def send_upload(root_dir, relative_path, content_hash=None, private=False):
+    """发送上传目录中的文件，支持缓存验证、断点续传和前端代理转发
+
+    Args:
+        root_dir: 上传文件根目录（UPLOAD_FOLDER）
+        relative_path: 相对于 root_dir 的路径（使用 / 分隔）
+        content_hash: 文件内容的SHA-256，已知时作为强ETag并按不可变资源缓存
+        private: 是否只允许浏览器缓存（需要认证的接口应为 True）
+
+    Returns:
+        Response: 文件响应；If-None-Match 命中时为304，带 Range 时为206
+
+    Raises:
+        NotFound: 路径非法或文件不存在
+    """
+    file_path = safe_join(root_dir, relative_path)
+    if file_path is None:
+        raise NotFound()
+
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        return _accel_redirect(accel_prefix, relative_path, content_hash, private)
+
+    # send_file 自行 stat 文件，不存在时抛出 FileNotFoundError；
+    # 开启 USE_X_SENDFILE 时由前端服务器读取文件，Flask 只返回响应头
+    try:
+        response = send_file(
+            file_path,
+            etag=content_hash if content_hash else True,
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if content_hash else MUTABLE_MAX_AGE
+        )
+    except FileNotFoundError:
+        raise NotFound()
+    _set_cache_control(response, content_hash, private)
+    return response
+
+
+def _accel_redirect(prefix, relative_path, content_hash, private):
+    """通过 X-Accel-Redirect 交给 Nginx 发送文件（Range 由 Nginx 处理）"""
+    response = current_app.response_class()
+    mimetype = mimetypes.guess_type(relative_path)[0]
+    if mimetype:
+        response.mimetype = mimetype
+    if content_hash:
+        response.set_etag(content_hash)
+        if request.if_none_match.contains(content_hash):
+            response.status_code = 304
+            _set_cache_control(response, content_hash, private)
+            return response
+    response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative_path.lstrip('/')
+    _set_cache_control(response, content_hash, private)
+    return response
+
+
+def _set_cache_control(response, content_hash, private):
+    if private:
+        response.cache_control.private = True
+        response.cache_control.public = False
+    else:
+        response.cache_control.public = True
+    if content_hash:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = MUTABLE_MAX_AGE
+        response.cache_control.no_cache = None
@@ -0,0 +1,160 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+# 放入队列通知写入线程在提交完之前的操作后退出
+_STOP = object()
+
+
+class IngestWriter:
+    """单线程批量提交的写入队列（group commit）
+
+    请求处理线程通过 submit/write 提交写操作，后台写入线程每次取出最多 max_batch 个操作，
+    或在第一个操作到达后最多等待 max_delay 秒，把它们放在同一个事务中执行并提交，
+    一次磁盘同步即可确认整批数据。提交成功后才通知等待的请求。
+
+    写操作是形如 fn(defer, *args) 的函数，在写入线程的应用上下文中执行，可以使用 db.session，
+    但不要提交事务。返回值应为无参函数，在整批 flush 之后、提交之前调用，其结果作为该操作的结果
+    （此时新记录已有主键）。defer(key, func) 登记整批只需执行一次的收尾操作（如重算统计汇总），
+    相同 key 只执行一次。
+
+    整批提交失败时回滚，再逐个操作单独执行和提交，只有出错的操作返回异常，
+    因此写操作必须能在回滚后重新执行。
+
+    进程退出时（atexit）或调用 close() 时，队列中已提交的写操作会先写入数据库再结束线程。
+    """
+
+    def __init__(self, app, db, max_batch=200, max_delay=0.005):
+        """初始化写入队列，写入线程在第一次提交操作时启动
+
+        Args:
+            app: Flask 应用
+            db: Flask-SQLAlchemy 实例
+            max_batch: 每批最多包含的操作数
+            max_delay: 第一个操作到达后等待更多操作的最长时间（秒）
+        """
+        self.app = app
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        # 写入线程是守护线程，进程退出前需要把队列中的操作写完
+        atexit.register(self.close)
+
+    def submit(self, fn, *args):
+        """提交写操作
+
+        Returns:
+            Future: 整批提交成功后得到 fn 返回函数的结果，失败时为异常
+        """
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def write(self, fn, *args, timeout=30):
+        """提交写操作并等待其所在批次提交
+
+        等待超时时，如果操作还在队列中则取消（之后不会再执行），调用方可以安全地让客户端重试；
+        如果写入线程已经开始执行该操作，则继续等待其结果，不会出现返回错误后又提交成功的情况。
+
+        Raises:
+            Exception: 写操作或事务提交失败的异常
+            TimeoutError: 超时且操作已取消，没有写入任何数据
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise TimeoutError('写入队列繁忙，操作已取消')
+            return future.result()
+
+    def close(self, timeout=30):
+        """提交队列中剩余的写操作并停止写入线程，之后再提交操作时会重新启动线程
+
+        Args:
+            timeout: 等待写入线程结束的最长时间（秒）
+        """
+        with self._thread_lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            # 每个进程在自己第一次写入时启动线程（兼容预加载后 fork 的部署方式）
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # 等待期间已取消的请求不再写入
+            batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._commit_batch(batch)
+                except Exception:
+                    self.db.session.rollback()
+                    for item in batch:
+                        self._commit_one(item)
+                finally:
+                    self.db.session.remove()
+
+    def _execute(self, batch):
+        deferred = {}
+
+        def defer(key, func):
+            deferred.setdefault(key, func)
+
+        getters = [fn(defer, *args) for _, fn, args in batch]
+        self.db.session.flush()
+        results = [getter() if getter else None for getter in getters]
+        for func in deferred.values():
+            func()
+        self.db.session.commit()
+        return results
+
+    def _commit_batch(self, batch):
+        results = self._execute(batch)
+        for (future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _commit_one(self, item):
+        future = item[0]
+        try:
+            result = self._execute([item])[0]
+        except Exception as e:
+            self.db.session.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
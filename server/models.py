@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 import datetime
@@ -20,6 +21,8 @@ class User(db.Model):
     # 关系
     weekly_stats = db.relationship('WeeklyStats', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     files = db.relationship('File', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    year_rollups = db.relationship('UserYearRollup', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    activity_sessions = db.relationship('ActivitySession', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def __init__(self, username, password, is_admin=False):
         self.username = username
@@ -51,21 +54,43 @@ class File(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
-    file_type = db.Column(db.String(50))  # 例如：screenshot, camera, applications
-    file_path = db.Column(db.String(512), nullable=False)
+    # 例如：screenshot, camera, applications。修改时先加载原值（active_history），
+    # 否则已过期的对象修改类型后 flush 事件拿不到原类型，汇总表中原类型的计数不会减少
+    file_type = db.column_property(db.Column(db.String(50)), active_history=True)
+    file_path = db.Column(db.String(512), nullable=False)  # 存储后端中的对象键，如 blobs/ab/cd/<sha256>.png
     file_date = db.Column(db.Date, index=True)
     file_time = db.Column(db.Time)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
+    file_hash = db.Column(db.String(64))  # 内容SHA-256，用于去重
+    file_size = db.Column(db.Integer)
     
-    def to_dict(self):
+    __table_args__ = (
+        db.Index('ix_files_user_hash', 'user_id', 'file_hash'),
+        db.Index('ix_files_user_timestamp', 'user_id', 'timestamp'),
+    )
+    
+    @classmethod
+    def query_with_user(cls):
+        """同时加载所属用户的查询（JOIN），序列化时不再逐行查询用户"""
+        return cls.query.options(db.joinedload(cls.user))
+    
+    def to_dict(self, user=None):
+        """序列化文件记录
+
+        Args:
+            user: 已加载的所属用户，未提供时使用 self.user
+        """
+        user = user or self.user
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'uid': self.user.uid,
-            'username': self.user.username,
+            'uid': user.uid if user else None,
+            'username': user.username if user else None,
             'filename': self.filename,
             'file_type': self.file_type,
             'file_path': self.file_path,
+            'file_hash': self.file_hash,
+            'file_size': self.file_size,
             'file_date': self.file_date.isoformat() if self.file_date else None,
             'file_time': str(self.file_time) if self.file_time else None,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
@@ -84,16 +109,29 @@ class WeeklyStats(db.Model):
     upload_time = db.Column(db.DateTime, default=datetime.datetime.now)
     
     # 添加唯一约束，确保每个用户每年每周只有一条记录
+    # 该约束的索引以 user_id 开头，同时用于按用户查询和计数
     __table_args__ = (
         db.UniqueConstraint('user_id', 'year', 'week', name='unique_user_year_week'),
+        db.Index('ix_weekly_stats_year_week', 'year', 'week'),
     )
     
-    def to_dict(self):
+    @classmethod
+    def query_with_user(cls):
+        """同时加载所属用户的查询（JOIN），序列化时不再逐行查询用户"""
+        return cls.query.options(db.joinedload(cls.user))
+    
+    def to_dict(self, user=None):
+        """序列化周统计记录
+
+        Args:
+            user: 已加载的所属用户，未提供时使用 self.user
+        """
+        user = user or self.user
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'uid': self.user.uid,
-            'username': self.user.username,
+            'uid': user.uid if user else None,
+            'username': user.username if user else None,
             'year': self.year,
             'week': self.week,
             'weekday_duration': self.weekday_duration,
@@ -112,4 +150,270 @@ class WeeklyStats(db.Model):
         
         hours, remainder = divmod(seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
\ No newline at end of file
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def serialize_with_users(items):
+    """批量序列化 File 或 WeeklyStats 记录，所属用户通过一次 IN 查询加载
+
+    Args:
+        items: File 或 WeeklyStats 对象列表
+
+    Returns:
+        list: 各记录 to_dict() 的结果
+    """
+    user_ids = {item.user_id for item in items}
+    users = {}
+    if user_ids:
+        users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+    return [item.to_dict(user=users.get(item.user_id)) for item in items]
+
+class ActivitySession(db.Model):
+    """客户端上传的计时会话区间（一段连续计时的开始和结束时间）"""
+    __tablename__ = 'activity_sessions'
+    
+    # 单个会话的最长时长（秒），按时间范围查询时据此确定开始时间的下界
+    MAX_DURATION = 24 * 3600
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    upload_time = db.Column(db.DateTime, default=datetime.datetime.now)
+    
+    # 同一会话重复上传时按 (user_id, start_time) 更新结束时间；
+    # 该约束的索引也用于按用户和时间范围查询
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'start_time', name='unique_user_session_start'),
+    )
+    
+    @classmethod
+    def overlapping(cls, user_id, range_start, range_end):
+        """查询与 [range_start, range_end) 有重叠的会话（走 (user_id, start_time) 索引）"""
+        return cls.query.filter(
+            cls.user_id == user_id,
+            cls.start_time >= range_start - datetime.timedelta(seconds=cls.MAX_DURATION),
+            cls.start_time < range_end,
+            cls.end_time > range_start
+        ).order_by(cls.start_time.asc())
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'duration': int((self.end_time - self.start_time).total_seconds())
+        }
+
+class WeeklyRollup(db.Model):
+    """每周全体用户工作时长汇总，由 statistics 模块维护"""
+    __tablename__ = 'weekly_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    week = db.Column(db.Integer, nullable=False)
+    active_users = db.Column(db.Integer, default=0)  # 总时长大于0的用户数
+    weekday_sum = db.Column(db.Integer, default=0)  # 工作日时长合计（秒）
+    weekend_sum = db.Column(db.Integer, default=0)  # 周末时长合计（秒）
+    total_sum = db.Column(db.Integer, default=0)  # 总时长合计（秒）
+    total_mean = db.Column(db.Integer, default=0)  # 活跃用户人均总时长（秒）
+    total_p50 = db.Column(db.Integer, default=0)  # 活跃用户总时长中位数（秒）
+    total_p90 = db.Column(db.Integer, default=0)  # 活跃用户总时长90分位（秒）
+    total_max = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    
+    __table_args__ = (
+        db.UniqueConstraint('year', 'week', name='unique_rollup_year_week'),
+    )
+    
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'week': self.week,
+            'active_users': self.active_users,
+            'weekday_sum': self.weekday_sum,
+            'weekend_sum': self.weekend_sum,
+            'total_sum': self.total_sum,
+            'total_mean': self.total_mean,
+            'total_p50': self.total_p50,
+            'total_p90': self.total_p90,
+            'total_max': self.total_max,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class UserYearRollup(db.Model):
+    """每个用户每年的工作时长汇总，由 statistics 模块维护"""
+    __tablename__ = 'user_year_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    active_weeks = db.Column(db.Integer, default=0)  # 总时长大于0的周数
+    weekday_sum = db.Column(db.Integer, default=0)
+    weekend_sum = db.Column(db.Integer, default=0)
+    total_sum = db.Column(db.Integer, default=0)
+    total_mean = db.Column(db.Integer, default=0)  # 活跃周平均总时长（秒）
+    total_max = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', name='unique_rollup_user_year'),
+    )
+    
+    def to_dict(self, user=None):
+        user = user or self.user
+        return {
+            'user_id': self.user_id,
+            'uid': user.uid if user else None,
+            'username': user.username if user else None,
+            'year': self.year,
+            'active_weeks': self.active_weeks,
+            'weekday_sum': self.weekday_sum,
+            'weekend_sum': self.weekend_sum,
+            'total_sum': self.total_sum,
+            'total_mean': self.total_mean,
+            'total_max': self.total_max,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class FileTypeCount(db.Model):
+    """各类型文件数量的汇总表
+
+    由 session 的 flush 事件随 File 的增删自动维护，
+    文件管理页面直接读取，无需每次扫描 files 表计数。
+    """
+    __tablename__ = 'file_type_counts'
+    
+    file_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def _collect_file_type_deltas(session, flush_context, instances):
+    """flush 前统计本次新增、删除和修改类型的文件，按类型记录数量变化"""
+    deltas = session.info.setdefault('file_type_deltas', {})
+    for obj in session.new:
+        if isinstance(obj, File):
+            deltas[obj.file_type] = deltas.get(obj.file_type, 0) + 1
+    for obj in session.deleted:
+        if isinstance(obj, File):
+            deltas[obj.file_type] = deltas.get(obj.file_type, 0) - 1
+    for obj in session.dirty:
+        if isinstance(obj, File):
+            history = db.inspect(obj).attrs.file_type.history
+            for old_type in history.deleted:
+                deltas[old_type] = deltas.get(old_type, 0) - 1
+            for new_type in history.added:
+                deltas[new_type] = deltas.get(new_type, 0) + 1
+
+def _apply_file_type_deltas(session, flush_context):
+    """flush 成功后在同一事务中更新汇总表，事务回滚时计数一并回滚"""
+    deltas = session.info.pop('file_type_deltas', None)
+    if not deltas:
+        return
+    table = FileTypeCount.__table__
+    conn = session.connection()
+    for file_type, delta in deltas.items():
+        if not delta or file_type is None:
+            continue
+        result = conn.execute(
+            table.update()
+            .where(table.c.file_type == file_type)
+            .values(count=table.c.count + delta))
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(file_type=file_type, count=max(delta, 0)))
+
+event.listen(db.session, 'before_flush', _collect_file_type_deltas)
+event.listen(db.session, 'after_flush', _apply_file_type_deltas)
+
+def rebuild_file_type_counts():
+    """根据 files 表重新计算汇总表（汇总表为空或数据不一致时使用）"""
+    rows = db.session.query(File.file_type, db.func.count(File.id)) \
+        .filter(File.file_type.isnot(None)) \
+        .group_by(File.file_type) \
+        .all()
+    db.session.query(FileTypeCount).delete()
+    db.session.add_all([FileTypeCount(file_type=file_type, count=count) for file_type, count in rows])
+    db.session.commit()
+
+def get_file_type_counts():
+    """返回 {文件类型: 数量}，汇总表为空而 files 表有数据时先重建"""
+    counts = {row.file_type: row.count for row in FileTypeCount.query.all()}
+    if not counts and db.session.query(File.id).first() is not None:
+        rebuild_file_type_counts()
+        counts = {row.file_type: row.count for row in FileTypeCount.query.all()}
+    return counts
+
+def upsert_weekly_stats(user_id, entries):
+    """写入某用户多周的统计，已存在的周覆盖时长（单条语句，不需要先查询）
+
+    SQLite 和 PostgreSQL 使用 INSERT ... ON CONFLICT DO UPDATE，
+    并发上传同一周时由数据库按 unique_user_year_week 约束合并；其他数据库逐条查询后更新或插入。
+    调用方负责提交事务。
+
+    Args:
+        user_id: 用户ID
+        entries: [{'year', 'week', 'weekday_seconds', 'weekend_seconds'}, ...]，(year, week) 不能重复
+
+    Returns:
+        dict: {(year, week): 记录id}
+    """
+    if not entries:
+        return {}
+    now = datetime.datetime.now()
+    rows = [{
+        'user_id': user_id,
+        'year': entry['year'],
+        'week': entry['week'],
+        'weekday_duration': entry['weekday_seconds'],
+        'weekend_duration': entry['weekend_seconds'],
+        'upload_time': now
+    } for entry in entries]
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(WeeklyStats).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'year', 'week'],
+            set_={
+                'weekday_duration': stmt.excluded.weekday_duration,
+                'weekend_duration': stmt.excluded.weekend_duration,
+                'upload_time': stmt.excluded.upload_time
+            }
+        ).returning(WeeklyStats.year, WeeklyStats.week, WeeklyStats.id)
+        return {(year, week): stats_id for year, week, stats_id in db.session.execute(stmt)}
+    
+    ids = {}
+    for row in rows:
+        stats = WeeklyStats.query.filter_by(user_id=user_id, year=row['year'], week=row['week']).first()
+        if stats is None:
+            stats = WeeklyStats(**row)
+            db.session.add(stats)
+        else:
+            stats.weekday_duration = row['weekday_duration']
+            stats.weekend_duration = row['weekend_duration']
+            stats.upload_time = now
+        db.session.flush()
+        ids[(row['year'], row['week'])] = stats.id
+    return ids
+
+def upgrade_schema():
+    """为已存在的数据库补充新增的列和索引
+
+    db.create_all() 只会创建缺失的表，不会修改已有表结构，
+    因此新增的可空列和索引需要在这里补上。需在应用上下文中调用。
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
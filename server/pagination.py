@@ -0,0 +1,136 @@
+import base64
+import datetime
+import json
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """将排序键的值编码为不透明的游标字符串
+
+    Args:
+        values: 排序键的值列表，支持 datetime、date 以及可 JSON 序列化的值
+
+    Returns:
+        str: URL安全的游标字符串
+    """
+    payload = []
+    for value in values:
+        if isinstance(value, datetime.datetime):
+            payload.append({'dt': value.isoformat()})
+        elif isinstance(value, datetime.date):
+            payload.append({'d': value.isoformat()})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """解码游标字符串
+
+    Args:
+        cursor: encode_cursor 生成的游标
+        size: 排序键的个数
+
+    Returns:
+        list: 排序键的值
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError('无效的分页游标')
+
+    values = []
+    for value in payload:
+        try:
+            if isinstance(value, dict) and 'dt' in value:
+                values.append(datetime.datetime.fromisoformat(value['dt']))
+            elif isinstance(value, dict) and 'd' in value:
+                values.append(datetime.date.fromisoformat(value['d']))
+            elif isinstance(value, (str, int, float)) or value is None:
+                values.append(value)
+            else:
+                raise ValueError('无效的分页游标')
+        except (TypeError, ValueError):
+            # 伪造的游标（如 {"dt": 5}）按格式错误处理
+            raise ValueError('无效的分页游标')
+    return values
+
+
+class KeysetPage:
+    """游标分页的一页结果"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, keys, per_page, after=None, before=None, descending=True):
+    """基于排序键的游标分页（keyset pagination）
+
+    通过 WHERE (k1, k2, ...) < (v1, v2, ...) 定位下一页，不使用 OFFSET，
+    也不计算总数，翻到很深的页时开销与第一页相同。排序键的最后一项必须唯一（通常是主键）。
+
+    Args:
+        query: 已应用过滤条件、未排序的查询
+        keys: [(列, 从结果对象取值的函数), ...]，按排序优先级排列
+        per_page: 每页条数
+        after: 下一页游标，返回该位置之后的记录
+        before: 上一页游标，返回该位置之前的记录
+        descending: 是否按排序键降序排列
+
+    Returns:
+        KeysetPage: 当前页结果及前后页游标
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    columns = [column for column, _ in keys]
+    forward = before is None
+    cursor = after if forward else before
+
+    # 向前翻页时按相反方向查询，取到结果后再倒回来
+    desc = descending if forward else not descending
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        if desc:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    order = [column.desc() if desc else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    def cursor_of(item):
+        return encode_cursor([getter(item) for _, getter in keys])
+
+    if forward:
+        next_cursor = cursor_of(rows[-1]) if has_more else None
+        prev_cursor = cursor_of(rows[0]) if cursor else None
+    else:
+        next_cursor = cursor_of(rows[-1])
+        prev_cursor = cursor_of(rows[0]) if has_more else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
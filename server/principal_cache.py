@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class Principal:
+    """已验证的请求用户
+
+    只包含接口处理函数用到的字段（id、uid、username、is_admin），
+    与数据库会话无关，可以在请求之间安全复用。
+    """
+
+    __slots__ = ('id', 'uid', 'username', 'is_admin')
+
+    def __init__(self, id, uid, username, is_admin):
+        self.id = id
+        self.uid = uid
+        self.username = username
+        self.is_admin = bool(is_admin)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.uid, user.username, user.is_admin)
+
+
+class PrincipalCache:
+    """进程内的已验证用户缓存（按 uid 索引，带过期时间）
+
+    token_required 每次请求都要确认用户仍然存在并读取其权限，
+    缓存命中时无需查询数据库。用户被删除或权限变更时需调用 invalidate，
+    多进程部署时其他进程最迟在 ttl 秒后重新读取数据库。
+    """
+
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, uid):
+        """返回缓存的 Principal，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[uid]
+                return None
+            return principal
+
+    def put(self, principal):
+        with self._lock:
+            if len(self._entries) >= self.max_size and principal.uid not in self._entries:
+                self._evict_expired()
+                if len(self._entries) >= self.max_size:
+                    # 仍然超出上限时丢弃最早加入的条目
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[principal.uid] = (principal, time.monotonic() + self.ttl)
+
+    def invalidate(self, uid):
+        """用户被删除或信息变更后立即移除其缓存"""
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for uid in [uid for uid, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[uid]
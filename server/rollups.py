@@ -0,0 +1,126 @@
+import datetime
+
+from models import db, WeeklyStats, WeeklyRollup, UserYearRollup
+
+
+def percentile(sorted_values, q):
+    """计算已排序数据的分位数（线性插值）
+
+    Args:
+        sorted_values: 升序排列的数值列表
+        q: 分位（0-100）
+
+    Returns:
+        float: 分位数，列表为空时返回0
+    """
+    if not sorted_values:
+        return 0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def refresh_week_rollup(year, week):
+    """根据 weekly_stats 重新计算某一周的全体汇总
+
+    只读取该周的记录（按 (year, week) 索引），分位数需要完整分布，
+    因此按周重算而不是做增量加减。调用方负责提交事务。
+    """
+    rows = db.session.query(WeeklyStats.weekday_duration, WeeklyStats.weekend_duration) \
+        .filter(WeeklyStats.year == year, WeeklyStats.week == week) \
+        .all()
+
+    rollup = WeeklyRollup.query.filter_by(year=year, week=week).first()
+    if not rows:
+        if rollup:
+            db.session.delete(rollup)
+        return None
+
+    if rollup is None:
+        rollup = WeeklyRollup(year=year, week=week)
+        db.session.add(rollup)
+
+    weekday_sum = sum(weekday or 0 for weekday, _ in rows)
+    weekend_sum = sum(weekend or 0 for _, weekend in rows)
+    totals = sorted(t for t in ((weekday or 0) + (weekend or 0) for weekday, weekend in rows) if t > 0)
+
+    rollup.active_users = len(totals)
+    rollup.weekday_sum = weekday_sum
+    rollup.weekend_sum = weekend_sum
+    rollup.total_sum = weekday_sum + weekend_sum
+    rollup.total_mean = int(sum(totals) / len(totals)) if totals else 0
+    rollup.total_p50 = int(percentile(totals, 50))
+    rollup.total_p90 = int(percentile(totals, 90))
+    rollup.total_max = totals[-1] if totals else 0
+    rollup.updated_at = datetime.datetime.now()
+    return rollup
+
+
+def refresh_user_year_rollup(user_id, year):
+    """根据 weekly_stats 重新计算某个用户某一年的汇总，调用方负责提交事务"""
+    row = db.session.query(
+        db.func.count(WeeklyStats.id),
+        db.func.coalesce(db.func.sum(WeeklyStats.weekday_duration), 0),
+        db.func.coalesce(db.func.sum(WeeklyStats.weekend_duration), 0),
+        db.func.coalesce(db.func.max(WeeklyStats.weekday_duration + WeeklyStats.weekend_duration), 0),
+        db.func.sum(db.case((WeeklyStats.weekday_duration + WeeklyStats.weekend_duration > 0, 1), else_=0))
+    ).filter(WeeklyStats.user_id == user_id, WeeklyStats.year == year).one()
+    count, weekday_sum, weekend_sum, total_max, active_weeks = row
+
+    rollup = UserYearRollup.query.filter_by(user_id=user_id, year=year).first()
+    if not count:
+        if rollup:
+            db.session.delete(rollup)
+        return None
+
+    if rollup is None:
+        rollup = UserYearRollup(user_id=user_id, year=year)
+        db.session.add(rollup)
+
+    active_weeks = active_weeks or 0
+    rollup.active_weeks = active_weeks
+    rollup.weekday_sum = weekday_sum
+    rollup.weekend_sum = weekend_sum
+    rollup.total_sum = weekday_sum + weekend_sum
+    rollup.total_mean = int((weekday_sum + weekend_sum) / active_weeks) if active_weeks else 0
+    rollup.total_max = total_max
+    rollup.updated_at = datetime.datetime.now()
+    return rollup
+
+
+def update_rollups(user_id, year, week):
+    """某个用户某一周的统计数据变化后，更新受影响的周汇总和用户年度汇总"""
+    refresh_week_rollup(year, week)
+    refresh_user_year_rollup(user_id, year)
+
+
+def rebuild_rollups():
+    """根据全部 weekly_stats 重建汇总表（汇总表为空时使用）"""
+    WeeklyRollup.query.delete()
+    UserYearRollup.query.delete()
+    for year, week in db.session.query(WeeklyStats.year, WeeklyStats.week).distinct().all():
+        refresh_week_rollup(year, week)
+    for user_id, year in db.session.query(WeeklyStats.user_id, WeeklyStats.year).distinct().all():
+        refresh_user_year_rollup(user_id, year)
+    db.session.commit()
+
+
+def ensure_rollups():
+    """汇总表为空而已有周统计数据时（例如旧数据库首次启动）重建汇总"""
+    if WeeklyRollup.query.first() is None and WeeklyStats.query.first() is not None:
+        rebuild_rollups()
+
+
+def get_week_rollups(year):
+    """返回某一年按周排列的全体汇总"""
+    return WeeklyRollup.query.filter_by(year=year).order_by(WeeklyRollup.week.asc()).all()
+
+
+def get_user_year_rollups(year, user_id=None):
+    """返回某一年的用户年度汇总（按总时长降序），可只取一个用户"""
+    query = UserYearRollup.query.options(db.joinedload(UserYearRollup.user)).filter_by(year=year)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return query.order_by(UserYearRollup.total_sum.desc()).all()
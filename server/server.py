@@ -1,15 +1,27 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template, redirect, url_for, session, flash
+from flask import Flask, request, jsonify, send_file, render_template, redirect, url_for, session, flash, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 import os
 import json
-import uuid
 from functools import wraps
+from sqlalchemy import tuple_
 
 # 导入简化后的数据库模型
-from models import db, User, File, WeeklyStats
+from models import db, User, File, WeeklyStats, ActivitySession, upgrade_schema, upsert_weekly_stats, get_file_type_counts, serialize_with_users
+from db_config import configure_database
+from blob_store import BlobStore
+from storage import create_storage, normalize_key
+from chunked_upload import ChunkedUploadStore
+from pagination import keyset_paginate
+from principal_cache import Principal, PrincipalCache
+from thumbnails import ThumbnailCache
+from file_serving import send_upload
+from ingest_writer import IngestWriter
+from streaming_upload import multipart_boundary, parse_streaming_multipart
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from rollups import refresh_week_rollup, refresh_user_year_rollup, ensure_rollups, get_week_rollups, get_user_year_rollups
 
 # 导入CSV相关库
 import csv
@@ -22,10 +34,27 @@ CORS(app)  # 启用跨域请求支持
 # 配置信息
 app.config['SECRET_KEY'] = 'your_secret_key'  # 实际应用中应该使用环境变量
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 数据库连接由环境变量 DATABASE_URL 决定，默认使用 server 目录下的 SQLite 文件
+configure_database(app)
 app.config['SERVER_VERSION'] = '1.1.0'  # 简化版服务器
 app.config['API_COUNT'] = 0  # API请求计数器
+app.config['BATCH_MAX_ITEMS'] = 500  # 批量上传单次请求最多包含的文件数
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 单个请求体的最大字节数，超过时返回413
+app.config['CHUNKED_UPLOAD_MAX_SIZE'] = 2 * 1024 * 1024 * 1024  # 分块上传单个文件的最大字节数
+app.config['PRINCIPAL_CACHE_TTL'] = 60  # 已验证用户缓存的有效期（秒）
+app.config['INGEST_MAX_BATCH'] = 200  # 上传写入队列每批最多提交的记录数
+app.config['INGEST_MAX_DELAY'] = 0.005  # 上传写入队列凑批的最长等待时间（秒）
+app.config['USE_X_SENDFILE'] = False  # 部署在 Apache/lighttpd 之后时可开启，由前端服务器发送文件
+app.config['X_ACCEL_REDIRECT_PREFIX'] = None  # 部署在 Nginx 之后时设为映射到 uploads 目录的 internal location，如 '/protected-uploads'
+# 文件存储后端：local（默认，保存在 UPLOAD_FOLDER）或 s3（S3/MinIO 等对象存储）
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')  # MinIO 等 S3 兼容服务的地址
+app.config['S3_PREFIX'] = os.environ.get('S3_PREFIX', '')
+app.config['S3_REGION'] = os.environ.get('S3_REGION')
+app.config['THUMBNAIL_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thumbnails')
+app.config['THUMBNAIL_SIZE'] = (320, 240)  # 缩略图最大宽高
+app.config['THUMBNAIL_CACHE_MAX_BYTES'] = 256 * 1024 * 1024  # 缩略图缓存目录上限
 
 # 初始化数据库
 db.init_app(app)
@@ -38,9 +67,36 @@ app.config['SERVER_START_TIME'] = server_start_time.strftime('%Y-%m-%d %H:%M:%S'
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
+# 文件存储后端，File.file_path 保存的是其中的对象键
+storage = create_storage(app.config)
+
+# 内容寻址存储，相同内容的文件只保存一份
+blob_store = BlobStore(storage)
+
+# 上传接口的写入队列：文件记录和周统计由单个写入线程批量提交
+ingest_writer = IngestWriter(app, db,
+                             max_batch=app.config['INGEST_MAX_BATCH'],
+                             max_delay=app.config['INGEST_MAX_DELAY'])
+
+# Token 对应用户的缓存，避免每个API请求都查询 users 表
+principal_cache = PrincipalCache(ttl=app.config['PRINCIPAL_CACHE_TTL'])
+
+# 管理界面图片列表使用的缩略图缓存
+thumbnail_cache = ThumbnailCache(app.config['THUMBNAIL_FOLDER'],
+                                 size=app.config['THUMBNAIL_SIZE'],
+                                 max_bytes=app.config['THUMBNAIL_CACHE_MAX_BYTES'])
+
+# 分块上传暂存区，与存储后端的暂存目录位于同一位置，本地存储时完成后可直接重命名
+chunked_uploads = ChunkedUploadStore(os.path.join(storage.staging_dir, 'partial'))
+
 # 在应用上下文中创建所有数据库表
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    # 旧数据库首次启动时根据 files 表生成文件类型计数
+    get_file_type_counts()
+    # 旧数据库首次启动时根据 weekly_stats 生成统计汇总
+    ensure_rollups()
 
 # API请求中间件：计数器和计时器
 @app.before_request
@@ -64,9 +120,12 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(uid=data['uid']).first()
+            current_user = load_principal(data['uid'])
             if current_user is None:
                 return jsonify({'message': '无效的用户'}), 401
+            # 新签发的Token带有用户id，与当前用户不一致说明Token已失效
+            if 'id' in data and data['id'] != current_user.id:
+                return jsonify({'message': '无效的用户'}), 401
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token已过期'}), 401
         except jwt.InvalidTokenError:
@@ -75,6 +134,17 @@ def token_required(f):
         return f(current_user, *args, **kwargs)
     return decorated
 
+# 根据 uid 获取已验证的用户，优先使用缓存，未命中时查询数据库
+def load_principal(uid):
+    principal = principal_cache.get(uid)
+    if principal is None:
+        user = User.query.filter_by(uid=uid).first()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        principal_cache.put(principal)
+    return principal
+
 # 管理员权限装饰器 (API)
 def admin_required(f):
     @wraps(f)
@@ -108,6 +178,232 @@ def admin_required_web(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Web界面调用的管理API：使用会话认证，失败时返回JSON而不是跳转
+def admin_required_session(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'message': '未登录'}), 401
+        
+        user = User.query.filter_by(uid=session['user_id']).first()
+        
+        if not user or not user.is_admin:
+            return jsonify({'message': '需要管理员权限'}), 403
+            
+        return f(user, *args, **kwargs)
+    return decorated_function
+
+# 根据文件名（以及客户端声明的类型）判断文件类型
+def detect_file_type(filename, declared_type=None):
+    # 客户端上传时使用 info 表示应用进程信息
+    if declared_type == 'info':
+        declared_type = 'applications'
+    if declared_type in ('screenshot', 'camera', 'applications'):
+        return declared_type
+
+    lower_name = filename.lower()
+    if lower_name.endswith(('.png', '.jpg', '.jpeg', '.webp')):
+        if 'screenshot' in lower_name:
+            return 'screenshot'
+        elif 'camera' in lower_name:
+            return 'camera'
+    elif lower_name.endswith('info.json'):
+        return 'applications'
+    return 'other'
+
+# 解析客户端记录目录名 (YYYYMMDD_HHMMSS) 得到采集时间
+def parse_record_timestamp(record):
+    try:
+        return datetime.datetime.strptime(record, '%Y%m%d_%H%M%S')
+    except (TypeError, ValueError):
+        return None
+
+# 当前用户是否已有相同内容的文件记录。上传响应中的 deduplicated 只按用户自己的记录判断，
+# 不反映其他用户是否存储过该内容，避免通过上传探测其他用户的文件
+def user_has_content(user_id, file_hash):
+    return db.session.query(File.id).filter_by(user_id=user_id, file_hash=file_hash).first() is not None
+
+# 解析客户端上传的本地时间（ISO格式，不带时区）。会话按客户端本地日期统计并保存在不带时区的列中，
+# 带时区偏移的时间无法与其比较，按格式错误处理
+def parse_local_datetime(value):
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise ValueError('时间不能带时区')
+    return parsed
+
+# 批量删除不再被任何 files 记录引用的存储对象（按批查询仍被引用的键）。
+# 只在写入队列操作 flush 之后调用，与新文件记录的写入串行进行（见 ensure_blobs_exist）
+def remove_unreferenced_files(file_paths):
+    file_paths = list({path for path in file_paths if path})
+    for start in range(0, len(file_paths), app.config['BATCH_MAX_ITEMS']):
+        chunk = file_paths[start:start + app.config['BATCH_MAX_ITEMS']]
+        referenced = {row[0] for row in db.session.query(File.file_path).filter(File.file_path.in_(chunk)).distinct()}
+        for file_path in chunk:
+            if file_path in referenced:
+                continue
+            try:
+                storage.delete(file_path)
+            except Exception as e:
+                app.logger.error(f'删除文件失败: {file_path}, {e}')
+
+# 发送存储中的文件：本地存储由 send_upload 发送（支持ETag、Range和代理转发），
+# 对象存储跳转到有时效的下载地址。键不合法或指向暂存目录时抛出 NotFound
+def send_stored_file(key, private=False):
+    try:
+        key = normalize_key(key)
+    except ValueError:
+        raise NotFound()
+    if key.startswith('.'):
+        raise NotFound()
+    
+    url = storage.url(key)
+    if url:
+        # 预签名地址不检查对象是否存在，先确认存在以便与本地存储一样返回 404
+        if not storage.exists(key):
+            raise NotFound()
+        return redirect(url)
+    return send_upload(storage.root_dir, key, content_hash=blob_store.hash_from_path(key), private=private)
+
+# 流式解析上传请求时，file 字段的内容写入存储暂存目录，其他文件字段丢弃
+def upload_temp_path(field_name, filename):
+    if field_name != 'file' or not os.path.basename(filename or ''):
+        return None
+    return blob_store.new_temp_path()
+
+# 流式解析批量上传请求时，每个带文件名的文件字段都写入存储暂存目录
+def batch_temp_path(field_name, filename):
+    if not os.path.basename(filename or ''):
+        return None
+    return blob_store.new_temp_path()
+
+# 按用户分组统计某个模型的记录数，返回 {user_id: 数量}
+def count_by_user(model, user_ids):
+    if not user_ids:
+        return {}
+    rows = db.session.query(model.user_id, db.func.count(model.id)) \
+        .filter(model.user_id.in_(user_ids)) \
+        .group_by(model.user_id) \
+        .all()
+    return dict(rows)
+
+# ---------- 写入队列中执行的操作（见 IngestWriter） ----------
+
+# 确认新文件记录引用的存储对象仍然存在，在写入队列操作 flush 之后调用。
+# 清理未引用文件同样在写入队列中、flush 之后检查引用（SQLite 此时已持有写锁），二者不会交错：
+# 要么清理时看到新记录而保留对象，要么新记录在这里发现对象已被删除，整个操作失败、不会提交
+def ensure_blobs_exist(file_paths):
+    for file_path in set(file_paths):
+        if not storage.exists(file_path):
+            raise FileNotFoundError(f'文件内容已被清理: {file_path}')
+
+# 新增文件记录，返回新记录的id
+def ingest_file_record(defer, fields):
+    db_file = File(**fields)
+    db.session.add(db_file)
+    
+    def result():
+        ensure_blobs_exist([db_file.file_path])
+        return db_file.id
+    return result
+
+# 写入队列操作：同一请求的多条文件记录（批量上传），在同一批次中一起提交或一起失败
+def ingest_file_records(defer, rows):
+    db_files = [File(**fields) for fields in rows]
+    db.session.add_all(db_files)
+    
+    def result():
+        ensure_blobs_exist([db_file.file_path for db_file in db_files])
+        return [db_file.id for db_file in db_files]
+    return result
+
+# 写入队列操作：删除文件记录，提交前清理不再被引用的存储对象，返回被删除记录的id（不存在时为None）
+def ingest_delete_file(defer, file_id):
+    db_file = db.session.get(File, file_id)
+    if db_file is None:
+        return lambda: None
+    file_path = db_file.file_path
+    db.session.delete(db_file)
+    defer(('remove_files', 'file', file_id), lambda: remove_unreferenced_files([file_path]))
+    return lambda: file_id
+
+# 写入队列操作：删除用户及其全部数据，重算受影响的周汇总并清理不再被引用的存储对象，
+# 返回被删除用户的uid（不存在时为None）
+def ingest_delete_user(defer, user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return lambda: None
+    
+    uid = user.uid
+    affected_weeks = db.session.query(WeeklyStats.year, WeeklyStats.week) \
+        .filter(WeeklyStats.user_id == user.id) \
+        .distinct() \
+        .all()
+    file_paths = [row[0] for row in db.session.query(File.file_path).filter(File.user_id == user.id).distinct()]
+    db.session.delete(user)
+    for year, week in affected_weeks:
+        defer(('week', year, week), lambda year=year, week=week: refresh_week_rollup(year, week))
+    defer(('remove_files', 'user', user_id), lambda: remove_unreferenced_files(file_paths))
+    return lambda: uid
+
+# 写入队列操作：新增或更新某用户的计时会话，intervals 为 [(开始时间, 结束时间), ...]，返回新增的会话数
+def ingest_activity_sessions(defer, user_id, intervals):
+    existing = {
+        session_row.start_time: session_row
+        for session_row in ActivitySession.query.filter(
+            ActivitySession.user_id == user_id,
+            ActivitySession.start_time.in_([start_time for start_time, _ in intervals])
+        ).all()
+    }
+    
+    created = 0
+    for start_time, end_time in intervals:
+        session_row = existing.get(start_time)
+        if session_row is None:
+            db.session.add(ActivitySession(user_id=user_id, start_time=start_time, end_time=end_time))
+            created += 1
+        elif session_row.end_time != end_time:
+            session_row.end_time = end_time
+            session_row.upload_time = datetime.datetime.now()
+    return lambda: created
+
+# 写入队列等待超时时的响应：操作已被取消、没有写入任何数据，客户端可以直接重试
+def ingest_busy_response():
+    return jsonify({'message': '服务器繁忙，请稍后重试'}), 503
+
+# 文件内容在写入记录前被并发清理时的响应：没有写入任何数据，客户端重新上传内容即可
+def blob_missing_response():
+    return jsonify({'message': '文件内容已被清理，请重新上传'}), 409
+
+# 新增或更新某用户多周的统计，整批提交前每个受影响的汇总只重算一次
+def ingest_weekly_stats(defer, user_id, entries):
+    ids = upsert_weekly_stats(user_id, entries)
+    for entry in entries:
+        year, week = entry['year'], entry['week']
+        defer(('week', year, week), lambda year=year, week=week: refresh_week_rollup(year, week))
+        defer(('user_year', user_id, year), lambda year=year: refresh_user_year_rollup(user_id, year))
+    return lambda: ids
+
+# 校验并转换一条周统计上传数据，返回 (数据, 错误消息)
+def parse_weekly_stats_entry(data):
+    if not isinstance(data, dict) or not all(k in data for k in ['year', 'week', 'weekday_seconds', 'weekend_seconds']):
+        return None, '缺少必要参数'
+    
+    # 确保转换为整数类型
+    try:
+        entry = {
+            'year': int(data['year']),
+            'week': int(data['week']),
+            'weekday_seconds': int(data['weekday_seconds']),
+            'weekend_seconds': int(data['weekend_seconds'])
+        }
+    except (ValueError, TypeError):
+        return None, '年份、周数或时长必须是有效数字'
+    
+    # 验证数据
+    if not (1 <= entry['week'] <= 53) or entry['year'] < 2000:
+        return None, '无效的年份或周数'
+    return entry, None
+
 # ====================== API 路由 ======================
 
 # 用户注册
@@ -159,6 +455,7 @@ def login():
     # 生成JWT令牌
     token = jwt.encode({
         'uid': user.uid,
+        'id': user.id,
         'username': user.username,
         'is_admin': user.is_admin,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
@@ -176,137 +473,483 @@ def login():
 @app.route('/api/upload/weekly_stats', methods=['POST'])
 @token_required
 def upload_weekly_stats(current_user):
-    data = request.get_json()
-    if not data or not all(k in data for k in ['year', 'week', 'weekday_seconds', 'weekend_seconds']):
-        return jsonify({'message': '缺少必要参数'}), 400
+    entry, error = parse_weekly_stats_entry(request.get_json())
+    if error:
+        return jsonify({'message': error}), 400
     
-    # 确保转换为整数类型
+    # 由写入队列与其他上传一起批量提交，提交成功后返回
     try:
-        year = int(data['year'])
-        week = int(data['week'])
-        weekday_seconds = int(data['weekday_seconds'])
-        weekend_seconds = int(data['weekend_seconds'])
-    except (ValueError, TypeError):
-        return jsonify({'message': '年份、周数或时长必须是有效数字'}), 400
+        ids = ingest_writer.write(ingest_weekly_stats, current_user.id, [entry])
+    except TimeoutError:
+        return ingest_busy_response()
+    except Exception as e:
+        return jsonify({'message': f'上传失败: {str(e)}'}), 500
     
-    # 验证数据
-    if not (1 <= week <= 53) or year < 2000:
-        return jsonify({'message': '无效的年份或周数'}), 400
-    
-    # 检查是否已存在记录
-    existing_stats = WeeklyStats.query.filter_by(
-        user_id=current_user.id,
-        year=year,
-        week=week
-    ).first()
-    
-    if existing_stats:
-        # 更新已有记录
-        existing_stats.weekday_duration = weekday_seconds
-        existing_stats.weekend_duration = weekend_seconds
-        existing_stats.upload_time = datetime.datetime.now()
-        
-        try:
-            db.session.commit()
-            return jsonify({
-                'message': '周工作时长统计更新成功',
-                'id': existing_stats.id
-            })
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'message': f'更新失败: {str(e)}'}), 500
-    else:
-        # 创建新记录
-        new_stats = WeeklyStats(
-            user_id=current_user.id,
-            year=year,
-            week=week,
-            weekday_duration=weekday_seconds,
-            weekend_duration=weekend_seconds
-        )
-        
+    return jsonify({
+        'message': '周工作时长统计上传成功',
+        'id': ids[(entry['year'], entry['week'])]
+    })
+
+# 一次上传多周的工作时长统计，同一周重复上传时覆盖
+@app.route('/api/upload/weekly_stats/bulk', methods=['POST'])
+@token_required
+def upload_weekly_stats_bulk(current_user):
+    data = request.get_json(silent=True) or {}
+    weeks = data.get('weeks')
+    if not isinstance(weeks, list) or not weeks:
+        return jsonify({'message': '缺少周统计数据'}), 400
+    if len(weeks) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'message': f"单次最多上传 {app.config['BATCH_MAX_ITEMS']} 周的统计"}), 400
+    
+    # 同一周出现多次时以最后一条为准（一条 ON CONFLICT 语句中不能重复更新同一行）
+    entries = {}
+    for index, item in enumerate(weeks):
+        entry, error = parse_weekly_stats_entry(item)
+        if error:
+            return jsonify({'message': f'第{index + 1}条: {error}'}), 400
+        entries[(entry['year'], entry['week'])] = entry
+    
+    try:
+        ids = ingest_writer.write(ingest_weekly_stats, current_user.id, list(entries.values()))
+    except TimeoutError:
+        return ingest_busy_response()
+    except Exception as e:
+        return jsonify({'message': f'上传失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '周工作时长统计上传成功',
+        'weeks': [{'year': year, 'week': week, 'id': ids[(year, week)]} for year, week in entries]
+    })
+
+# 上传计时会话区间，同一会话（开始时间相同）重复上传时更新结束时间
+@app.route('/api/upload/activity_sessions', methods=['POST'])
+@token_required
+def upload_activity_sessions(current_user):
+    data = request.get_json(silent=True)
+    sessions = data.get('sessions') if isinstance(data, dict) else None
+    if not isinstance(sessions, list) or not sessions:
+        return jsonify({'message': '缺少会话数据'}), 400
+    if len(sessions) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'message': f"单次最多上传 {app.config['BATCH_MAX_ITEMS']} 个会话"}), 400
+    
+    # 解析并校验会话区间，同一开始时间只保留最后一条
+    intervals = {}
+    for item in sessions:
         try:
-            db.session.add(new_stats)
-            db.session.commit()
-            return jsonify({
-                'message': '周工作时长统计上传成功',
-                'id': new_stats.id
-            })
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'message': f'上传失败: {str(e)}'}), 500
+            start_time = parse_local_datetime(item['start'])
+            end_time = parse_local_datetime(item['end'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'message': '会话时间格式无效，应为不带时区的本地时间'}), 400
+        duration = (end_time - start_time).total_seconds()
+        if duration < 0 or duration > ActivitySession.MAX_DURATION:
+            return jsonify({'message': '会话时长无效'}), 400
+        intervals[start_time] = end_time
+    
+    try:
+        created = ingest_writer.write(ingest_activity_sessions, current_user.id, list(intervals.items()))
+    except TimeoutError:
+        return ingest_busy_response()
+    except Exception as e:
+        return jsonify({'message': f'会话保存失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '会话上传成功',
+        'created': created,
+        'updated': len(intervals) - created
+    })
 
 # 上传文件（截图、摄像头等）
 @app.route('/api/upload/file', methods=['POST'])
 @token_required
 def upload_file(current_user):
-    if 'file' not in request.files:
+    try:
+        _, files = parse_streaming_multipart(request, upload_temp_path)
+    except RequestEntityTooLarge:
+        return jsonify({'message': '上传内容超过大小限制'}), 413
+    except ValueError:
+        return jsonify({'message': '没有文件'}), 400
+    
+    upload = files.get('file')
+    if upload is None:
         return jsonify({'message': '没有文件'}), 400
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'message': '未选择文件'}), 400
+    # 按内容哈希保存到存储后端（哈希和大小在接收时已经算好），不再为每次上传创建目录
+    filename = os.path.basename(upload.filename)
+    try:
+        file_path, file_hash, file_size, _ = blob_store.adopt(
+            upload.tmp_path, upload.file_hash, upload.size, filename)
+    except Exception as e:
+        return jsonify({'message': f'文件保存失败: {str(e)}'}), 500
+    finally:
+        upload.discard()
     
-    if file:
-        # 创建用户目录
-        user_dir = os.path.join(app.config['UPLOAD_FOLDER'], current_user.uid)
-        if not os.path.exists(user_dir):
-            os.makedirs(user_dir)
-        
-        # 获取当前日期信息用于创建年份_周数目录
-        today = datetime.datetime.now()
-        year = today.year
-        week = today.isocalendar()[1]  # ISO周号
-        week_dir_name = f"{year}_{week:02d}"
-        
-        # 创建年份_周数目录
-        week_dir = os.path.join(user_dir, week_dir_name)
-        if not os.path.exists(week_dir):
-            os.makedirs(week_dir)
-            
-        # 创建时间戳目录 (YYYYMMDD_HHMMSS)
-        timestamp_dir_name = today.strftime('%Y%m%d_%H%M%S')
-        timestamp_dir = os.path.join(week_dir, timestamp_dir_name)
-        if not os.path.exists(timestamp_dir):
-            os.makedirs(timestamp_dir)
-        
-        # 保存文件
-        file_path = os.path.join(timestamp_dir, file.filename)
-        file.save(file_path)
-        
-        # 获取文件类型
-        file_type = 'other'
-        if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-            if 'screenshot' in file.filename.lower():
-                file_type = 'screenshot'
-            elif 'camera' in file.filename.lower():
-                file_type = 'camera'
-        elif file.filename.lower() == 'info.json':  # 新的文件名称
-            file_type = 'applications'
-            
-        # 将文件记录保存到数据库
-        relative_path = os.path.relpath(file_path, app.config['UPLOAD_FOLDER'])
-        db_file = File(
+    # 获取文件类型
+    file_type = detect_file_type(filename)
+    
+    # 将文件记录保存到数据库
+    today = datetime.datetime.now()
+    try:
+        file_id = ingest_writer.write(ingest_file_record, dict(
             user_id=current_user.id,
-            filename=file.filename,
+            filename=filename,
             file_type=file_type,
+            file_path=file_path,
+            file_date=today.date(),
+            file_time=today.time(),
+            file_hash=file_hash,
+            file_size=file_size
+        ))
+    except TimeoutError:
+        return ingest_busy_response()
+    except FileNotFoundError:
+        return blob_missing_response()
+    except Exception as e:
+        return jsonify({'message': f'文件记录创建失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '文件上传成功',
+        'file_path': file_path,
+        'file_hash': file_hash,
+        'id': file_id
+    })
+
+# 检查文件是否已上传过（按内容哈希）
+@app.route('/api/check_file', methods=['POST'])
+@token_required
+def check_file(current_user):
+    data = request.get_json()
+    if not data or not data.get('file_hash'):
+        return jsonify({'message': '缺少必要参数'}), 400
+    
+    file_hash = data['file_hash'].lower()
+    if not BlobStore.is_valid_hash(file_hash):
+        return jsonify({'message': '无效的文件哈希'}), 400
+    
+    # 只在当前用户自己的文件中查找，避免通过哈希探测其他用户的内容
+    existing = File.query.filter_by(user_id=current_user.id, file_hash=file_hash).first()
+    if not existing or not storage.exists(existing.file_path):
+        return jsonify({'exists': False})
+    
+    # 如果提供了文件名，直接为这次上传创建文件记录（秒传）
+    filename = data.get('filename')
+    if filename:
+        today = datetime.datetime.now()
+        try:
+            ingest_writer.write(ingest_file_record, dict(
+                user_id=current_user.id,
+                filename=os.path.basename(filename),
+                file_type=detect_file_type(filename, data.get('file_type')),
+                file_path=existing.file_path,
+                file_date=today.date(),
+                file_time=today.time(),
+                file_hash=file_hash,
+                file_size=existing.file_size
+            ))
+        except TimeoutError:
+            return ingest_busy_response()
+        except FileNotFoundError:
+            return jsonify({'exists': False})
+        except Exception as e:
+            return jsonify({'message': f'文件记录创建失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'exists': True,
+        'file_path': existing.file_path
+    })
+
+# 上传文件并按内容哈希去重
+@app.route('/api/upload/file_with_hash', methods=['POST'])
+@token_required
+def upload_file_with_hash(current_user):
+    # 文件内容边接收边写入暂存目录并计算哈希，不再由 Werkzeug 先缓存一份
+    try:
+        form, files = parse_streaming_multipart(request, upload_temp_path)
+    except RequestEntityTooLarge:
+        return jsonify({'message': '上传内容超过大小限制'}), 413
+    except ValueError:
+        return jsonify({'message': '没有文件'}), 400
+    
+    upload = files.get('file')
+    if upload is None:
+        return jsonify({'message': '没有文件'}), 400
+    
+    file_hash = form.get('file_hash')
+    filename = os.path.basename(upload.filename)
+    try:
+        if file_hash and not BlobStore.is_valid_hash(file_hash):
+            return jsonify({'message': '无效的文件哈希'}), 400
+        relative_path, file_hash, file_size, created = blob_store.adopt(
+            upload.tmp_path, upload.file_hash, upload.size, filename, expected_hash=file_hash)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    finally:
+        # 内容已存在或校验失败时临时文件未被移走
+        upload.discard()
+    deduplicated = user_has_content(current_user.id, file_hash)
+    
+    today = datetime.datetime.now()
+    try:
+        file_id = ingest_writer.write(ingest_file_record, dict(
+            user_id=current_user.id,
+            filename=filename,
+            file_type=detect_file_type(filename, form.get('file_type')),
             file_path=relative_path,
             file_date=today.date(),
-            file_time=today.time()
-        )
+            file_time=today.time(),
+            file_hash=file_hash,
+            file_size=file_size
+        ))
+    except TimeoutError:
+        return ingest_busy_response()
+    except FileNotFoundError:
+        return blob_missing_response()
+    except Exception as e:
+        return jsonify({'message': f'文件记录创建失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '文件上传成功',
+        'file_path': relative_path,
+        'file_hash': file_hash,
+        'deduplicated': deduplicated,
+        'id': file_id
+    })
+
+# 批量上传多条记录的文件，所有文件记录在一个事务中提交
+@app.route('/api/upload/batch', methods=['POST'])
+@token_required
+def upload_batch(current_user):
+    # 清单可以作为JSON请求体（只检查哈希、不带文件内容），也可以作为multipart中的manifest字段；
+    # multipart 中的文件边接收边写入暂存目录并计算哈希，不再由 Werkzeug 先缓存一份
+    if multipart_boundary(request) is None:
+        return save_batch_items(current_user, request.get_json(silent=True), {})
+    
+    try:
+        form, files = parse_streaming_multipart(request, batch_temp_path,
+                                                max_parts=app.config['BATCH_MAX_ITEMS'] + 1)
+    except RequestEntityTooLarge:
+        return jsonify({'message': '上传内容超过大小限制'}), 413
+    except ValueError:
+        return jsonify({'message': '请求格式错误'}), 400
+    
+    try:
+        try:
+            manifest = json.loads(form.get('manifest', ''))
+        except ValueError:
+            return jsonify({'message': '清单格式错误'}), 400
+        return save_batch_items(current_user, manifest, files)
+    finally:
+        for upload in files.values():
+            upload.discard()
+
+# 按清单保存批量上传的文件记录，files 为 {字段名: StreamedFile}，其中的临时文件由调用方删除
+def save_batch_items(current_user, manifest, files):
+    items = manifest.get('items') if isinstance(manifest, dict) else None
+    if not items or not isinstance(items, list):
+        return jsonify({'message': '缺少必要参数'}), 400
+    if len(items) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'message': f"单次最多上传 {app.config['BATCH_MAX_ITEMS']} 个文件"}), 400
+    
+    # 一次查询出当前用户已有的同哈希文件，用于跳过未携带内容的条目
+    hashes = set()
+    for item in items:
+        file_hash = item.get('file_hash') if isinstance(item, dict) else None
+        if isinstance(file_hash, str) and BlobStore.is_valid_hash(file_hash.lower()):
+            hashes.add(file_hash.lower())
+    existing_paths = {}
+    if hashes:
+        for file_hash, file_path, file_size in db.session.query(
+                File.file_hash, File.file_path, File.file_size).filter(
+                File.user_id == current_user.id, File.file_hash.in_(hashes)):
+            existing_paths[file_hash] = (file_path, file_size)
+    
+    now = datetime.datetime.now()
+    results = []
+    new_files = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('filename'):
+            results.append({'index': index, 'status': 'error', 'message': '缺少文件名'})
+            continue
+        
+        filename = os.path.basename(str(item['filename']))
+        file_hash = item.get('file_hash') or ''
+        if not isinstance(file_hash, str) or (file_hash and not BlobStore.is_valid_hash(file_hash.lower())):
+            results.append({'index': index, 'status': 'error', 'message': '无效的文件哈希'})
+            continue
+        file_hash = file_hash.lower()
+        
+        field = item.get('field')
+        upload = files.get(field) if isinstance(field, str) else None
+        if upload:
+            try:
+                file_path, file_hash, file_size, created = blob_store.adopt(
+                    upload.tmp_path, upload.file_hash, upload.size, filename,
+                    expected_hash=file_hash or None)
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'message': str(e)})
+                continue
+            except Exception as e:
+                results.append({'index': index, 'status': 'error', 'message': f'文件保存失败: {str(e)}'})
+                continue
+            # existing_paths 只包含当前用户已有（及本批次已登记）的内容
+            status = 'deduplicated' if file_hash in existing_paths else 'stored'
+        elif file_hash in existing_paths and storage.exists(existing_paths[file_hash][0]):
+            file_path, file_size = existing_paths[file_hash]
+            status = 'deduplicated'
+        else:
+            results.append({'index': index, 'status': 'missing'})
+            continue
         
+        # 优先使用客户端记录的采集时间
+        captured_at = parse_record_timestamp(item.get('record')) or now
+        new_files.append(dict(
+            user_id=current_user.id,
+            filename=filename,
+            file_type=detect_file_type(filename, item.get('file_type')),
+            file_path=file_path,
+            file_date=captured_at.date(),
+            file_time=captured_at.time(),
+            file_hash=file_hash,
+            file_size=file_size
+        ))
+        existing_paths[file_hash] = (file_path, file_size)
+        results.append({'index': index, 'status': status, 'file_path': file_path})
+    
+    if new_files:
         try:
-            db.session.add(db_file)
-            db.session.commit()
-            
-            return jsonify({
-                'message': '文件上传成功',
-                'file_path': relative_path.replace('\\', '/'),
-                'id': db_file.id
-            })
+            ingest_writer.write(ingest_file_records, new_files)
+        except TimeoutError:
+            return ingest_busy_response()
+        except FileNotFoundError:
+            return blob_missing_response()
         except Exception as e:
-            db.session.rollback()
             return jsonify({'message': f'文件记录创建失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '批量上传完成',
+        'saved': len(new_files),
+        'results': results
+    })
+
+# 分块上传：创建上传会话
+@app.route('/api/upload/chunked/init', methods=['POST'])
+@token_required
+def chunked_upload_init(current_user):
+    data = request.get_json()
+    if not data or not data.get('filename') or 'file_size' not in data:
+        return jsonify({'message': '缺少必要参数'}), 400
+    
+    try:
+        file_size = int(data['file_size'])
+    except (ValueError, TypeError):
+        return jsonify({'message': '文件大小必须是有效数字'}), 400
+    if file_size < 0:
+        return jsonify({'message': '无效的文件大小'}), 400
+    if file_size > app.config['CHUNKED_UPLOAD_MAX_SIZE']:
+        return jsonify({'message': '文件超过大小限制'}), 413
+    
+    file_hash = (data.get('file_hash') or '').lower()
+    if file_hash and not BlobStore.is_valid_hash(file_hash):
+        return jsonify({'message': '无效的文件哈希'}), 400
+    
+    upload_id = chunked_uploads.create({
+        'user_id': current_user.id,
+        'filename': os.path.basename(data['filename']),
+        'file_type': data.get('file_type'),
+        'file_size': file_size,
+        'file_hash': file_hash,
+        'record': data.get('record')
+    })
+    return jsonify({'upload_id': upload_id, 'offset': 0})
+
+# 分块上传：查询已接收的偏移
+@app.route('/api/upload/chunked/<upload_id>', methods=['GET'])
+@token_required
+def chunked_upload_status(current_user, upload_id):
+    meta = chunked_uploads.get_meta(upload_id)
+    if not meta or meta['user_id'] != current_user.id:
+        return jsonify({'message': '上传会话不存在'}), 404
+    
+    return jsonify({
+        'upload_id': upload_id,
+        'offset': chunked_uploads.offset(upload_id),
+        'file_size': meta['file_size']
+    })
+
+# 分块上传：在指定偏移处追加数据块（请求体为原始字节）
+@app.route('/api/upload/chunked/<upload_id>', methods=['PUT'])
+@token_required
+def chunked_upload_chunk(current_user, upload_id):
+    meta = chunked_uploads.get_meta(upload_id)
+    if not meta or meta['user_id'] != current_user.id:
+        return jsonify({'message': '上传会话不存在'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'message': '缺少偏移参数'}), 400
+    
+    # 同一会话同时只允许一个请求写入，否则两个携带相同偏移的请求都会通过偏移检查并重复追加
+    try:
+        with chunked_uploads.locked(upload_id):
+            new_offset = chunked_uploads.append(upload_id, offset, request.stream, meta['file_size'])
+    except BlockingIOError as e:
+        return jsonify({'message': str(e), 'offset': chunked_uploads.offset(upload_id)}), 423
+    except ValueError as e:
+        return jsonify({'message': str(e), 'offset': chunked_uploads.offset(upload_id)}), 409
+    
+    return jsonify({'upload_id': upload_id, 'offset': new_offset})
+
+# 分块上传：校验完整性并保存文件
+@app.route('/api/upload/chunked/<upload_id>/finalize', methods=['POST'])
+@token_required
+def chunked_upload_finalize(current_user, upload_id):
+    meta = chunked_uploads.get_meta(upload_id)
+    if not meta or meta['user_id'] != current_user.id:
+        return jsonify({'message': '上传会话不存在'}), 404
+    
+    try:
+        with chunked_uploads.locked(upload_id):
+            offset = chunked_uploads.offset(upload_id)
+            if offset != meta['file_size']:
+                return jsonify({'message': '文件尚未上传完整', 'offset': offset}), 409
+            
+            try:
+                relative_path, file_hash, file_size, created = blob_store.save_file(
+                    chunked_uploads.part_path(upload_id), meta['filename'],
+                    expected_hash=meta['file_hash'] or None)
+            finally:
+                chunked_uploads.discard(upload_id)
+    except BlockingIOError as e:
+        return jsonify({'message': str(e)}), 423
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    deduplicated = user_has_content(current_user.id, file_hash)
+    
+    captured_at = parse_record_timestamp(meta.get('record')) or datetime.datetime.now()
+    try:
+        file_id = ingest_writer.write(ingest_file_record, dict(
+            user_id=current_user.id,
+            filename=meta['filename'],
+            file_type=detect_file_type(meta['filename'], meta.get('file_type')),
+            file_path=relative_path,
+            file_date=captured_at.date(),
+            file_time=captured_at.time(),
+            file_hash=file_hash,
+            file_size=file_size
+        ))
+    except TimeoutError:
+        return ingest_busy_response()
+    except FileNotFoundError:
+        return blob_missing_response()
+    except Exception as e:
+        return jsonify({'message': f'文件记录创建失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': '文件上传成功',
+        'file_path': relative_path,
+        'file_hash': file_hash,
+        'deduplicated': deduplicated,
+        'id': file_id
+    })
 
 # 管理员获取所有用户列表
 @app.route('/api/admin/users', methods=['GET'])
@@ -320,14 +963,23 @@ def get_all_users(current_user):
 @app.route('/api/files/<path:filename>')
 @token_required
 def get_file(current_user, filename):
-    # 验证当前用户是否有权访问该文件
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    # 验证当前用户是否有权访问该文件（旧版本按 用户uid/... 的键保存，新文件都在去重存储中）
     uid_from_path = filename.split('/')[0]
     
-    if current_user.uid != uid_from_path and not current_user.is_admin:
+    if uid_from_path == blob_store.dir_name:
+        # 去重存储的文件不在用户目录下，需要通过文件记录确认归属
+        allowed = current_user.is_admin or File.query.filter_by(
+            user_id=current_user.id, file_path=filename).first() is not None
+    else:
+        allowed = current_user.uid == uid_from_path or current_user.is_admin
+    
+    if not allowed:
         return jsonify({'message': '没有权限访问此文件'}), 403
-        
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    
+    try:
+        return send_stored_file(filename, private=True)
+    except NotFound:
+        return jsonify({'message': '文件不存在'}), 404
 
 # 获取用户每周统计数据
 @app.route('/api/stats/weekly', methods=['GET'])
@@ -349,7 +1001,7 @@ def get_user_weekly_stats(current_user):
     # 按年份和周数排序
     stats = query.order_by(WeeklyStats.year.desc(), WeeklyStats.week.desc()).all()
     
-    return jsonify([stat.to_dict() for stat in stats])
+    return jsonify([stat.to_dict(user=current_user) for stat in stats])
 
 # 管理员获取所有用户的周统计数据
 @app.route('/api/admin/stats/weekly', methods=['GET'])
@@ -361,8 +1013,8 @@ def admin_get_weekly_stats(current_user):
     year = request.args.get('year', type=int)
     week = request.args.get('week', type=int)
     
-    # 构建查询
-    query = WeeklyStats.query
+    # 构建查询（同时加载用户，序列化时不再逐行查询）
+    query = WeeklyStats.query_with_user()
     
     # 如果指定了用户ID，则过滤
     if user_id:
@@ -376,23 +1028,121 @@ def admin_get_weekly_stats(current_user):
     if week:
         query = query.filter_by(week=week)
     
-    # 分页支持
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)  # 默认每页20条
-    
-    # 按年份和周数倒序排序，分页
-    pagination = query.order_by(WeeklyStats.year.desc(), 
-                              WeeklyStats.week.desc()).paginate(
-        page=page, per_page=per_page, error_out=False)
+    # 按年份和周数倒序排序，使用游标分页
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 200))  # 默认每页20条
+    keys = [
+        (WeeklyStats.year, lambda stat: stat.year),
+        (WeeklyStats.week, lambda stat: stat.week),
+        (WeeklyStats.id, lambda stat: stat.id)
+    ]
+    try:
+        pagination = keyset_paginate(query, keys, per_page,
+                                     after=request.args.get('cursor'),
+                                     before=request.args.get('before'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    # 返回分页数据
+    # 返回分页数据，next_cursor 作为下一次请求的 cursor 参数
     return jsonify({
         'stats': [stat.to_dict() for stat in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor
     })
 
+# 管理员获取统计汇总：每周全体汇总和各用户年度汇总
+@app.route('/api/admin/stats/rollups', methods=['GET'])
+@token_required
+@admin_required
+def admin_get_stats_rollups(current_user):
+    year = request.args.get('year', datetime.datetime.now().year, type=int)
+    user_id = request.args.get('user_id')
+    
+    user_pk = None
+    if user_id:
+        user = User.query.filter_by(uid=user_id).first()
+        if not user:
+            return jsonify({'message': '用户不存在'}), 404
+        user_pk = user.id
+    
+    return jsonify({
+        'year': year,
+        'weeks': [rollup.to_dict() for rollup in get_week_rollups(year)],
+        'users': [rollup.to_dict() for rollup in get_user_year_rollups(year, user_pk)]
+    })
+
+# 管理员删除文件记录（文件管理页面使用）
+@app.route('/api/admin/file/<int:file_id>', methods=['DELETE'])
+@admin_required_session
+def admin_delete_file(current_user, file_id):
+    # 删除记录和清理存储对象都在写入队列中进行，避免删掉并发上传刚确认存在、尚未写入记录的对象
+    try:
+        deleted = ingest_writer.write(ingest_delete_file, file_id)
+    except TimeoutError:
+        return ingest_busy_response()
+    except Exception as e:
+        return jsonify({'message': f'删除文件记录失败: {str(e)}'}), 500
+    if deleted is None:
+        return jsonify({'message': '文件不存在'}), 404
+    
+    return jsonify({'message': '文件已删除', 'id': file_id})
+
+# 管理员修改用户信息（用户名、密码、管理员权限）
+@app.route('/api/admin/user/<int:user_id>', methods=['PUT'])
+@admin_required_session
+def admin_update_user(current_user, user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({'message': '用户不存在'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    username = (data.get('username') or '').strip()
+    if username and username != user.username:
+        if User.query.filter_by(username=username).first() is not None:
+            return jsonify({'message': '用户名已存在'}), 409
+        user.username = username
+    
+    if 'is_admin' in data:
+        is_admin = bool(data['is_admin'])
+        if user.id == current_user.id and not is_admin:
+            return jsonify({'message': '不能取消自己的管理员权限'}), 400
+        user.is_admin = is_admin
+    
+    if data.get('password'):
+        user.set_password(data['password'])
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'更新用户失败: {str(e)}'}), 500
+    
+    # 权限或用户名变更后立即生效，不等缓存过期
+    principal_cache.invalidate(user.uid)
+    return jsonify({'message': '用户更新成功', 'user': user.to_dict()})
+
+# 管理员删除用户及其全部数据
+@app.route('/api/admin/user/<int:user_id>', methods=['DELETE'])
+@admin_required_session
+def admin_delete_user(current_user, user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({'message': '用户不存在'}), 404
+    if user.id == current_user.id:
+        return jsonify({'message': '不能删除当前登录的管理员'}), 400
+    
+    # 与删除单个文件相同，在写入队列中删除并清理存储对象
+    try:
+        uid = ingest_writer.write(ingest_delete_user, user.id)
+    except TimeoutError:
+        return ingest_busy_response()
+    except Exception as e:
+        return jsonify({'message': f'删除用户失败: {str(e)}'}), 500
+    if uid is None:
+        return jsonify({'message': '用户不存在'}), 404
+    
+    principal_cache.invalidate(uid)
+    return jsonify({'message': '用户已删除', 'id': user_id})
+
 # ====================== Web界面路由 ======================
 
 # 首页
@@ -468,14 +1218,14 @@ def dashboard():
     ).limit(5).all()
     
     # 文件列表 - 获取最近12张图片
-    files = File.query.filter(
+    files = File.query_with_user().filter(
         File.file_type.in_(['screenshot', 'camera'])
     ).order_by(File.timestamp.desc()).limit(12).all()
     
     # 转换文件列表为前端可用格式
     file_list = []
     for file in files:
-        user = db.session.get(User, file.user_id)
+        user = file.user
         
         # 确保文件路径不为空且规范化
         safe_file_path = file.file_path.replace('\\', '/') if file.file_path else ""
@@ -489,7 +1239,8 @@ def dashboard():
             'time': file.file_time.strftime('%H:%M:%S') if file.file_time else '',
             'username': user.username if user else 'unknown',
             'user_id': user.id if user else None,
-            'url': f'/uploads/{safe_file_path}' if safe_file_path else ""  # 保留url字段，因为模板中直接用于img标签
+            'url': f'/uploads/{safe_file_path}' if safe_file_path else "",  # 保留url字段，因为模板中直接用于img标签
+            'thumb_url': f'/thumbs/{safe_file_path}' if safe_file_path else ""
         }
         file_list.append(file_item)
     
@@ -499,7 +1250,7 @@ def dashboard():
     return render_template('dashboard.html',
                           username=session.get('username', '管理员'),
                           users=[user.to_dict() for user in users],
-                          stats=[stat.to_dict() for stat in stats],
+                          stats=serialize_with_users(stats),
                           files=file_list,
                           user_count=len(users),
                           stats_count=WeeklyStats.query.count(),
@@ -536,12 +1287,15 @@ def dashboard_users():
     pagination = query.order_by(User.username).paginate(
         page=page, per_page=per_page, error_out=False)
     
-    # 为每个用户添加统计数据和文件计数
+    # 为每个用户添加统计数据和文件计数（每种计数一次分组查询）
+    user_ids = [user.id for user in pagination.items]
+    stats_counts = count_by_user(WeeklyStats, user_ids)
+    file_counts = count_by_user(File, user_ids)
     users_with_counts = []
     for user in pagination.items:
         user_dict = user.to_dict()
-        user_dict['stats_count'] = WeeklyStats.query.filter_by(user_id=user.id).count()
-        user_dict['file_count'] = File.query.filter_by(user_id=user.id).count()
+        user_dict['stats_count'] = stats_counts.get(user.id, 0)
+        user_dict['file_count'] = file_counts.get(user.id, 0)
         users_with_counts.append(user_dict)
     
     return render_template('users.html', 
@@ -597,30 +1351,42 @@ def dashboard_files():
         except ValueError:
             pass  # 忽略无效的日期格式
     
-    # 应用排序
+    # 排序键：最后一项为主键，保证游标唯一
+    id_key = (File.id, lambda f: f.id)
+    descending = True
     if sort_by == 'date_asc':
-        query = query.order_by(File.file_date.asc(), File.file_time.asc())
-    elif sort_by == 'date_desc':
-        query = query.order_by(File.file_date.desc(), File.file_time.desc())
+        keys = [(File.timestamp, lambda f: f.timestamp), id_key]
+        descending = False
     elif sort_by == 'name_asc':
-        query = query.order_by(File.filename.asc())
+        keys = [(File.filename, lambda f: f.filename), id_key]
+        descending = False
     elif sort_by == 'name_desc':
-        query = query.order_by(File.filename.desc())
+        keys = [(File.filename, lambda f: f.filename), id_key]
     elif sort_by == 'type':
-        query = query.order_by(File.file_type.asc())
+        # file_type 可以为空，NULL 与任何值比较都不成立，排序和游标比较都按空字符串处理
+        keys = [(db.func.coalesce(File.file_type, ''), lambda f: f.file_type or ''), id_key]
+        descending = False
     elif sort_by == 'user':
-        # 按用户名排序需要联接用户表
-        query = query.join(User, File.user_id == User.id).order_by(User.username.asc())
+        # 按用户名排序需要联接用户表，同时用联接结果填充 file.user
+        query = query.join(User, File.user_id == User.id).options(db.contains_eager(File.user))
+        keys = [(User.username, lambda f: f.user.username), id_key]
+        descending = False
     else:
-        # 默认按时间戳降序
-        query = query.order_by(File.timestamp.desc())
-    
-    # 分页支持
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 24, type=int)  # 每页显示24个文件
+        # 默认按时间降序
+        keys = [(File.timestamp, lambda f: f.timestamp), id_key]
+    if sort_by != 'user':
+        query = query.options(db.joinedload(File.user))
     
-    # 查询文件并添加分页
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # 游标分页，不使用 OFFSET 也不计算总数
+    per_page = max(1, min(request.args.get('per_page', 24, type=int), 200))  # 每页默认显示24个文件
+    try:
+        pagination = keyset_paginate(query, keys, per_page,
+                                     after=request.args.get('cursor'),
+                                     before=request.args.get('before'),
+                                     descending=descending)
+    except ValueError:
+        # 游标无效时回到第一页
+        pagination = keyset_paginate(query, keys, per_page, descending=descending)
     
     # 获取所有用户列表，供筛选使用
     all_users = User.query.all()
@@ -628,7 +1394,7 @@ def dashboard_files():
     # 转换文件列表为前端可用格式
     file_list = []
     for file in pagination.items:
-        user = db.session.get(User, file.user_id)
+        user = file.user
         
         # 确保文件路径不为空且规范化
         safe_file_path = file.file_path.replace('\\', '/') if file.file_path else ""
@@ -645,21 +1411,20 @@ def dashboard_files():
         }
         file_list.append(file_item)
     
-    # 计算不同类型文件的数量，用于显示在过滤器中
+    # 不同类型文件的数量，用于显示在过滤器中（来自汇总表，不扫描 files 表）
+    counts = get_file_type_counts()
     type_counts = {
-        'all': File.query.count(),
-        'screenshot': File.query.filter_by(file_type='screenshot').count(),
-        'camera': File.query.filter_by(file_type='camera').count(),
-        'applications': File.query.filter_by(file_type='applications').count(),
-        'other': File.query.filter_by(file_type='other').count()
+        'all': sum(counts.values()),
+        'screenshot': counts.get('screenshot', 0),
+        'camera': counts.get('camera', 0),
+        'applications': counts.get('applications', 0),
+        'other': counts.get('other', 0)
     }
     
     return render_template('files.html',
                           username=session.get('username', '管理员'),
                           files=file_list,
                           pagination=pagination,
-                          pages=pagination.pages,
-                          page=page,
                           file_type=file_type,
                           type_counts=type_counts,
                           all_users=all_users,  # 传递全部用户列表，而不只是users
@@ -681,22 +1446,9 @@ def dashboard_statistics():
     # 获取所有用户以供选择
     users = User.query.all()
     
-    # 构建查询
-    query = WeeklyStats.query
-    
-    # 如果指定了用户，则过滤
+    # 如果指定了用户，则只显示该用户的数据
     selected_username = "全部用户"
-    if user_id:
-        user = User.query.filter_by(uid=user_id).first()
-        if user:
-            query = query.filter_by(user_id=user.id)
-            selected_username = user.username
-    
-    # 过滤年份        
-    query = query.filter_by(year=year)
-    
-    # 按周数排序
-    stats = query.order_by(WeeklyStats.week.asc()).all()
+    selected_user = User.query.filter_by(uid=user_id).first() if user_id else None
     
     # 准备图表数据和表格数据
     weeks = []
@@ -708,34 +1460,59 @@ def dashboard_statistics():
     total_weekday_seconds = 0
     total_weekend_seconds = 0
     
-    for stat in stats:
-        # 图表数据
-        weeks.append(f"第{stat.week}周")
-        weekday_hour = stat.weekday_duration // 3600
-        weekend_hour = stat.weekend_duration // 3600
-        total_hour = (stat.weekday_duration + stat.weekend_duration) // 3600
+    if selected_user:
+        selected_username = selected_user.username
         
-        weekday_hours.append(weekday_hour)
-        weekend_hours.append(weekend_hour)
-        total_hours.append(total_hour)
+        # 单个用户一年最多53条记录，直接按索引读取
+        stats = WeeklyStats.query.filter_by(user_id=selected_user.id, year=year) \
+            .order_by(WeeklyStats.week.asc()).all()
         
-        # 累计时长统计
-        total_weekday_seconds += stat.weekday_duration
-        total_weekend_seconds += stat.weekend_duration
-        
-        # 表格数据
-        user = db.session.get(User, stat.user_id)
-        username = user.username if user else "未知用户"
+        for stat in stats:
+            # 图表数据
+            weeks.append(f"第{stat.week}周")
+            weekday_hours.append(stat.weekday_duration // 3600)
+            weekend_hours.append(stat.weekend_duration // 3600)
+            total_hours.append((stat.weekday_duration + stat.weekend_duration) // 3600)
+            
+            # 表格数据
+            stats_for_table.append({
+                'user_id': stat.user_id,
+                'username': selected_user.username,
+                'week': stat.week,
+                'weekday_hours': stat.format_duration(stat.weekday_duration),
+                'weekend_hours': stat.format_duration(stat.weekend_duration),
+                'total_hours': stat.format_duration(stat.weekday_duration + stat.weekend_duration),
+                'daily_avg': stat.format_duration((stat.weekday_duration + stat.weekend_duration) // 7)
+            })
         
-        stats_for_table.append({
-            'user_id': stat.user_id,
-            'username': username,
-            'week': stat.week,
-            'weekday_hours': stat.format_duration(stat.weekday_duration),
-            'weekend_hours': stat.format_duration(stat.weekend_duration),
-            'total_hours': stat.format_duration(stat.weekday_duration + stat.weekend_duration),
-            'daily_avg': stat.format_duration((stat.weekday_duration + stat.weekend_duration) // 7)
-        })
+        # 累计时长来自用户年度汇总
+        user_rollups = get_user_year_rollups(year, selected_user.id)
+        if user_rollups:
+            total_weekday_seconds = user_rollups[0].weekday_sum
+            total_weekend_seconds = user_rollups[0].weekend_sum
+    else:
+        # 全部用户：直接读取每周汇总，不再扫描所有用户的周记录
+        for rollup in get_week_rollups(year):
+            weeks.append(f"第{rollup.week}周")
+            weekday_hours.append(rollup.weekday_sum // 3600)
+            weekend_hours.append(rollup.weekend_sum // 3600)
+            total_hours.append(rollup.total_sum // 3600)
+            
+            total_weekday_seconds += rollup.weekday_sum
+            total_weekend_seconds += rollup.weekend_sum
+            
+            stats_for_table.append({
+                'user_id': None,
+                'active_users': rollup.active_users,
+                'week': rollup.week,
+                'weekday_hours': WeeklyStats.format_duration(None, rollup.weekday_sum),
+                'weekend_hours': WeeklyStats.format_duration(None, rollup.weekend_sum),
+                'total_hours': WeeklyStats.format_duration(None, rollup.total_sum),
+                'daily_avg': WeeklyStats.format_duration(None, rollup.total_sum // 7),
+                'mean_hours': WeeklyStats.format_duration(None, rollup.total_mean),
+                'p50_hours': WeeklyStats.format_duration(None, rollup.total_p50),
+                'p90_hours': WeeklyStats.format_duration(None, rollup.total_p90)
+            })
     
     # 汇总时长格式化
     total_seconds = total_weekday_seconds + total_weekend_seconds
@@ -788,74 +1565,77 @@ def get_week_detail():
             })
             
         week_stat = WeeklyStats.query.filter_by(
-            user_id=user_id,
+            user_id=user.id,
             year=year,
             week=week
         ).first()
         
-        if not week_stat:
+        # 计算这一周的日期范围（ISO周）
+        try:
+            week_start_date = datetime.date.fromisocalendar(year, week, 1)
+        except ValueError:
             return jsonify({
                 'success': False,
-                'message': '没有找到对应周的数据'
+                'message': '无效的年份或周数'
             })
+        week_end_date = week_start_date + datetime.timedelta(days=6)
+        week_start = datetime.datetime.combine(week_start_date, datetime.time.min)
+        week_end = week_start + datetime.timedelta(days=7)
         
-        # 计算这一周的日期范围
-        first_day_of_year = datetime.date(year, 1, 1)
-        days_to_add = (week - 1) * 7
-        if first_day_of_year.weekday() != 0:  # 如果1月1日不是周一
-            days_to_add -= first_day_of_year.weekday()
+        # 按 (user_id, start_time) 索引查询本周的计时会话
+        sessions = ActivitySession.overlapping(user.id, week_start, week_end).all()
         
-        week_start_date = first_day_of_year + datetime.timedelta(days=days_to_add)
-        week_end_date = week_start_date + datetime.timedelta(days=6)
+        if not week_stat and not sessions:
+            return jsonify({
+                'success': False,
+                'message': '没有找到对应周的数据'
+            })
+        
+        # 将会话区间按天切分，统计每天的时长和最早开始、最晚结束时间
+        day_seconds = [0] * 7
+        day_first_start = [None] * 7
+        day_last_end = [None] * 7
+        for activity in sessions:
+            start_time = max(activity.start_time, week_start)
+            end_time = min(activity.end_time, week_end)
+            while start_time < end_time:
+                day_index = (start_time.date() - week_start_date).days
+                day_end = datetime.datetime.combine(start_time.date() + datetime.timedelta(days=1), datetime.time.min)
+                segment_end = min(end_time, day_end)
+                day_seconds[day_index] += int((segment_end - start_time).total_seconds())
+                if day_first_start[day_index] is None or start_time < day_first_start[day_index]:
+                    day_first_start[day_index] = start_time
+                if day_last_end[day_index] is None or segment_end > day_last_end[day_index]:
+                    day_last_end[day_index] = segment_end
+                start_time = segment_end
         
-        # 准备每天的详细数据 (这里是模拟数据，实际应从数据库获取)
         days_detail = []
         weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        
-        # 从统计文件或数据库获取每天的工作记录
-        # 此处仅生成模拟数据，实际应用中应从数据库查询
-        current_date = week_start_date
         for i in range(7):
-            is_weekend = i >= 5  # 周六周日是周末
-            
-            # 每天的工作时长，这里使用模拟数据
-            if is_weekend:
-                # 周末的时长分布
-                if week_stat.weekend_duration > 0:
-                    # 如果有周末时长，则按比例分配
-                    if i == 5:  # 周六占60%
-                        day_seconds = int(week_stat.weekend_duration * 0.6)
-                    else:  # 周日占40%
-                        day_seconds = int(week_stat.weekend_duration * 0.4)
-                else:
-                    day_seconds = 0
-            else:
-                # 工作日的时长，平均分配
-                day_seconds = int(week_stat.weekday_duration / 5) if week_stat.weekday_duration > 0 else 0
-            
-            # 生成开始和结束时间
-            start_time = "09:00:00" if day_seconds > 0 else "-"
-            end_time = "17:00:00" if day_seconds > 0 else "-"
-            
+            current_date = week_start_date + datetime.timedelta(days=i)
             days_detail.append({
                 'date': current_date.strftime('%Y-%m-%d'),
                 'weekday': weekday_names[i],
-                'is_weekend': is_weekend,
-                'duration': week_stat.format_duration(day_seconds),
-                'start_time': start_time,
-                'end_time': end_time
+                'is_weekend': i >= 5,  # 周六周日是周末
+                'duration': WeeklyStats.format_duration(None, day_seconds[i]),
+                'duration_seconds': day_seconds[i],
+                'start_time': day_first_start[i].strftime('%H:%M:%S') if day_first_start[i] else '-',
+                'end_time': day_last_end[i].strftime('%H:%M:%S') if day_last_end[i] else '-'
             })
-            
-            current_date += datetime.timedelta(days=1)
+        
+        # 周合计优先使用客户端上传的周统计，没有时使用会话合计
+        weekday_duration = week_stat.weekday_duration if week_stat else sum(day_seconds[:5])
+        weekend_duration = week_stat.weekend_duration if week_stat else sum(day_seconds[5:])
         
         # 返回详细数据
         detail_data = {
             'username': user.username,
             'week_start': week_start_date.strftime('%Y-%m-%d'),
             'week_end': week_end_date.strftime('%Y-%m-%d'),
-            'weekday_hours': week_stat.format_duration(week_stat.weekday_duration),
-            'weekend_hours': week_stat.format_duration(week_stat.weekend_duration),
-            'total_hours': week_stat.format_duration(week_stat.weekday_duration + week_stat.weekend_duration),
+            'weekday_hours': WeeklyStats.format_duration(None, weekday_duration),
+            'weekend_hours': WeeklyStats.format_duration(None, weekend_duration),
+            'total_hours': WeeklyStats.format_duration(None, weekday_duration + weekend_duration),
+            'has_sessions': bool(sessions),
             'days': days_detail
         }
         
@@ -870,118 +1650,158 @@ def get_week_detail():
             'message': f'发生错误: {str(e)}'
         })
 
-# 统计数据导出API
+# 统计数据导出API（流式输出CSV，不在内存中拼接整个文件）
 @app.route('/dashboard/export_stats')
 @admin_required_web
 def export_stats():
     # 获取请求参数
-    year = request.args.get('year', type=int)
+    # year 为具体年份时导出该年的周范围；为 all 时导出所有年份中该周范围的数据；
+    # 也可以用 start_year/end_year 指定跨年范围，如 2024年第40周 至 2025年第10周
+    year = request.args.get('year', 'all')
+    start_year = request.args.get('start_year', type=int)
+    end_year = request.args.get('end_year', type=int)
     start_week = request.args.get('start_week', 1, type=int)
-    end_week = request.args.get('end_week', 52, type=int)
+    end_week = request.args.get('end_week', 53, type=int)
     export_type = request.args.get('export_type', 'all_users')
     user_id = request.args.get('user_id')
     
-    # 参数验证
-    if not year:
-        flash('请选择年份', 'danger')
-        return redirect(url_for('dashboard_statistics'))
+    if year != 'all':
+        try:
+            start_year = end_year = int(year)
+        except ValueError:
+            flash('年份无效', 'danger')
+            return redirect(url_for('dashboard_statistics'))
     
-    if start_week < 1 or start_week > 52 or end_week < 1 or end_week > 52 or start_week > end_week:
+    # 参数验证（ISO周数最大为53）
+    if start_week < 1 or start_week > 53 or end_week < 1 or end_week > 53:
         flash('周数范围无效', 'danger')
         return redirect(url_for('dashboard_statistics'))
+    if (start_year or 0, start_week) > (end_year or start_year or 9999, end_week):
+        flash('导出范围无效', 'danger')
+        return redirect(url_for('dashboard_statistics'))
+    
+    # 构建查询：只取需要的列，并一次联接用户表得到用户名
+    query = db.session.query(
+        WeeklyStats.id, WeeklyStats.user_id, User.username, WeeklyStats.year, WeeklyStats.week,
+        WeeklyStats.weekday_duration, WeeklyStats.weekend_duration, WeeklyStats.upload_time
+    ).join(User, WeeklyStats.user_id == User.id)
     
-    # 构建查询条件
-    query = WeeklyStats.query.filter(
-        WeeklyStats.year == year,
-        WeeklyStats.week >= start_week,
-        WeeklyStats.week <= end_week
-    )
+    year_week = tuple_(WeeklyStats.year, WeeklyStats.week)
+    if start_year:
+        query = query.filter(year_week >= tuple_(start_year, start_week))
+    else:
+        query = query.filter(WeeklyStats.week >= start_week)
+    if end_year:
+        query = query.filter(year_week <= tuple_(end_year, end_week))
+    else:
+        query = query.filter(WeeklyStats.week <= end_week)
     
     # 如果只导出选定用户的数据
     if export_type == 'selected_user' and user_id:
         user = User.query.filter_by(uid=user_id).first()
         if user:
-            query = query.filter_by(user_id=user.id)
+            query = query.filter(WeeklyStats.user_id == user.id)
     
-    # 执行查询
-    stats_data = query.order_by(WeeklyStats.user_id, WeeklyStats.week).all()
+    query = query.order_by(WeeklyStats.user_id, WeeklyStats.year, WeeklyStats.week)
     
-    if not stats_data:
+    if query.first() is None:
         flash('所选条件下没有数据可导出', 'warning')
         return redirect(url_for('dashboard_statistics'))
     
-    # 创建内存文件用于CSV
-    csv_data = io.StringIO()
-    csv_writer = csv.writer(csv_data)
-    
-    # 写入CSV标题行
-    csv_writer.writerow([
-        'ID', '用户ID', '用户名', '年份', '周数', '工作日时长(秒)', 
-        '工作日时长(时:分:秒)', '周末时长(秒)', '周末时长(时:分:秒)', 
-        '总时长(秒)', '总时长(时:分:秒)', '更新时间'
-    ])
-    
-    # 写入数据行
-    for stat in stats_data:
-        user = db.session.get(User, stat.user_id)
-        username = user.username if user else "未知用户"
-        
-        total_seconds = stat.weekday_duration + stat.weekend_duration
+    def generate():
+        # 每积累一定大小的数据输出一次，数据库结果分批读取
+        buffer = io.StringIO()
+        csv_writer = csv.writer(buffer)
         
+        # 写入CSV标题行
         csv_writer.writerow([
-            stat.id,
-            stat.user_id,
-            username,
-            stat.year,
-            stat.week,
-            stat.weekday_duration,
-            stat.format_duration(stat.weekday_duration),
-            stat.weekend_duration,
-            stat.format_duration(stat.weekend_duration),
-            total_seconds,
-            stat.format_duration(total_seconds),
-            stat.upload_time.isoformat() if stat.upload_time else ''
+            'ID', '用户ID', '用户名', '年份', '周数', '工作日时长(秒)', 
+            '工作日时长(时:分:秒)', '周末时长(秒)', '周末时长(时:分:秒)', 
+            '总时长(秒)', '总时长(时:分:秒)', '更新时间'
         ])
+        
+        # 写入数据行
+        for row in query.yield_per(1000):
+            weekday_duration = row.weekday_duration or 0
+            weekend_duration = row.weekend_duration or 0
+            total_seconds = weekday_duration + weekend_duration
+            
+            csv_writer.writerow([
+                row.id,
+                row.user_id,
+                row.username,
+                row.year,
+                row.week,
+                weekday_duration,
+                WeeklyStats.format_duration(None, weekday_duration),
+                weekend_duration,
+                WeeklyStats.format_duration(None, weekend_duration),
+                total_seconds,
+                WeeklyStats.format_duration(None, total_seconds),
+                row.upload_time.isoformat() if row.upload_time else ''
+            ])
+            
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        
+        yield buffer.getvalue()
     
     # 设置响应headers
-    filename = f"work_stats_{year}_W{start_week}-W{end_week}.csv"
+    if start_year and start_year == end_year:
+        range_name = f"{start_year}_W{start_week}-W{end_week}"
+    elif not start_year and not end_year:
+        range_name = f"all_W{start_week}-W{end_week}"
+    else:
+        range_name = f"{start_year or 'all'}W{start_week}-{end_year or 'all'}W{end_week}"
+    filename = f"work_stats_{range_name}.csv"
     headers = {
-        'Content-Disposition': f'attachment; filename="{filename}"',
-        'Content-Type': 'text/csv; charset=utf-8'
+        'Content-Disposition': f'attachment; filename="{filename}"'
     }
     
-    # 返回CSV文件
-    return csv_data.getvalue(), 200, headers
+    # 返回流式CSV响应
+    return Response(stream_with_context(generate()), mimetype='text/csv; charset=utf-8', headers=headers)
 
 # 提供上传文件访问 - 增强错误处理
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    """允许访问上传的文件，使图片预览功能正常工作"""
+    """允许访问上传的文件，使图片预览功能正常工作
+
+    filename 为存储对象键。去重存储的键包含内容哈希，按不可变资源缓存并以哈希作为ETag；
+    支持 If-None-Match 和 Range 请求。使用对象存储时跳转到有时效的下载地址。
+    """
+    filename = filename.lstrip('/')
+    if not filename:
+        return "错误: 未指定文件名", 400
     try:
-        app.logger.debug(f"Attempting to serve file: {filename}")
-        if not filename or filename.strip() == '':
-            app.logger.error("Empty filename requested")
-            return "错误: 未指定文件名", 400
-        
-        # 修正可能的路径问题
-        filename = filename.lstrip('/')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        if not os.path.exists(filepath):
-            app.logger.error(f"File not found: {filepath}")
+        return send_stored_file(filename)
+    except NotFound:
+        app.logger.debug(f"File not found: {filename}")
+        return f"文件不存在: {filename}", 404
+
+# 图片缩略图：首次访问时生成并缓存，无法生成时跳转到原图
+# 只有管理界面使用缩略图，需要管理员登录，避免未登录的请求触发图片解码和缓存淘汰
+@app.route('/thumbs/<path:filename>')
+@admin_required_session
+def thumbnail_file(current_user, filename):
+    try:
+        key = normalize_key(filename)
+    except ValueError:
+        return f"文件不存在: {filename}", 404
+    if key.startswith('.'):
+        return f"文件不存在: {filename}", 404
+    
+    thumb_path = thumbnail_cache.get(storage, key)
+    if thumb_path is None:
+        if not storage.exists(key):
             return f"文件不存在: {filename}", 404
-            
-        directory = os.path.dirname(filepath)
-        file_only = os.path.basename(filepath)
-        
-        if not file_only:  # 处理只请求目录的情况
-            app.logger.error(f"Directory requested without file: {directory}")
-            return "错误: 未指定文件名", 400
-        
-        return send_from_directory(directory, file_only)
-    except Exception as e:
-        app.logger.error(f"File access error: {str(e)}, filename: {filename}")
-        return f"文件访问错误: {str(e)}", 404
+        return redirect(url_for('uploaded_file', filename=key))
+    
+    response = send_file(thumb_path, mimetype='image/webp', max_age=86400)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import posixpath
+
+try:
+    import boto3
+except ImportError:  # 只使用本地存储时不需要安装 boto3
+    boto3 = None
+
+
+def normalize_key(key):
+    """规范化对象键（统一使用 / 分隔），拒绝绝对路径和 .. 等路径穿越
+
+    Raises:
+        ValueError: 键为空或不合法
+    """
+    key = (key or '').replace('\\', '/').lstrip('/')
+    if not key or any(part in ('', '.', '..') for part in key.split('/')):
+        raise ValueError(f'无效的存储键: {key}')
+    return key
+
+
+class LocalStorage:
+    """本地磁盘存储，对象键即相对于根目录的路径
+
+    上传的文件先写入暂存目录（与根目录在同一文件系统），完成后重命名到对象键对应的位置。
+    """
+
+    def __init__(self, root_dir, staging_dir=None):
+        """初始化存储
+
+        Args:
+            root_dir: 存储根目录（UPLOAD_FOLDER）
+            staging_dir: 暂存目录，默认为根目录下的 .staging
+        """
+        self.root_dir = root_dir
+        self.staging_dir = staging_dir or os.path.join(root_dir, '.staging')
+        self.tmp_dir = os.path.join(self.staging_dir, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def local_path(self, key):
+        """返回对象在本地磁盘上的路径"""
+        return os.path.join(self.root_dir, *normalize_key(key).split('/'))
+
+    def put(self, tmp_path, key):
+        """把暂存文件移到对象键对应的位置（重命名，不复制数据）"""
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def stat(self, key):
+        """返回 (大小, 修改时间)，对象不存在时返回 None"""
+        try:
+            st = os.stat(self.local_path(key))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key, expires=300):
+        """本地存储由应用自己发送文件，不提供直接访问地址"""
+        return None
+
+
+class S3Storage:
+    """S3 兼容的对象存储（AWS S3、MinIO 等）
+
+    对象键与本地存储相同，因此已有的 uploads 目录可以原样同步到存储桶（加上 prefix）。
+    上传的文件同样先写入本地暂存目录，完成后上传并删除暂存文件。
+    """
+
+    def __init__(self, bucket, staging_dir, prefix='', endpoint_url=None, region_name=None, client=None):
+        """初始化存储
+
+        Args:
+            bucket: 存储桶名称
+            staging_dir: 本地暂存目录
+            prefix: 对象键前缀
+            endpoint_url: S3 兼容服务地址（如 MinIO 的 http://localhost:9000），AWS 上留空
+            region_name: 区域
+            client: 已创建的 S3 客户端（与 boto3 的 S3 客户端接口相同），为空时用 boto3 创建
+        """
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError('使用 S3 存储需要安装 boto3')
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.staging_dir = staging_dir
+        self.tmp_dir = os.path.join(staging_dir, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _object_key(self, key):
+        key = normalize_key(key)
+        return posixpath.join(self.prefix, key) if self.prefix else key
+
+    def _is_missing(self, error):
+        response = getattr(error, 'response', None) or {}
+        return response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def local_path(self, key):
+        return None
+
+    def put(self, tmp_path, key):
+        self.client.upload_file(tmp_path, self.bucket, self._object_key(key))
+        os.remove(tmp_path)
+
+    def exists(self, key):
+        return self.stat(key) is not None
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return head['ContentLength'], head['LastModified'].timestamp()
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+        except Exception as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def url(self, key, expires=300):
+        """返回有时效的下载地址，浏览器直接从对象存储下载"""
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._object_key(key)},
+            ExpiresIn=expires
+        )
+
+
+def create_storage(config):
+    """根据应用配置创建存储后端
+
+    STORAGE_BACKEND 为 local（默认）时使用 UPLOAD_FOLDER；
+    为 s3 时使用 S3_BUCKET、S3_ENDPOINT_URL、S3_PREFIX、S3_REGION，
+    访问密钥由 boto3 从环境变量（AWS_ACCESS_KEY_ID 等）或配置文件读取。
+    """
+    backend = (config.get('STORAGE_BACKEND') or 'local').lower()
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        if not config.get('S3_BUCKET'):
+            raise RuntimeError('使用 S3 存储需要设置 S3_BUCKET')
+        return S3Storage(
+            config['S3_BUCKET'],
+            staging_dir=os.path.join(config['UPLOAD_FOLDER'], '.staging'),
+            prefix=config.get('S3_PREFIX') or '',
+            endpoint_url=config.get('S3_ENDPOINT_URL') or None,
+            region_name=config.get('S3_REGION') or None
+        )
+    raise RuntimeError(f'不支持的存储后端: {backend}')
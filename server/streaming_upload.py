@@ -0,0 +1,130 @@
+import hashlib
+import os
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+class StreamedFile:
+    """流式解析得到的上传文件（内容已写入临时文件）"""
+
+    def __init__(self, name, filename, tmp_path):
+        self.name = name
+        self.filename = filename
+        self.tmp_path = tmp_path
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._file = open(tmp_path, 'wb')
+
+    @property
+    def file_hash(self):
+        """内容的SHA-256十六进制字符串"""
+        return self._hasher.hexdigest()
+
+    def write(self, data):
+        self._hasher.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def move_to(self, final_path):
+        """把临时文件重命名为最终路径（临时文件应与最终路径位于同一文件系统）"""
+        self.close()
+        os.replace(self.tmp_path, final_path)
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def multipart_boundary(request):
+    """返回 multipart/form-data 请求的 boundary，不是 multipart 请求时返回 None"""
+    if request.mimetype != 'multipart/form-data':
+        return None
+    boundary = request.mimetype_params.get('boundary')
+    return boundary.encode('latin-1') if boundary else None
+
+
+def parse_streaming_multipart(request, temp_path_for, chunk_size=64 * 1024, max_form_memory_size=500 * 1024, max_parts=1000):
+    """边读取请求体边解析 multipart，文件内容直接写入调用方指定的临时文件，同时计算哈希和大小
+
+    与 request.files 不同，Werkzeug 不会先把整个文件缓存到自己的临时文件，
+    调用方再把临时文件重命名到最终位置即可，每个文件只写一次磁盘。
+    请求体大小受 MAX_CONTENT_LENGTH 限制（由 request.stream 检查）。
+    不能与 request.form/request.files 同时使用。
+
+    Args:
+        request: Flask 请求对象
+        temp_path_for: 函数 (字段名, 文件名) -> 临时文件路径，返回 None 时丢弃该文件
+        chunk_size: 每次从请求体读取的字节数
+        max_form_memory_size: 单个普通字段的最大字节数
+        max_parts: 最多允许的字段数
+
+    Returns:
+        tuple: (普通字段 {字段名: 值}, 文件 {字段名: StreamedFile})，文件需由调用方移走或 discard
+
+    Raises:
+        ValueError: 不是 multipart 请求或请求体格式错误
+        RequestEntityTooLarge: 请求体超过 MAX_CONTENT_LENGTH 或字段过大
+    """
+    boundary = multipart_boundary(request)
+    if boundary is None:
+        raise ValueError('请求不是 multipart/form-data 格式')
+
+    decoder = MultipartDecoder(boundary, max_form_memory_size=max_form_memory_size, max_parts=max_parts)
+    stream = request.stream
+    fields = {}
+    files = {}
+    current = None
+    container = None
+    field_size = 0
+
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            # 读到结尾时传入 None，通知解析器数据已结束
+            decoder.receive_data(data or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    current = event
+                    container = []
+                    field_size = 0
+                elif isinstance(event, File):
+                    current = event
+                    tmp_path = temp_path_for(event.name, event.filename)
+                    container = StreamedFile(event.name, event.filename, tmp_path) if tmp_path else None
+                elif isinstance(event, Data):
+                    if isinstance(current, Field):
+                        container.append(event.data)
+                        field_size += len(event.data)
+                        if field_size > max_form_memory_size:
+                            raise RequestEntityTooLarge()
+                    elif container is not None:
+                        container.write(event.data)
+                    if not event.more_data:
+                        if isinstance(current, Field):
+                            fields[current.name] = b''.join(container).decode('utf-8', 'replace')
+                        elif container is not None:
+                            container.close()
+                            previous = files.pop(current.name, None)
+                            if previous is not None:
+                                previous.discard()
+                            files[current.name] = container
+                        current = None
+                        container = None
+                event = decoder.next_event()
+            if not data:
+                break
+    except Exception:
+        if isinstance(container, StreamedFile):
+            container.discard()
+        for streamed in files.values():
+            streamed.discard()
+        raise
+
+    return fields, files
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# server 模块在导入时根据 DATABASE_URL 创建数据库，测试使用临时目录中的 SQLite 文件
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='work-monitor-tests-'), 'test.db')
+
+from blob_store import BlobStore
+from chunked_upload import ChunkedUploadStore
+from models import db, User
+from storage import LocalStorage
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """清空数据库的 server 模块，文件存储位于临时目录"""
+    import server as server_module
+    
+    storage = LocalStorage(str(tmp_path / 'uploads'))
+    monkeypatch.setattr(server_module, 'storage', storage)
+    monkeypatch.setattr(server_module, 'blob_store', BlobStore(storage))
+    monkeypatch.setattr(server_module, 'chunked_uploads',
+                        ChunkedUploadStore(os.path.join(storage.staging_dir, 'partial')))
+    server_module.app.config['TESTING'] = True
+    with server_module.app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield server_module
+    # 写入线程提交完剩余操作后再进行下一个测试
+    server_module.ingest_writer.close()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def make_user(server, client):
+    """创建用户并登录，返回 API 请求头"""
+    def make(username, is_admin=False):
+        with server.app.app_context():
+            db.session.add(User(username=username, password='pw', is_admin=is_admin))
+            db.session.commit()
+        response = client.post('/api/login', json={'username': username, 'password': 'pw'})
+        return {'Authorization': 'Bearer ' + response.get_json()['token']}
+    return make
+
+
+@pytest.fixture
+def admin_client(client, make_user):
+    """已登录管理界面的测试客户端"""
+    make_user('admin', is_admin=True)
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+    return client
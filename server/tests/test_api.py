@@ -0,0 +1,110 @@
+import hashlib
+import io
+import json
+
+import pytest
+
+from models import db, File, ActivitySession
+
+
+def upload(client, headers, data, filename='a.webp'):
+    return client.post('/api/upload/file_with_hash', headers=headers, content_type='multipart/form-data', data={
+        'file': (io.BytesIO(data), filename),
+        'file_hash': hashlib.sha256(data).hexdigest(),
+    })
+
+
+def upload_sessions(client, headers, start, end):
+    return client.post('/api/upload/activity_sessions', headers=headers,
+                       json={'sessions': [{'start': start, 'end': end}]})
+
+
+def test_activity_sessions_reject_timezone_offsets(server, client, make_user):
+    headers = make_user('alice')
+    for start, end in [('2025-01-13T09:00:00+08:00', '2025-01-13T10:00:00'),
+                       ('2025-01-13T09:00:00Z', '2025-01-13T10:00:00Z')]:
+        response = upload_sessions(client, headers, start, end)
+        assert response.status_code == 400
+    
+    response = upload_sessions(client, headers, '2025-01-13T09:00:00', '2025-01-13T10:00:00')
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 1
+    # 同一会话重复上传时更新结束时间
+    response = upload_sessions(client, headers, '2025-01-13T09:00:00', '2025-01-13T11:00:00')
+    assert response.get_json()['updated'] == 1
+    with server.app.app_context():
+        assert ActivitySession.query.one().end_time.hour == 11
+
+
+def test_deduplicated_only_reflects_own_files(client, make_user):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    data = b'shared content'
+    
+    assert upload(client, alice, data).get_json()['deduplicated'] is False
+    # 其他用户上传过相同内容时不能通过响应得知
+    assert upload(client, bob, data).get_json()['deduplicated'] is False
+    assert upload(client, bob, data).get_json()['deduplicated'] is True
+
+
+def test_batch_status_only_reflects_own_files(client, make_user):
+    alice = make_user('alice')
+    bob = make_user('bob')
+    data = b'batch content'
+    upload(client, alice, data)
+    
+    manifest = {'items': [{'file_hash': hashlib.sha256(data).hexdigest(), 'filename': 'a.webp', 'field': 'f0'}]}
+    statuses = []
+    for _ in range(2):
+        response = client.post('/api/upload/batch', headers=bob, content_type='multipart/form-data', data={
+            'manifest': json.dumps(manifest),
+            'f0': (io.BytesIO(data), 'a.webp'),
+        })
+        statuses.append(response.get_json()['results'][0]['status'])
+    assert statuses == ['stored', 'deduplicated']
+
+
+def test_chunked_upload(server, client, make_user):
+    headers = make_user('alice')
+    data = b'0123456789'
+    response = client.post('/api/upload/chunked/init', headers=headers, json={
+        'filename': 'a.bin', 'file_size': len(data), 'file_hash': hashlib.sha256(data).hexdigest()})
+    upload_id = response.get_json()['upload_id']
+    
+    assert client.put(f'/api/upload/chunked/{upload_id}?offset=0', headers=headers, data=data[:4]).status_code == 200
+    # 偏移不一致时返回服务器已接收的偏移
+    response = client.put(f'/api/upload/chunked/{upload_id}?offset=0', headers=headers, data=data[:4])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 4
+    assert client.post(f'/api/upload/chunked/{upload_id}/finalize', headers=headers).status_code == 409
+    
+    client.put(f'/api/upload/chunked/{upload_id}?offset=4', headers=headers, data=data[4:])
+    response = client.post(f'/api/upload/chunked/{upload_id}/finalize', headers=headers)
+    assert response.status_code == 200
+    assert server.storage.exists(response.get_json()['file_path'])
+
+
+def test_record_for_blob_removed_before_commit_is_rejected(server, admin_client, make_user):
+    alice = make_user('alice')
+    data = b'removed content'
+    first = upload(admin_client, alice, data).get_json()
+    
+    # 另一个上传已确认 blob 存在（adopt）而文件记录尚未写入时，唯一引用它的记录被删除
+    file_hash = hashlib.sha256(data).hexdigest()
+    tmp_path = server.blob_store.new_temp_path()
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    key, _, size, created = server.blob_store.adopt(tmp_path, file_hash, len(data), 'a.webp')
+    assert created is False
+    assert admin_client.delete(f"/api/admin/file/{first['id']}").status_code == 200
+    assert not server.storage.exists(key)
+    
+    with pytest.raises(FileNotFoundError):
+        server.ingest_writer.write(server.ingest_file_record, dict(
+            user_id=1, filename='a.webp', file_type='screenshot', file_path=key, file_hash=file_hash, file_size=size))
+    with server.app.app_context():
+        assert File.query.count() == 0
+    
+    # 重新上传内容后恢复
+    assert upload(admin_client, alice, data).status_code == 200
+    assert server.storage.exists(key)
@@ -0,0 +1,64 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from blob_store import BlobStore
+from storage import LocalStorage
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return BlobStore(LocalStorage(str(tmp_path)))
+
+
+def test_save_stream_stores_content_once(blob_store):
+    data = b'screenshot bytes'
+    file_hash = hashlib.sha256(data).hexdigest()
+    
+    key, saved_hash, size, created = blob_store.save_stream(io.BytesIO(data), 'a.WEBP')
+    assert key == f'blobs/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}.webp'
+    assert (saved_hash, size, created) == (file_hash, len(data), True)
+    
+    key2, _, _, created2 = blob_store.save_stream(io.BytesIO(data), 'b.webp')
+    assert key2 == key
+    assert created2 is False
+    assert os.listdir(blob_store.tmp_dir) == []
+
+
+def test_save_stream_rejects_hash_mismatch(blob_store):
+    with pytest.raises(ValueError):
+        blob_store.save_stream(io.BytesIO(b'content'), 'a.webp', expected_hash='0' * 64)
+    
+    assert not blob_store.exists(hashlib.sha256(b'content').hexdigest(), 'a.webp')
+    assert os.listdir(blob_store.tmp_dir) == []
+
+
+def test_adopt_keeps_source_when_blob_exists(blob_store):
+    data = b'same'
+    file_hash = hashlib.sha256(data).hexdigest()
+    blob_store.save_stream(io.BytesIO(data), 'a.webp')
+    
+    source = blob_store.new_temp_path()
+    with open(source, 'wb') as f:
+        f.write(data)
+    _, _, _, created = blob_store.adopt(source, file_hash, len(data), 'a.webp')
+    assert created is False
+    assert os.path.exists(source)
+
+
+def test_hash_from_path(blob_store):
+    file_hash = 'ab' * 32
+    assert blob_store.hash_from_path(blob_store.relative_path(file_hash, 'x.webp')) == file_hash
+    # 早期版本的一级目录键
+    assert blob_store.hash_from_path(f'blobs/ab/{file_hash}.webp') == file_hash
+    assert blob_store.hash_from_path(f'uploads/ab/{file_hash}.webp') is None
+    assert blob_store.hash_from_path('blobs/ab/cd/not-a-hash.webp') is None
+
+
+def test_is_valid_hash():
+    assert BlobStore.is_valid_hash('0f' * 32)
+    assert not BlobStore.is_valid_hash('0f' * 31)
+    assert not BlobStore.is_valid_hash('zz' * 32)
+    assert not BlobStore.is_valid_hash(None)
@@ -0,0 +1,76 @@
+import io
+import os
+import time
+
+import pytest
+
+from chunked_upload import ChunkedUploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkedUploadStore(str(tmp_path))
+
+
+def test_append_in_order(store):
+    upload_id = store.create({'filename': 'a.bin', 'file_size': 6})
+    assert store.get_meta(upload_id)['filename'] == 'a.bin'
+    assert store.append(upload_id, 0, io.BytesIO(b'abc'), 6) == 3
+    assert store.append(upload_id, 3, io.BytesIO(b'def'), 6) == 6
+    with open(store.part_path(upload_id), 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_append_rejects_wrong_offset(store):
+    upload_id = store.create({'file_size': 6})
+    store.append(upload_id, 0, io.BytesIO(b'abc'), 6)
+    # 客户端超时重试同一个数据块时不会重复追加
+    with pytest.raises(ValueError):
+        store.append(upload_id, 0, io.BytesIO(b'abc'), 6)
+    assert store.offset(upload_id) == 3
+
+
+def test_append_beyond_declared_size_is_rolled_back(store):
+    upload_id = store.create({'file_size': 4})
+    store.append(upload_id, 0, io.BytesIO(b'ab'), 4)
+    with pytest.raises(ValueError):
+        store.append(upload_id, 2, io.BytesIO(b'cdef'), 4, chunk_size=1)
+    assert store.offset(upload_id) == 2
+
+
+def test_lock_is_exclusive(store):
+    upload_id = store.create({'file_size': 1})
+    with store.locked(upload_id):
+        with pytest.raises(BlockingIOError):
+            with store.locked(upload_id):
+                pass
+    # 释放后可以重新加锁
+    with store.locked(upload_id):
+        pass
+
+
+def test_stale_lock_is_reclaimed(store):
+    upload_id = store.create({'file_size': 1})
+    lock_path = os.path.join(store.staging_dir, f'{upload_id}.lock')
+    open(lock_path, 'w').close()
+    old = time.time() - store.LOCK_STALE_SECONDS - 1
+    os.utime(lock_path, (old, old))
+    with store.locked(upload_id):
+        pass
+    assert not os.path.exists(lock_path)
+
+
+def test_invalid_id_and_discard(store):
+    assert store.get_meta('../../etc/passwd') is None
+    upload_id = store.create({'file_size': 1})
+    store.discard(upload_id)
+    assert store.get_meta(upload_id) is None
+    assert os.listdir(store.staging_dir) == []
+
+
+def test_cleanup_expired(store):
+    upload_id = store.create({'file_size': 1})
+    old = time.time() - store.expire_seconds - 1
+    os.utime(store.part_path(upload_id), (old, old))
+    store.cleanup_expired()
+    assert store.get_meta(upload_id) is None
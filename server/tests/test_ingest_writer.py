@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from ingest_writer import IngestWriter
+from models import db, User, File
+
+
+@pytest.fixture
+def writer(server):
+    with server.app.app_context():
+        db.session.add(User(username='alice', password='pw'))
+        db.session.commit()
+    writer = IngestWriter(server.app, db, max_batch=50, max_delay=0.05)
+    yield writer
+    writer.close()
+
+
+def add_file(defer, name):
+    db_file = File(user_id=1, filename=name, file_type='screenshot', file_path=name)
+    db.session.add(db_file)
+    return lambda: db_file.id
+
+
+def count_files(server):
+    with server.app.app_context():
+        return File.query.count()
+
+
+def test_concurrent_writes_are_committed(server, writer):
+    futures = [writer.submit(add_file, f'f{index}') for index in range(20)]
+    ids = [future.result(timeout=5) for future in futures]
+    assert len(set(ids)) == 20
+    assert count_files(server) == 20
+
+
+def test_failing_operation_does_not_fail_its_batch(server, writer):
+    def fail(defer):
+        raise RuntimeError('bad row')
+    
+    futures = [writer.submit(add_file, 'a'), writer.submit(fail), writer.submit(add_file, 'b')]
+    assert futures[0].result(timeout=5)
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5)
+    assert count_files(server) == 2
+
+
+def test_deferred_callbacks_run_once_per_batch(server, writer):
+    calls = []
+    
+    def op(defer, name):
+        defer('refresh', lambda: calls.append(name))
+        return add_file(defer, name)
+    
+    futures = [writer.submit(op, f'f{index}') for index in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    assert len(calls) < 5
+
+
+def test_timed_out_write_is_cancelled(server, writer):
+    release = threading.Event()
+    
+    def block(defer):
+        release.wait(5)
+    
+    blocker = writer.submit(block)
+    time.sleep(0.1)
+    with pytest.raises(TimeoutError):
+        writer.write(add_file, 'late', timeout=0.1)
+    release.set()
+    blocker.result(timeout=5)
+    writer.close()
+    # 已取消的操作不会在之后写入
+    assert count_files(server) == 0
+
+
+def test_close_commits_queued_writes(server, writer):
+    futures = [writer.submit(add_file, f'f{index}') for index in range(10)]
+    writer.close()
+    assert all(future.done() for future in futures)
+    assert count_files(server) == 10
+    # 关闭后再次写入时重新启动写入线程
+    assert writer.write(add_file, 'again', timeout=5)
@@ -0,0 +1,104 @@
+import pytest
+
+from models import db, User, File, FileTypeCount, WeeklyStats, WeeklyRollup, UserYearRollup, \
+    get_file_type_counts, rebuild_file_type_counts, upsert_weekly_stats
+from rollups import percentile, refresh_week_rollup, refresh_user_year_rollup
+
+
+@pytest.fixture
+def app_ctx(server):
+    with server.app.app_context():
+        yield
+
+
+def make_users(*names):
+    users = [User(username=name, password='pw') for name in names]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def week(year, week_number, weekday, weekend=0):
+    return {'year': year, 'week': week_number, 'weekday_seconds': weekday, 'weekend_seconds': weekend}
+
+
+def test_upsert_weekly_stats_updates_existing_row(app_ctx):
+    user, = make_users('alice')
+    ids = upsert_weekly_stats(user.id, [week(2025, 1, 100), week(2025, 2, 200)])
+    db.session.commit()
+    
+    again = upsert_weekly_stats(user.id, [week(2025, 1, 150, 10)])
+    db.session.commit()
+    assert again[(2025, 1)] == ids[(2025, 1)]
+    assert WeeklyStats.query.count() == 2
+    stats = db.session.get(WeeklyStats, ids[(2025, 1)])
+    assert (stats.weekday_duration, stats.weekend_duration) == (150, 10)
+
+
+def test_file_type_counts_follow_inserts_updates_and_deletes(app_ctx):
+    user, = make_users('alice')
+    files = [File(user_id=user.id, filename=f'{index}.bin', file_type=file_type, file_path=str(index))
+             for index, file_type in enumerate(['screenshot', 'screenshot', 'camera', None])]
+    db.session.add_all(files)
+    db.session.commit()
+    assert get_file_type_counts() == {'screenshot': 2, 'camera': 1}
+    
+    files[0].file_type = 'camera'
+    db.session.delete(files[2])
+    db.session.commit()
+    assert get_file_type_counts() == {'screenshot': 1, 'camera': 1}
+    
+    # 回滚时计数一并回滚
+    db.session.add(File(user_id=user.id, filename='x.bin', file_type='screenshot', file_path='x'))
+    db.session.flush()
+    db.session.rollback()
+    assert get_file_type_counts() == {'screenshot': 1, 'camera': 1}
+
+
+def test_file_type_counts_rebuild(app_ctx):
+    user, = make_users('alice')
+    db.session.add(File(user_id=user.id, filename='a.bin', file_type='camera', file_path='a'))
+    db.session.commit()
+    FileTypeCount.query.delete()
+    db.session.commit()
+    # 汇总表为空而 files 表有数据时按 files 表重建
+    assert get_file_type_counts() == {'camera': 1}
+    rebuild_file_type_counts()
+    assert get_file_type_counts() == {'camera': 1}
+
+
+def test_percentile():
+    assert percentile([], 50) == 0
+    assert percentile([10], 90) == 10
+    assert percentile([10, 20, 30, 40], 50) == 25
+
+
+def test_week_rollup(app_ctx):
+    alice, bob, carol = make_users('alice', 'bob', 'carol')
+    upsert_weekly_stats(alice.id, [week(2025, 3, 100, 20)])
+    upsert_weekly_stats(bob.id, [week(2025, 3, 300)])
+    upsert_weekly_stats(carol.id, [week(2025, 3, 0)])
+    rollup = refresh_week_rollup(2025, 3)
+    db.session.commit()
+    
+    assert rollup.active_users == 2
+    assert (rollup.weekday_sum, rollup.weekend_sum, rollup.total_sum) == (400, 20, 420)
+    assert (rollup.total_mean, rollup.total_p50, rollup.total_max) == (210, 210, 300)
+    
+    # 该周没有数据后汇总被删除
+    WeeklyStats.query.filter_by(year=2025, week=3).delete()
+    refresh_week_rollup(2025, 3)
+    db.session.commit()
+    assert WeeklyRollup.query.count() == 0
+
+
+def test_user_year_rollup(app_ctx):
+    user, = make_users('alice')
+    upsert_weekly_stats(user.id, [week(2025, 1, 100), week(2025, 2, 0), week(2025, 3, 200, 100)])
+    rollup = refresh_user_year_rollup(user.id, 2025)
+    db.session.commit()
+    
+    assert rollup.active_weeks == 2
+    assert (rollup.total_sum, rollup.total_mean, rollup.total_max) == (400, 200, 300)
+    assert refresh_user_year_rollup(user.id, 2024) is None
+    assert UserYearRollup.query.count() == 1
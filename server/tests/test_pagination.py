@@ -0,0 +1,74 @@
+import base64
+import datetime
+import json
+import re
+
+import pytest
+
+from models import db, User, File
+from pagination import decode_cursor, encode_cursor, keyset_paginate
+
+
+def test_cursor_round_trip():
+    values = [datetime.datetime(2025, 1, 2, 3, 4, 5), datetime.date(2025, 1, 2), 'a', 3, None]
+    assert decode_cursor(encode_cursor(values), len(values)) == values
+
+
+@pytest.mark.parametrize('payload', [[{'dt': 5}, 1], [[1], 2], [1], {'a': 1}])
+def test_decode_rejects_forged_cursor(payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor!', 1)
+
+
+def add_files(server, file_types):
+    with server.app.app_context():
+        user = User(username='alice', password='pw')
+        db.session.add(user)
+        db.session.flush()
+        for index, file_type in enumerate(file_types):
+            db.session.add(File(user_id=user.id, filename=f'f{index}.bin', file_type=file_type,
+                                file_path=f'blobs/{index}', file_size=1))
+        db.session.commit()
+
+
+def test_keyset_paginate_forward_and_back(server):
+    add_files(server, ['screenshot'] * 5)
+    with server.app.app_context():
+        keys = [(File.id, lambda f: f.id)]
+        first = keyset_paginate(File.query, keys, 2)
+        assert [f.id for f in first.items] == [5, 4]
+        assert first.prev_cursor is None
+        
+        second = keyset_paginate(File.query, keys, 2, after=first.next_cursor)
+        assert [f.id for f in second.items] == [3, 2]
+        last = keyset_paginate(File.query, keys, 2, after=second.next_cursor)
+        assert [f.id for f in last.items] == [1]
+        assert not last.has_next
+        
+        back = keyset_paginate(File.query, keys, 2, before=last.prev_cursor)
+        assert [f.id for f in back.items] == [3, 2]
+
+
+def test_dashboard_files_type_sort_includes_null_types(server, admin_client):
+    # file_type 为空的记录不能因为 NULL 比较而在翻页时丢失
+    add_files(server, [None if index % 2 else 'screenshot' for index in range(7)])
+    
+    seen = []
+    cursor = None
+    for _ in range(10):
+        url = '/dashboard/files?sort_by=type&per_page=2' + (f'&cursor={cursor}' if cursor else '')
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        seen += re.findall(r'f\d\.bin', html)
+        match = re.search(r'cursor=([A-Za-z0-9_-]+)', html)
+        if not match:
+            break
+        cursor = match.group(1)
+    assert sorted(set(seen)) == [f'f{index}.bin' for index in range(7)]
@@ -0,0 +1,70 @@
+import hashlib
+import io
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from streaming_upload import multipart_boundary, parse_streaming_multipart
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_parse_fields_and_files(app, tmp_path):
+    data = b'x' * 200000
+    paths = []
+    
+    def temp_path_for(field_name, filename):
+        path = str(tmp_path / f'{field_name}.tmp')
+        paths.append(path)
+        return path
+    
+    with app.test_request_context('/', method='POST', content_type='multipart/form-data', data={
+        'manifest': '{"items": []}',
+        'f0': (io.BytesIO(data), 'a.webp'),
+    }) as ctx:
+        fields, files = parse_streaming_multipart(ctx.request, temp_path_for, chunk_size=4096)
+    
+    assert fields == {'manifest': '{"items": []}'}
+    upload = files['f0']
+    assert upload.filename == 'a.webp'
+    assert upload.size == len(data)
+    assert upload.file_hash == hashlib.sha256(data).hexdigest()
+    with open(upload.tmp_path, 'rb') as f:
+        assert f.read() == data
+    upload.discard()
+    assert not os.path.exists(paths[0])
+
+
+def test_files_without_temp_path_are_dropped(app):
+    with app.test_request_context('/', method='POST', content_type='multipart/form-data', data={
+        'other': (io.BytesIO(b'ignored'), 'a.bin'),
+    }) as ctx:
+        fields, files = parse_streaming_multipart(ctx.request, lambda field_name, filename: None)
+    assert fields == {}
+    assert files == {}
+
+
+def test_too_many_parts_discards_written_files(app, tmp_path):
+    def temp_path_for(field_name, filename):
+        return str(tmp_path / field_name)
+    
+    with app.test_request_context('/', method='POST', content_type='multipart/form-data', data={
+        'f0': (io.BytesIO(b'a'), 'a.bin'),
+        'f1': (io.BytesIO(b'b'), 'b.bin'),
+        'f2': (io.BytesIO(b'c'), 'c.bin'),
+    }) as ctx:
+        with pytest.raises(RequestEntityTooLarge):
+            parse_streaming_multipart(ctx.request, temp_path_for, max_parts=2)
+    assert os.listdir(tmp_path) == []
+
+
+def test_rejects_non_multipart(app):
+    with app.test_request_context('/', method='POST', json={'items': []}) as ctx:
+        assert multipart_boundary(ctx.request) is None
+        with pytest.raises(ValueError):
+            parse_streaming_multipart(ctx.request, lambda field_name, filename: None)
@@ -0,0 +1,146 @@
+import hashlib
+import io
+import os
+import threading
+import uuid
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时不生成缩略图，页面直接使用原图
+    Image = None
+
+
+class ThumbnailCache:
+    """图片缩略图的生成与磁盘缓存
+
+    首次请求时生成缩小后的 WebP 预览图并保存到缓存目录，之后直接返回缓存文件。
+    缓存文件名由原图对象键、修改时间和大小计算，原图被替换后自动失效。
+    缓存总大小超过 max_bytes 时按最近访问时间淘汰最旧的文件。
+    """
+
+    IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif'}
+
+    def __init__(self, cache_dir, size=(320, 240), quality=70, max_bytes=256 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缩略图缓存目录
+            size: 缩略图最大宽高，保持原图比例
+            quality: WebP 压缩质量
+            max_bytes: 缓存目录最大总字节数
+        """
+        self.cache_dir = cache_dir
+        self.size = size
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def available():
+        return Image is not None
+
+    def is_image(self, relative_path):
+        return os.path.splitext(relative_path)[1].lower() in self.IMAGE_EXTENSIONS
+
+    def get(self, storage, key):
+        """返回缩略图的绝对路径，必要时先生成
+
+        Args:
+            storage: 原图所在的存储后端
+            key: 原图的对象键
+
+        Returns:
+            str: 缩略图路径；未安装 Pillow、不是图片、原图不存在或生成失败时返回 None
+        """
+        if Image is None or not self.is_image(key):
+            return None
+        stat = storage.stat(key)
+        if stat is None:
+            return None
+        size, mtime = stat
+
+        cache_key = hashlib.sha1(
+            f"{key}|{mtime}|{size}|{self.size[0]}x{self.size[1]}".encode('utf-8')
+        ).hexdigest()
+        thumb_path = os.path.join(self.cache_dir, cache_key[:2], cache_key + '.webp')
+
+        if os.path.exists(thumb_path):
+            try:
+                # 更新访问时间，淘汰时据此判断
+                os.utime(thumb_path)
+            except OSError:
+                pass
+            return thumb_path
+
+        return self._generate(storage, key, thumb_path)
+
+    def _generate(self, storage, key, thumb_path):
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            # 本地存储直接打开文件，对象存储先读入内存（Pillow 需要可定位的文件对象）
+            source = storage.local_path(key)
+            if source is None:
+                body = storage.open(key)
+                try:
+                    source = io.BytesIO(body.read())
+                finally:
+                    body.close()
+            with Image.open(source) as image:
+                image.draft('RGB', self.size)  # JPEG 解码时直接按缩小尺寸解码
+                image.thumbnail(self.size)
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGB')
+                image.save(tmp_path, 'WEBP', quality=self.quality, method=4)
+            # 先写临时文件再重命名，并发请求同一缩略图时不会读到半个文件
+            os.replace(tmp_path, thumb_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+        self._account(os.path.getsize(thumb_path), thumb_path)
+        return thumb_path
+
+    def _account(self, added_bytes, keep_path):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._scan())
+            else:
+                self._total_bytes += added_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep_path)
+
+    def _scan(self):
+        """返回缓存目录中所有缩略图的 (访问时间, 路径, 大小)"""
+        entries = []
+        for dir_path, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith('.webp'):
+                    continue
+                path = os.path.join(dir_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self, keep_path):
+        """删除最久未访问的缩略图，直到总大小降到上限的90%（保留刚生成的 keep_path）"""
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= target:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total